@@ -0,0 +1,148 @@
+"""
+Локальные HTTP прокси для проверки пула прокси (modules.proxy_pool)
+
+Каждый прокси - aiohttp сервер на своём порту, пересылающий запросы в
+absolute-form (GET http://host/path) дальше. Вместе с mock_upstreams
+(UPSTREAM_OVERRIDE=http://...) весь трафик остаётся локальным; CONNECT
+(https через прокси) не поддерживается - с override он и не нужен.
+
+Поведение задаётся на прокси:
+- latency_ms - добавочная задержка
+- ban_rate - доля ответов 403 (сайт "забанил" IP прокси)
+- fail_rate - доля разорванных соединений
+
+Счётчики на прокси: запросов, одновременных запросов (максимум),
+домены исходных url - по ним видно закрепление доменов за прокси.
+
+Запуск отдельно (три прокси с портов 9200, второй медленный, третий забанен):
+    python -m benchmarks.mock_proxies --port 9200 --count 3 --latency-ms 0,300,0 --ban-rate 0,0,0.8
+    PROXY_POOL=http://127.0.0.1:9200,http://127.0.0.1:9201,http://127.0.0.1:9202
+"""
+import argparse
+import asyncio
+import json
+import random
+from collections import Counter
+from typing import List, Optional
+
+import aiohttp
+from aiohttp import web
+
+
+# Заголовки соединения не пересылаются (RFC 9110, 7.6.1)
+HOP_HEADERS = frozenset({
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "proxy-connection",
+    "te", "trailer", "transfer-encoding", "upgrade", "host", "content-length",
+})
+
+
+class MockProxy:
+    """Один прокси со своим поведением и счётчиками"""
+
+    def __init__(self, latency_ms: float = 0, ban_rate: float = 0.0, fail_rate: float = 0.0, seed: int = 42):
+        self.latency_ms = latency_ms
+        self.ban_rate = ban_rate
+        self.fail_rate = fail_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.domains: Counter = Counter()
+        self.app = web.Application(client_max_size=20 * 1024 * 1024)
+        self.app.router.add_route("*", "/{tail:.*}", self.handle)
+        self.runner: Optional[web.AppRunner] = None
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.url = ""
+
+    async def start(self, host: str = "127.0.0.1", port: int = 9200):
+        self.session = aiohttp.ClientSession(auto_decompress=False)
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, port).start()
+        self.url = f"http://{host}:{port}"
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+        if self.session:
+            await self.session.close()
+
+    def stats(self) -> dict:
+        return {
+            "proxy": self.url,
+            "requests": self.requests,
+            "max_in_flight": self.max_in_flight,
+            "domains": dict(self.domains)
+        }
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        target = request.url
+        self.requests += 1
+        # С UPSTREAM_OVERRIDE исходный домен - первый сегмент пути
+        self.domains[target.path.lstrip("/").split("/", 1)[0]] += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency_ms:
+                await asyncio.sleep(self.latency_ms / 1000)
+            if self.random.random() < self.fail_rate:
+                # Разрыв без ответа - у клиента ServerDisconnectedError
+                request.transport.close()
+                raise asyncio.CancelledError()
+            if self.random.random() < self.ban_rate:
+                return web.Response(status=403, text="Forbidden by mock proxy")
+
+            headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_HEADERS}
+            async with self.session.request(
+                request.method, str(target), headers=headers,
+                data=await request.read(), allow_redirects=False
+            ) as upstream:
+                body = await upstream.read()
+                response_headers = {k: v for k, v in upstream.headers.items() if k.lower() not in HOP_HEADERS}
+                return web.Response(status=upstream.status, body=body, headers=response_headers)
+        finally:
+            self.in_flight -= 1
+
+
+def _rates(spec: str, count: int) -> List[float]:
+    values = [float(v) for v in spec.split(",")] if spec else [0.0]
+    return (values + values[-1:] * count)[:count]
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Mock HTTP прокси для пула прокси")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9200, help="порт первого прокси, дальше подряд")
+    parser.add_argument("--count", type=int, default=3)
+    parser.add_argument("--latency-ms", default="0", help="через запятую на прокси (последнее повторяется)")
+    parser.add_argument("--ban-rate", default="0", help="доля ответов 403, через запятую")
+    parser.add_argument("--fail-rate", default="0", help="доля разорванных соединений, через запятую")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args(argv)
+
+
+def mock_proxies_from_args(args) -> List[MockProxy]:
+    latencies = _rates(args.latency_ms, args.count)
+    bans = _rates(args.ban_rate, args.count)
+    fails = _rates(args.fail_rate, args.count)
+    return [
+        MockProxy(latencies[i], bans[i], fails[i], seed=args.seed + i)
+        for i in range(args.count)
+    ]
+
+
+async def _serve_forever(args):
+    proxies = mock_proxies_from_args(args)
+    for i, proxy in enumerate(proxies):
+        await proxy.start(args.host, args.port + i)
+    print(json.dumps({"mock_proxies": ",".join(proxy.url for proxy in proxies)}))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        print(json.dumps([proxy.stats() for proxy in proxies]))
+        for proxy in proxies:
+            await proxy.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(_serve_forever(_parse_args()))
@@ -0,0 +1,288 @@
+"""
+Локальные mock-серверы внешних сервисов для бенчмарков
+
+Один aiohttp сервер отвечает за все upstream'ы: приложение запускается
+с UPSTREAM_OVERRIDE=http://127.0.0.1:{port}, и запрос к
+https://github.com/user приходит сюда как /github.com/user.
+
+Имитируются:
+- сайты из каталогов UsernameChecker.fallback_sites и SherlockSearch.sites_data
+- HaveIBeenPwned (breachedaccount)
+- сайты проверки регистраций email (modules.registration)
+- Yandex Images, Google Images, TinEye (HTML в формате, который ждут парсеры)
+
+Запуск отдельно:
+    python -m benchmarks.mock_upstreams --port 9100 --latency-ms 200 --error-rate 0.05
+"""
+import argparse
+import asyncio
+import functools
+import io
+import json
+import random
+import re
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+
+class MockConfig:
+    """Поведение mock-серверов"""
+
+    def __init__(
+        self,
+        latency_ms: float = 100,
+        jitter_ms: float = 50,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: int = 1,
+        found_rate: float = 0.4,
+        soft_404_sites: Tuple[str, ...] = (),
+        seed: int = 42
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.found_rate = found_rate
+        # Сайты, отвечающие 200 со страницей-заглушкой на несуществующий профиль
+        self.soft_404_sites = set(soft_404_sites)
+        self.random = random.Random(seed)
+
+
+def _load_site_patterns() -> List[Tuple[str, re.Pattern, Dict]]:
+    """
+    Регулярные выражения для URL сайтов из каталогов приложения
+
+    Returns:
+        List (название сайта, regex по "host/path" с группой username,
+        запись каталога)
+    """
+    from modules.engines.sites import SITE_CATALOG
+
+    patterns = []
+    for site_name, site_data in SITE_CATALOG.items():
+        template = site_data["url"]
+        without_scheme = template.split("://", 1)[1]
+        if "/" not in without_scheme:
+            without_scheme += "/"
+        regex = re.escape(without_scheme).replace(r"\{\}", r"(?P<username>[^/?]+)")
+        patterns.append((site_name, re.compile(f"^{regex}/?$"), site_data))
+    return patterns
+
+
+def _is_found(*parts: str, rate: float) -> bool:
+    """Детерминированное решение "аккаунт существует" по ключу"""
+    key = "|".join(parts).encode("utf-8")
+    return (zlib.crc32(key) % 1000) < rate * 1000
+
+
+def _profile_html(site_name: str, username: str) -> str:
+    return f"""<html><head>
+<title>{username} on {site_name}</title>
+<meta property="og:title" content="{username.title()} ({site_name})">
+<meta property="og:image" content="https://cdn.example.com/{site_name.lower()}/{username}.jpg">
+<meta property="og:description" content="Mock profile of {username} on {site_name}">
+</head><body><h1>{username}</h1>{'<p>' + 'x' * 2000 + '</p>'}</body></html>"""
+
+
+def _soft_404_html(site_name: str) -> str:
+    return f"""<html><head><title>Page not found - {site_name}</title></head>
+<body><p>Sorry, this page isn't available.</p></body></html>"""
+
+
+@functools.lru_cache(maxsize=1024)
+def _image_bytes(key: str) -> bytes:
+    """Небольшой JPEG, детерминированный по адресу (аватары и миниатюры)"""
+    from PIL import Image
+
+    seed = zlib.crc32(key.encode("utf-8"))
+    pixels = bytes((seed >> (8 * (i % 4)) & 0xFF) ^ (i * 37 & 0xFF) for i in range(16 * 16 * 3))
+    image = Image.frombytes("RGB", (16, 16), pixels).resize((128, 128))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=80)
+    return buffer.getvalue()
+
+
+def _yandex_html(count: int) -> str:
+    similar = "".join(
+        f'<a href="https://vk.com/id{i}"><div class="cbir-similar__thumb">'
+        f'<img src="https://im.yandex.example/thumb{i}.jpg"></div></a>'
+        for i in range(count)
+    )
+    sites = "".join(
+        f'<div class="cbir-sites__thumb"><a href="https://site{i}.example.com/page"></a></div>'
+        for i in range(count // 2)
+    )
+    items = "".join(
+        f'<div class="serp-item"><a href="https://ok.ru/profile/{i}" title="Result {i}"></a></div>'
+        for i in range(count)
+    )
+    return f"<html><body>{similar}{sites}{items}</body></html>"
+
+
+def _google_html(count: int) -> str:
+    results = "".join(
+        f'<div class="g"><a href="https://www.instagram.com/user{i}/"><h3>Result {i}</h3></a></div>'
+        for i in range(count)
+    )
+    return f"<html><body>{results}</body></html>"
+
+
+def _tineye_html(count: int) -> str:
+    matches = "".join(
+        f'<div class="match"><a class="image-link" href="https://twitter.com/user{i}">match {i}</a>'
+        f'<p class="domain">twitter.com</p></div>'
+        for i in range(count)
+    )
+    return f"<html><body>{matches}</body></html>"
+
+
+def _conditional(request: web.Request, response: web.Response) -> web.Response:
+    """ETag по телу ответа и 304 на If-None-Match (как у CDN реальных сайтов)"""
+    etag = f'"{zlib.crc32(response.body):08x}"'
+    if request.headers.get("If-None-Match") == etag:
+        return web.Response(status=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return response
+
+
+class MockUpstreams:
+    """aiohttp приложение со всеми mock upstream'ами"""
+
+    def __init__(self, mock_config: Optional[MockConfig] = None):
+        self.config = mock_config or MockConfig()
+        self.site_patterns = _load_site_patterns()
+        self.requests_served = 0
+        self.app = web.Application(client_max_size=20 * 1024 * 1024)
+        self.app.router.add_route("*", "/{host}{tail:.*}", self.handle)
+        self.runner: Optional[web.AppRunner] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 9100):
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, port).start()
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        self.requests_served += 1
+        cfg = self.config
+
+        delay = max(0.0, cfg.latency_ms + cfg.random.uniform(-cfg.jitter_ms, cfg.jitter_ms))
+        await asyncio.sleep(delay / 1000)
+
+        roll = cfg.random.random()
+        if roll < cfg.rate_limit_rate:
+            return web.Response(status=429, headers={"Retry-After": str(cfg.retry_after)})
+        if roll < cfg.rate_limit_rate + cfg.error_rate:
+            return web.Response(status=500, text="mock upstream error")
+
+        host = request.match_info["host"]
+        tail = request.match_info["tail"] or "/"
+        # Тело multipart загрузок нужно дочитать, как это делает реальный сервер
+        if request.can_read_body:
+            await request.read()
+
+        return self._route(request, host, tail)
+
+    def _route(self, request: web.Request, host: str, tail: str) -> web.Response:
+        found_rate = self.config.found_rate
+
+        if host == "haveibeenpwned.com":
+            email = tail.rsplit("/", 1)[-1]
+            if not _is_found("hibp", email, rate=found_rate):
+                return web.Response(status=404)
+            breaches = [
+                {"Name": f"Breach{i}", "Title": f"Breach {i}", "Domain": f"breach{i}.example.com",
+                 "BreachDate": "2020-01-01", "DataClasses": ["Email addresses"], "PwnCount": 1000 * i}
+                for i in range(1 + zlib.crc32(email.encode()) % 6)
+            ]
+            return _conditional(request, web.json_response(breaches))
+
+        if host in ("yandex.ru", "yandex.com"):
+            return web.Response(text=_yandex_html(15), content_type="text/html")
+        if host == "www.google.com":
+            return web.Response(text=_google_html(10), content_type="text/html")
+        if host == "tineye.com":
+            return web.Response(text=_tineye_html(10), content_type="text/html")
+
+        if host == "api.twitter.com":
+            email = request.query.get("email", "")
+            return web.json_response({"taken": _is_found("twitter", email, rate=found_rate)})
+        if host == "spclient.wg.spotify.com":
+            email = request.query.get("email", "")
+            return web.json_response({"status": 20 if _is_found("spotify", email, rate=found_rate) else 1})
+        if request.method == "POST" and host in (
+            "www.instagram.com", "github.com", "accounts.adobe.com"
+        ):
+            return web.Response(status=400 if _is_found(host, tail, rate=found_rate) else 404)
+
+        if tail.endswith((".jpg", ".jpeg", ".png")):
+            return web.Response(body=_image_bytes(f"{host}{tail}"), content_type="image/jpeg")
+
+        target = f"{host}{tail}"
+        for site_name, pattern, site_data in self.site_patterns:
+            match = pattern.match(target)
+            if match:
+                username = match.group("username")
+                # Калибровочные username ведут себя как в жизни
+                if username == site_data.get("username_claimed") or (
+                    username != site_data.get("username_unclaimed")
+                    and _is_found(site_name, username, rate=found_rate)
+                ):
+                    return _conditional(
+                        request,
+                        web.Response(text=_profile_html(site_name, username), content_type="text/html")
+                    )
+                if site_name in self.config.soft_404_sites:
+                    return web.Response(text=_soft_404_html(site_name), content_type="text/html")
+                return web.Response(status=404, text="not found")
+
+        return web.Response(status=404, text="unknown mock route")
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Mock upstream сервисы для бенчмарков")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--found-rate", type=float, default=0.4)
+    parser.add_argument("--soft-404", default="", help="сайты через запятую, отвечающие 200 на несуществующий профиль")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args(argv)
+
+
+def mock_config_from_args(args) -> MockConfig:
+    return MockConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        found_rate=args.found_rate,
+        soft_404_sites=tuple(name.strip() for name in args.soft_404.split(",") if name.strip()),
+        seed=args.seed
+    )
+
+
+async def _serve_forever(args):
+    mocks = MockUpstreams(mock_config_from_args(args))
+    await mocks.start(args.host, args.port)
+    print(json.dumps({"mock_upstreams": f"http://{args.host}:{args.port}"}))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await mocks.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(_serve_forever(_parse_args()))
@@ -0,0 +1,394 @@
+"""
+Нагрузочный бенчмарк main_osint:app на локальных mock upstream'ах
+
+Запускает:
+1. benchmarks.mock_upstreams в отдельном процессе
+2. uvicorn main_osint:app в отдельном процессе с UPSTREAM_OVERRIDE на mock
+   (и, опционально, поддельными CLI holehe/maigret в PATH)
+3. генератор нагрузки с фиксированной конкурентностью
+
+Отчёт: throughput, p50/p95/p99 латентности, ошибки, пиковый RSS процесса
+приложения и время блокировки event loop (по гистограмме из /metrics).
+
+Примеры:
+    cd backend
+    python -m benchmarks.run_benchmark --scenarios username,email --concurrency 20 --requests 200
+    python -m benchmarks.run_benchmark --json result.json
+    python -m benchmarks.run_benchmark --baseline result.json --max-regression 0.2
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import re
+import socket
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import aiohttp
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+FAKE_HOLEHE = '''#!{python}
+import sys, time
+time.sleep({latency})
+print("[+] Email used on MockSite")
+print("[+] Email used on MockForum")
+'''
+
+FAKE_MAIGRET = '''#!{python}
+import json, os, sys, time
+time.sleep({latency})
+username = sys.argv[1]
+os.makedirs("reports", exist_ok=True)
+report = {{
+    "GitHub": {{"url_user": "https://github.com/" + username, "http_status": 200,
+                "status": {{"status": "Claimed", "tags": ["coding"]}}}},
+    "Reddit": {{"url_user": "https://www.reddit.com/user/" + username, "http_status": 200,
+                "status": {{"status": "Claimed", "tags": ["forum"]}}}}
+}}
+with open(os.path.join("reports", "report_%s_simple.json" % username), "w") as f:
+    json.dump(report, f)
+'''
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _write_fake_cli(directory: Path, latency_ms: float):
+    """Поддельные holehe/maigret, которые спят latency_ms и печатают результат"""
+    for name, template in (("holehe", FAKE_HOLEHE), ("maigret", FAKE_MAIGRET)):
+        path = directory / name
+        path.write_text(template.format(python=sys.executable, latency=latency_ms / 1000))
+        path.chmod(path.stat().st_mode | stat.S_IEXEC)
+
+
+def _test_image() -> bytes:
+    """Небольшой JPEG со случайным шумом для сценария photo"""
+    from PIL import Image
+    rng = random.Random(7)
+    image = Image.frombytes("RGB", (256, 256), bytes(rng.getrandbits(8) for _ in range(256 * 256 * 3)))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def _read_rss_kb(pid: int) -> Optional[int]:
+    """Текущий RSS процесса в KB (Linux /proc)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def _parse_loop_lag(metrics_text: str) -> Dict:
+    """Гистограмма задержки event loop из текста /metrics"""
+    name = "osint_event_loop_lag_histogram_seconds"
+    buckets = {}
+    total = count = 0.0
+    for line in metrics_text.splitlines():
+        if line.startswith(f"{name}_bucket"):
+            le = re.search(r'le="([^"]+)"', line).group(1)
+            buckets[le] = float(line.rsplit(" ", 1)[1])
+        elif line.startswith(f"{name}_sum"):
+            total = float(line.rsplit(" ", 1)[1])
+        elif line.startswith(f"{name}_count"):
+            count = float(line.rsplit(" ", 1)[1])
+    return {"buckets": buckets, "sum": total, "count": count}
+
+
+def _lag_delta(before: Dict, after: Dict) -> Dict:
+    """Задержка event loop за время сценария"""
+    count = after["count"] - before["count"]
+    blocked = after["sum"] - before["sum"]
+    p99_bound = None
+    if count > 0:
+        for le, cumulative in after["buckets"].items():
+            if cumulative - before["buckets"].get(le, 0) >= 0.99 * count:
+                p99_bound = le
+                break
+    return {
+        "samples": int(count),
+        "blocked_seconds": round(blocked, 3),
+        "p99_lag_le_seconds": p99_bound
+    }
+
+
+class Scenario:
+    """Один тип нагрузки на API"""
+
+    def __init__(self, name: str, image: Optional[bytes] = None, max_sites: int = 16):
+        self.name = name
+        self.image = image
+        self.max_sites = max_sites
+
+    async def send(self, session: aiohttp.ClientSession, base_url: str, index: int) -> int:
+        if self.name == "username":
+            payload = {"username": f"benchuser{index}", "max_sites": self.max_sites}
+            async with session.post(f"{base_url}/api/osint/username", json=payload) as response:
+                await response.read()
+                return response.status
+        if self.name == "email":
+            payload = {"email": f"bench{index}@example.com"}
+            async with session.post(f"{base_url}/api/osint/email", json=payload) as response:
+                await response.read()
+                return response.status
+        if self.name == "photo":
+            form = aiohttp.FormData()
+            form.add_field("file", self.image, filename=f"bench{index}.jpg", content_type="image/jpeg")
+            async with session.post(f"{base_url}/api/osint/photo", data=form) as response:
+                await response.read()
+                return response.status
+        raise ValueError(f"Unknown scenario: {self.name}")
+
+
+async def _run_scenario(
+    scenario: Scenario,
+    base_url: str,
+    app_pid: int,
+    concurrency: int,
+    total_requests: int,
+    request_timeout: float
+) -> Dict:
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    peak_rss = _read_rss_kb(app_pid) or 0
+    semaphore = asyncio.Semaphore(concurrency)
+    timeout = aiohttp.ClientTimeout(total=request_timeout)
+
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        async with session.get(f"{base_url}/metrics") as response:
+            lag_before = _parse_loop_lag(await response.text())
+
+        async def one(index: int):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    status = str(await scenario.send(session, base_url, index))
+                except asyncio.TimeoutError:
+                    status = "timeout"
+                except aiohttp.ClientError as e:
+                    status = type(e).__name__
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        async def sample_rss():
+            nonlocal peak_rss
+            while True:
+                peak_rss = max(peak_rss, _read_rss_kb(app_pid) or 0)
+                await asyncio.sleep(0.2)
+
+        sampler = asyncio.create_task(sample_rss())
+        started = time.perf_counter()
+        await asyncio.gather(*[one(i) for i in range(total_requests)])
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+
+        async with session.get(f"{base_url}/metrics") as response:
+            lag_after = _parse_loop_lag(await response.text())
+
+    ok = statuses.get("200", 0)
+    return {
+        "scenario": scenario.name,
+        "requests": total_requests,
+        "concurrency": concurrency,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(total_requests / elapsed, 2) if elapsed else 0.0,
+        "success_rate": round(ok / total_requests, 4) if total_requests else 0.0,
+        "statuses": statuses,
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 50) * 1000, 1),
+            "p95": round(_percentile(latencies, 95) * 1000, 1),
+            "p99": round(_percentile(latencies, 99) * 1000, 1),
+            "max": round(max(latencies) * 1000, 1) if latencies else 0.0
+        },
+        "peak_rss_mb": round(peak_rss / 1024, 1),
+        "event_loop": _lag_delta(lag_before, lag_after)
+    }
+
+
+async def _wait_ready(base_url: str, deadline: float):
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(f"{base_url}/api/health") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"API не поднялся: {base_url}")
+
+
+def _compare_with_baseline(results: List[Dict], baseline_path: str, max_regression: float) -> List[str]:
+    """Сравнение с сохранённым результатом, возвращает список регрессий"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {item["scenario"]: item for item in json.load(f)["results"]}
+
+    regressions = []
+    for result in results:
+        base = baseline.get(result["scenario"])
+        if not base:
+            continue
+        for pct in ("p50", "p95", "p99"):
+            old, new = base["latency_ms"][pct], result["latency_ms"][pct]
+            if old and new > old * (1 + max_regression):
+                regressions.append(f"{result['scenario']} {pct}: {old}ms -> {new}ms")
+        old_rps, new_rps = base["throughput_rps"], result["throughput_rps"]
+        if old_rps and new_rps < old_rps * (1 - max_regression):
+            regressions.append(f"{result['scenario']} throughput: {old_rps} -> {new_rps} rps")
+        old_blocked = base["event_loop"]["blocked_seconds"]
+        new_blocked = result["event_loop"]["blocked_seconds"]
+        if new_blocked > max(old_blocked * (1 + max_regression), 0.5):
+            regressions.append(f"{result['scenario']} event loop blocked: {old_blocked}s -> {new_blocked}s")
+    return regressions
+
+
+async def run(args) -> Dict:
+    mock_port = args.mock_port or _free_port()
+    app_port = args.app_port or _free_port()
+    base_url = f"http://127.0.0.1:{app_port}"
+
+    with tempfile.TemporaryDirectory(prefix="osint-bench-") as tmp:
+        env = dict(os.environ)
+        env["UPSTREAM_OVERRIDE"] = f"http://127.0.0.1:{mock_port}"
+        env["DEBUG"] = "False"
+        if args.fake_cli_latency_ms > 0:
+            _write_fake_cli(Path(tmp), args.fake_cli_latency_ms)
+            env["PATH"] = f"{tmp}{os.pathsep}{env.get('PATH', '')}"
+
+        mock_cmd = [
+            sys.executable, "-m", "benchmarks.mock_upstreams",
+            "--port", str(mock_port),
+            "--latency-ms", str(args.latency_ms),
+            "--jitter-ms", str(args.jitter_ms),
+            "--error-rate", str(args.error_rate),
+            "--rate-limit-rate", str(args.rate_limit_rate),
+            "--found-rate", str(args.found_rate),
+            "--seed", str(args.seed)
+        ]
+        app_cmd = [
+            sys.executable, "-m", "uvicorn", "main_osint:app",
+            "--host", "127.0.0.1", "--port", str(app_port),
+            "--log-level", "warning"
+        ]
+
+        mock_proc = subprocess.Popen(mock_cmd, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL)
+        app_proc = subprocess.Popen(app_cmd, cwd=BACKEND_DIR, env=env)
+        try:
+            await _wait_ready(base_url, time.monotonic() + args.startup_timeout)
+
+            image = _test_image() if "photo" in args.scenarios else None
+            results = []
+            for name in args.scenarios:
+                scenario = Scenario(name, image=image, max_sites=args.max_sites)
+                # Прогрев: соединения, импорты, ленивые инициализации
+                await _run_scenario(scenario, base_url, app_proc.pid, 1, args.warmup, args.request_timeout)
+                result = await _run_scenario(
+                    scenario, base_url, app_proc.pid,
+                    args.concurrency, args.requests, args.request_timeout
+                )
+                results.append(result)
+        finally:
+            app_proc.terminate()
+            mock_proc.terminate()
+            app_proc.wait(timeout=10)
+            mock_proc.wait(timeout=10)
+
+    return {
+        "config": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "error_rate": args.error_rate,
+            "rate_limit_rate": args.rate_limit_rate,
+            "fake_cli_latency_ms": args.fake_cli_latency_ms
+        },
+        "results": results
+    }
+
+
+def _print_report(report: Dict):
+    header = f"{'scenario':<10}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ok %':>8}{'rss MB':>9}{'loop blocked s':>16}"
+    print(header)
+    print("-" * len(header))
+    for r in report["results"]:
+        print(
+            f"{r['scenario']:<10}{r['throughput_rps']:>9}{r['latency_ms']['p50']:>10}"
+            f"{r['latency_ms']['p95']:>10}{r['latency_ms']['p99']:>10}"
+            f"{r['success_rate'] * 100:>8.1f}{r['peak_rss_mb']:>9}"
+            f"{r['event_loop']['blocked_seconds']:>16}"
+        )
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк PeopleFinder OSINT API")
+    parser.add_argument("--scenarios", default="username,email,photo",
+                        type=lambda value: [s.strip() for s in value.split(",") if s.strip()])
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--max-sites", type=int, default=16)
+    parser.add_argument("--request-timeout", type=float, default=120)
+    parser.add_argument("--startup-timeout", type=float, default=30)
+    parser.add_argument("--mock-port", type=int, default=0)
+    parser.add_argument("--app-port", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--found-rate", type=float, default=0.4)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--fake-cli-latency-ms", type=float, default=0,
+                        help="поддельные holehe/maigret в PATH с заданной задержкой (0 = не подменять)")
+    parser.add_argument("--json", dest="json_path", help="сохранить результат в JSON")
+    parser.add_argument("--baseline", help="JSON предыдущего прогона для сравнения")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+    report = asyncio.run(run(args))
+    _print_report(report)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        regressions = _compare_with_baseline(report["results"], args.baseline, args.max_regression)
+        if regressions:
+            print("\nРегрессии:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -24,22 +24,169 @@ DEBUG = os.getenv("DEBUG", "True").lower() == "true"
 
 # Upload settings
 MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", 10485760))  # 10MB
+# Хранилище загрузок: квота, возраст сирот для уборщика, период уборки
+UPLOAD_QUOTA_BYTES = int(os.getenv("UPLOAD_QUOTA_BYTES", 524288000))  # 500MB
+UPLOAD_MAX_AGE_SECONDS = int(os.getenv("UPLOAD_MAX_AGE_SECONDS", 3600))
+UPLOAD_REAP_INTERVAL_SECONDS = int(os.getenv("UPLOAD_REAP_INTERVAL_SECONDS", 300))
 ALLOWED_EXTENSIONS = set(os.getenv("ALLOWED_EXTENSIONS", "jpg,jpeg,png,gif,webp").split(","))
 
 # Search settings
 MAX_USERNAME_SITES = int(os.getenv("MAX_USERNAME_SITES", 50))
 IMAGE_SEARCH_TIMEOUT = int(os.getenv("IMAGE_SEARCH_TIMEOUT", 30))
 USERNAME_SEARCH_TIMEOUT = int(os.getenv("USERNAME_SEARCH_TIMEOUT", 60))
+EMAIL_SEARCH_TIMEOUT = int(os.getenv("EMAIL_SEARCH_TIMEOUT", 90))
+# Варианты username (john.doe, johndoe, jdoe1990...) - проверяются одним пакетом
+USERNAME_VARIANT_MAX_CANDIDATES = int(os.getenv("USERNAME_VARIANT_MAX_CANDIDATES", 50))
+USERNAME_VARIANT_CONCURRENCY = int(os.getenv("USERNAME_VARIANT_CONCURRENCY", 50))
+# Колоночный экспорт пакетных результатов (modules/export.py)
+EXPORT_MAX_TARGETS = int(os.getenv("EXPORT_MAX_TARGETS", 100000))
+EXPORT_CONCURRENCY = int(os.getenv("EXPORT_CONCURRENCY", 8))  # целей в поиске одновременно
+EXPORT_ROW_GROUP_SIZE = int(os.getenv("EXPORT_ROW_GROUP_SIZE", 65536))  # строк в группе Parquet/батче Arrow
+EXPORT_PARQUET_COMPRESSION = os.getenv("EXPORT_PARQUET_COMPRESSION", "zstd")
+
+# Планировщик движков: одновременных запусков на класс (на весь процесс)
+ENGINE_SUBPROCESS_CONCURRENCY = int(os.getenv("ENGINE_SUBPROCESS_CONCURRENCY", 4))  # holehe, maigret
+ENGINE_SCRAPE_CONCURRENCY = int(os.getenv("ENGINE_SCRAPE_CONCURRENCY", 8))  # Yandex, Google, TinEye
+ENGINE_API_CONCURRENCY = int(os.getenv("ENGINE_API_CONCURRENCY", 16))  # HIBP
+
+# Приоритеты и справедливая очередь между API клиентами (modules/fair_queue.py)
+SCHEDULER_SLOTS = int(os.getenv("SCHEDULER_SLOTS", 32))  # одновременных запусков движков
+SCHEDULER_BULK_SLOTS = int(os.getenv("SCHEDULER_BULK_SLOTS", 16))  # из них максимум для пакетных запросов
+SCHEDULER_MAX_QUEUE_INTERACTIVE = int(os.getenv("SCHEDULER_MAX_QUEUE_INTERACTIVE", 256))
+SCHEDULER_MAX_QUEUE_BULK = int(os.getenv("SCHEDULER_MAX_QUEUE_BULK", 512))
+SCHEDULER_MAX_CLIENT_REQUESTS_INTERACTIVE = int(os.getenv("SCHEDULER_MAX_CLIENT_REQUESTS_INTERACTIVE", 32))
+SCHEDULER_MAX_CLIENT_REQUESTS_BULK = int(os.getenv("SCHEDULER_MAX_CLIENT_REQUESTS_BULK", 4))
+API_CLIENT_WEIGHTS = os.getenv("API_CLIENT_WEIGHTS", "")  # "key1:4,key2:2" - веса X-API-Key
+
+# Автоматические выключатели upstream (движки и сайты): после N ошибок подряд
+# вызовы пропускаются, через BREAKER_RESET_SECONDS - пробный вызов
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", 5))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", 30))
+BREAKER_LATENCY_WINDOW = int(os.getenv("BREAKER_LATENCY_WINDOW", 50))  # задержек для p50/p95 в /api/health
+
+# HTTP settings (общий клиент для всех модулей)
+HTTP_RATE_LIMIT = int(os.getenv("HTTP_RATE_LIMIT", 20))  # запросов в секунду
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", 10))
+REGISTRATION_CHECK_TIMEOUT = int(os.getenv("REGISTRATION_CHECK_TIMEOUT", 10))
+# Перенаправление всех внешних запросов на локальный mock (для бенчмарков)
+UPSTREAM_OVERRIDE = os.getenv("UPSTREAM_OVERRIDE", "").rstrip("/")
+
+# Event loop watchdog
+LOOP_WATCHDOG_THRESHOLD_MS = int(os.getenv("LOOP_WATCHDOG_THRESHOLD_MS", 100))  # блокировка дольше - записываем стек
+LOOP_WATCHDOG_INTERVAL_MS = int(os.getenv("LOOP_WATCHDOG_INTERVAL_MS", 50))
+LOOP_PROFILE_MAX_SECONDS = int(os.getenv("LOOP_PROFILE_MAX_SECONDS", 60))
+
+# Tracing settings
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", 2000))  # последних спанов в памяти
+TRACE_EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE", "")  # OTLP/JSON lines файл (пусто = выключено)
 
 # Face recognition settings
+# Косинусное расстояние между эмбеддингами SFace, ниже - строже
 FACE_TOLERANCE = float(os.getenv("FACE_TOLERANCE", 0.6))
+FACE_MODELS_DIR = BASE_DIR / "backend" / "models"
+FACE_DETECTOR_MODEL = Path(os.getenv(
+    "FACE_DETECTOR_MODEL", FACE_MODELS_DIR / "face_detection_yunet_2023mar.onnx"
+))
+FACE_RECOGNIZER_MODEL = Path(os.getenv(
+    "FACE_RECOGNIZER_MODEL", FACE_MODELS_DIR / "face_recognition_sface_2021dec.onnx"
+))
+FACE_WORKERS = int(os.getenv("FACE_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+FACE_BATCH_SIZE = int(os.getenv("FACE_BATCH_SIZE", 8))
+FACE_BATCH_WAIT_MS = int(os.getenv("FACE_BATCH_WAIT_MS", 10))
+FACE_MIN_SCORE = float(os.getenv("FACE_MIN_SCORE", 0.8))
+FACE_DETECT_MAX_SIDE = int(os.getenv("FACE_DETECT_MAX_SIDE", 640))
+FACE_ANALYZE_TIMEOUT = float(os.getenv("FACE_ANALYZE_TIMEOUT", 30))  # секунд на фото в эндпоинтах /api/osint/face
+
+# Face index (эмбеддинги float16 в memmap + HNSW)
+FACE_INDEX_DIR = Path(os.getenv("FACE_INDEX_DIR", BASE_DIR / "backend" / "data" / "face_index"))
+FACE_INDEX_BACKEND = os.getenv("FACE_INDEX_BACKEND", "auto")  # auto | hnsw | numpy
+FACE_INDEX_HNSW_M = int(os.getenv("FACE_INDEX_HNSW_M", 16))
+FACE_INDEX_HNSW_EF_CONSTRUCTION = int(os.getenv("FACE_INDEX_HNSW_EF_CONSTRUCTION", 200))
+FACE_INDEX_HNSW_EF_SEARCH = int(os.getenv("FACE_INDEX_HNSW_EF_SEARCH", 64))
+
+# Avatar harvesting (после поиска по username)
+AVATAR_HARVEST = os.getenv("AVATAR_HARVEST", "True").lower() == "true"
+AVATAR_MAX_BYTES = int(os.getenv("AVATAR_MAX_BYTES", 2097152))  # 2MB
+AVATAR_CONCURRENCY = int(os.getenv("AVATAR_CONCURRENCY", 8))
+AVATAR_FETCH_TIMEOUT = int(os.getenv("AVATAR_FETCH_TIMEOUT", 10))
+AVATAR_HASH_DISTANCE = int(os.getenv("AVATAR_HASH_DISTANCE", 6))  # бит из 64, ниже - строже
+IMAGE_HASH_WORKERS = int(os.getenv("IMAGE_HASH_WORKERS", min(8, os.cpu_count() or 2)))
+
+# Переранжирование reverse image search по миниатюрам
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "True").lower() == "true"
+RERANK_FETCH_BUDGET = int(os.getenv("RERANK_FETCH_BUDGET", 30))  # миниатюр на запрос
+RERANK_DEADLINE = float(os.getenv("RERANK_DEADLINE", 5))  # секунд на загрузку и анализ
+RERANK_CONCURRENCY = int(os.getenv("RERANK_CONCURRENCY", 10))
+RERANK_MAX_THUMBNAIL_BYTES = int(os.getenv("RERANK_MAX_THUMBNAIL_BYTES", 524288))  # 512KB
+RERANK_DUPLICATE_DISTANCE = int(os.getenv("RERANK_DUPLICATE_DISTANCE", 4))
+
+# Граф идентичностей (username, email, домены, URL, хэши изображений)
+IDENTITY_GRAPH_ENABLED = os.getenv("IDENTITY_GRAPH_ENABLED", "True").lower() == "true"
+IDENTITY_GRAPH_PATH = Path(os.getenv("IDENTITY_GRAPH_PATH", BASE_DIR / "backend" / "data" / "identity_graph.sqlite"))
+IDENTITY_GRAPH_MAX_HOPS = int(os.getenv("IDENTITY_GRAPH_MAX_HOPS", 3))
+
+# Мониторинг целей (инкрементальная перепроверка username/email)
+WATCH_ENABLED = os.getenv("WATCH_ENABLED", "True").lower() == "true"
+WATCH_DB_PATH = Path(os.getenv("WATCH_DB_PATH", BASE_DIR / "backend" / "data" / "watch.sqlite"))
+WATCH_INTERVAL_HOURS = float(os.getenv("WATCH_INTERVAL_HOURS", 24))
+WATCH_JITTER = float(os.getenv("WATCH_JITTER", 0.1))  # разброс сроков, доля интервала
+WATCH_RETRY_MINUTES = float(os.getenv("WATCH_RETRY_MINUTES", 30))  # повтор после ошибки
+WATCH_TICK_SECONDS = float(os.getenv("WATCH_TICK_SECONDS", 60))
+WATCH_BATCH_SIZE = int(os.getenv("WATCH_BATCH_SIZE", 1000))  # единиц проверки за тик
+WATCH_CONCURRENCY = int(os.getenv("WATCH_CONCURRENCY", 20))
+WATCH_WEBHOOK_URL = os.getenv("WATCH_WEBHOOK_URL", "")  # POST новых событий (пусто = выключено)
+
+# Индекс доменов платформ (классификация соцпрофилей в выдаче)
+# JSON {"домен": "название" | {"name": ..., "tags": [...]}} - дополняет встроенный
+# список, каталог сайтов и базу maigret
+PLATFORM_DOMAINS_FILE = os.getenv("PLATFORM_DOMAINS_FILE", "")
+
+# Статистика сайтов проверки username и выбор сайтов под max_sites/бюджет
+# времени (modules/site_stats.py): сайты с лучшей пользой в секунду
+SITE_STATS_PATH = Path(os.getenv("SITE_STATS_PATH", BASE_DIR / "backend" / "data" / "site_stats.json"))
+SITE_STATS_WINDOW = int(os.getenv("SITE_STATS_WINDOW", 200))  # проверок, после которых история затухает
+SITE_STATS_SAVE_SECONDS = float(os.getenv("SITE_STATS_SAVE_SECONDS", 300))
+SITE_EXPLORE_FRACTION = float(os.getenv("SITE_EXPLORE_FRACTION", 0.1))  # доля бюджета сайтам без истории
+SITE_BROKEN_ERROR_RATE = float(os.getenv("SITE_BROKEN_ERROR_RATE", 0.8))  # сайт пропускается как сломанный
+SITE_BROKEN_MIN_SAMPLES = int(os.getenv("SITE_BROKEN_MIN_SAMPLES", 5))
+SITE_BROKEN_RETRY_SECONDS = float(os.getenv("SITE_BROKEN_RETRY_SECONDS", 3600))  # повторная попытка сломанного
+
+# Калибровка сайтов (modules/calibration.py): отпечатки ответов на заведомо
+# занятый и свободный username, отсев ложных "найден" (soft-404)
+CALIBRATION_ENABLED = os.getenv("CALIBRATION_ENABLED", "True").lower() == "true"
+CALIBRATION_PATH = Path(os.getenv("CALIBRATION_PATH", BASE_DIR / "backend" / "data" / "site_calibration.json"))
+CALIBRATION_MAX_AGE_HOURS = float(os.getenv("CALIBRATION_MAX_AGE_HOURS", 24))  # обновление отпечатков сайта
+CALIBRATION_RETRY_MINUTES = float(os.getenv("CALIBRATION_RETRY_MINUTES", 30))  # повтор неудачной калибровки
+CALIBRATION_CONCURRENCY = int(os.getenv("CALIBRATION_CONCURRENCY", 4))  # сайтов одновременно
+CALIBRATION_TICK_SECONDS = float(os.getenv("CALIBRATION_TICK_SECONDS", 600))
+
+# Объединение одинаковых одновременных поисков и проверок сайтов (single-flight)
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "True").lower() == "true"
+
+# Пул прокси для запросов к сайтам (опционально): адреса через запятую
+# и/или файл по одному на строку; без них - HTTPS_PROXY/HTTP_PROXY
+PROXY_POOL = os.getenv("PROXY_POOL", "")
+PROXY_POOL_FILE = os.getenv("PROXY_POOL_FILE", "")
+PROXY_FALLBACK = os.getenv("HTTPS_PROXY") or os.getenv("HTTP_PROXY") or ""
+PROXY_MAX_CONCURRENCY = int(os.getenv("PROXY_MAX_CONCURRENCY", 16))  # запросов через прокси одновременно
+PROXY_STICKY_SECONDS = float(os.getenv("PROXY_STICKY_SECONDS", 600))  # закрепление домена за прокси
+PROXY_EVICT_BAN_RATE = float(os.getenv("PROXY_EVICT_BAN_RATE", 0.5))  # доля 403/407/429 для выбывания
+PROXY_EVICT_ERRORS = int(os.getenv("PROXY_EVICT_ERRORS", 3))  # ошибок соединения подряд для выбывания
+PROXY_EVICT_SECONDS = float(os.getenv("PROXY_EVICT_SECONDS", 300))  # время вне пула
+PROXY_MIN_SAMPLES = int(os.getenv("PROXY_MIN_SAMPLES", 10))  # запросов до оценки доли банов
+PROXY_ACQUIRE_TIMEOUT = float(os.getenv("PROXY_ACQUIRE_TIMEOUT", 10))  # ожидание свободного прокси
+
+# WebSocket сессии (/api/ws): поисков на соединение (в работе и в ожидании),
+# одновременно выполняемых и сообщений в очереди отправки клиенту
+WS_MAX_LOOKUPS = int(os.getenv("WS_MAX_LOOKUPS", 64))
+WS_MAX_CONCURRENT = int(os.getenv("WS_MAX_CONCURRENT", 8))
+WS_SEND_QUEUE = int(os.getenv("WS_SEND_QUEUE", 256))
 
-# Proxy settings (опционально)
-PROXIES = {}
-if os.getenv("HTTP_PROXY"):
-    PROXIES["http"] = os.getenv("HTTP_PROXY")
-if os.getenv("HTTPS_PROXY"):
-    PROXIES["https"] = os.getenv("HTTPS_PROXY")
+# Сжатие ответов: кодировки в порядке предпочтения (br - пакет brotli,
+# zstd - пакет zstandard) и минимальный размер тела для сжатия
+RESPONSE_COMPRESSION = [e.strip() for e in os.getenv("RESPONSE_COMPRESSION", "zstd,br,gzip").split(",") if e.strip()]
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", 1024))
 
 # CORS настройки
 CORS_ORIGINS = [
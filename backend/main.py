@@ -9,13 +9,13 @@ from fastapi.responses import JSONResponse, FileResponse
 from pydantic import BaseModel
 from typing import Optional, List
 import os
-import uuid
-import shutil
+import asyncio
 from pathlib import Path
 
 # Импорт наших модулей
 from modules.sherlock_search import search_by_text
 from modules.image_search import search_by_image
+from modules.temp_storage import temp_storage, StorageFull
 import config
 
 
@@ -35,6 +35,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.exception_handler(StorageFull)
+async def storage_full_handler(request, exc: StorageFull):
+    """Квота хранилища загрузок занята файлами запросов в работе"""
+    return JSONResponse(status_code=507, content={"detail": str(exc)}, headers={"Retry-After": "30"})
+
+
 # Монтирование статических файлов
 frontend_path = config.BASE_DIR / "frontend"
 if frontend_path.exists():
@@ -57,28 +64,6 @@ class SearchResponse(BaseModel):
 
 
 # Утилиты
-def save_upload_file(upload_file: UploadFile) -> str:
-    """
-    Сохранение загруженного файла
-
-    Args:
-        upload_file: загруженный файл
-
-    Returns:
-        Путь к сохраненному файлу
-    """
-    # Генерация уникального имени
-    file_extension = os.path.splitext(upload_file.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = config.UPLOAD_DIR / unique_filename
-
-    # Сохранение файла
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(upload_file.file, buffer)
-
-    return str(file_path)
-
-
 def validate_image(file: UploadFile) -> bool:
     """
     Валидация изображения
@@ -186,36 +171,28 @@ async def search_image(file: UploadFile = File(...)):
                 detail="Недопустимый формат или размер файла. Разрешены: jpg, jpeg, png, gif, webp. Максимум 10MB."
             )
 
-        # Сохранение файла
-        file_path = save_upload_file(file)
-
-        try:
-            # Поиск
+        # Файл удаляется хранилищем после поиска
+        async with temp_storage.upload(file) as file_path:
             results = await search_by_image(file_path)
 
-            # Проверка на ошибки
-            if "error" in results:
-                return SearchResponse(
-                    success=False,
-                    results=[],
-                    total_found=0,
-                    message=results["error"]
-                )
-
+        # Проверка на ошибки
+        if "error" in results:
             return SearchResponse(
-                success=True,
-                query=file.filename,
-                results=results.get("results", []),
-                total_found=results.get("total_found", 0),
-                message=f"Поиск завершен. Обнаружено лиц: {results.get('faces_detected', 0)}. Найдено результатов: {results.get('total_found', 0)}"
+                success=False,
+                results=[],
+                total_found=0,
+                message=results["error"]
             )
 
-        finally:
-            # Удаление файла после обработки
-            if os.path.exists(file_path):
-                os.remove(file_path)
+        return SearchResponse(
+            success=True,
+            query=file.filename,
+            results=results.get("results", []),
+            total_found=results.get("total_found", 0),
+            message=f"Поиск завершен. Обнаружено лиц: {results.get('faces_detected', 0)}. Найдено результатов: {results.get('total_found', 0)}"
+        )
 
-    except HTTPException:
+    except (HTTPException, StorageFull):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка при поиске: {str(e)}")
@@ -254,14 +231,10 @@ async def search_combined(
                     detail="Недопустимый формат изображения"
                 )
 
-            file_path = save_upload_file(file)
-            try:
+            async with temp_storage.upload(file) as file_path:
                 image_results = await search_by_image(file_path)
-                results["image_results"] = image_results.get("results", [])
-                results["faces_detected"] = image_results.get("faces_detected", 0)
-            finally:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
+            results["image_results"] = image_results.get("results", [])
+            results["faces_detected"] = image_results.get("faces_detected", 0)
 
         # Поиск по тексту
         if query and len(query) >= 3:
@@ -273,7 +246,7 @@ async def search_combined(
 
         return results
 
-    except HTTPException:
+    except (HTTPException, StorageFull):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка при комбинированном поиске: {str(e)}")
@@ -281,20 +254,12 @@ async def search_combined(
 
 @app.delete("/api/cleanup")
 async def cleanup_uploads():
-    """Очистка старых загруженных файлов"""
-    try:
-        deleted_count = 0
-        for file in config.UPLOAD_DIR.glob("*"):
-            if file.is_file():
-                os.remove(file)
-                deleted_count += 1
-
-        return {
-            "success": True,
-            "message": f"Удалено файлов: {deleted_count}"
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка при очистке: {str(e)}")
+    """Очистка неиспользуемых загруженных файлов (файлы запросов в работе не трогаются)"""
+    result = await asyncio.to_thread(temp_storage.reap, 0, "manual")
+    return {
+        "success": True,
+        "message": f"Удалено файлов: {result['files_deleted']}"
+    }
 
 
 # Запуск приложения
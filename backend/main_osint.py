@@ -2,23 +2,40 @@
 PeopleFinder - OSINT Backend API
 FastAPI приложение с реальными OSINT инструментами
 """
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, field_validator
 from typing import Optional, List, Dict
 import os
-import uuid
-import shutil
 from pathlib import Path
 import asyncio
 import re
 
 # Импорт OSINT модулей
 from modules.email_checker import check_email_comprehensive
-from modules.username_checker import check_username_full
+from modules.username_checker import check_username_full, check_username_variants
 from modules.photo_search import search_by_photo_advanced
+from modules.http_client import close_sessions
+from modules import metrics, tracing
+from modules.loop_watchdog import watchdog
+from modules.face_engine import face_engine
+from modules.face_index import face_index
+from modules.identity_graph import identity_graph, KINDS as graph_kinds
+from modules.watch import watcher, watch_store
+from modules.fair_queue import AdmissionMiddleware, get_scheduler, client_id
+from modules.proxy_pool import get_proxy_pool
+from modules.site_stats import site_stats
+from modules.calibration import calibrator
+from modules.circuit_breaker import breakers, STATE_CLOSED, STATE_OPEN
+from modules.temp_storage import temp_storage, StorageFull
+from modules.responses import FastJSONResponse, conditional_response
+from modules.compression import CompressionMiddleware
+from modules.ws_session import InvestigationSession
+from modules import export
+from modules import domain_index, image_hash
+from modules.engines import registry as engine_registry, CAPABILITY_EMAIL, CAPABILITY_USERNAME, CAPABILITY_IMAGE
 
 # Старые модули (для обратной совместимости)
 from modules.sherlock_search import search_by_text
@@ -31,6 +48,7 @@ import config
 # ============================================
 
 app = FastAPI(
+    default_response_class=FastJSONResponse,
     title="PeopleFinder OSINT API",
     description="Профессиональный OSINT API для поиска людей по фото, email и username",
     version="2.0.0",
@@ -47,6 +65,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Приоритеты и справедливая очередь между клиентами (429 при перегрузке)
+app.add_middleware(AdmissionMiddleware)
+
+# Сжатие ответов gzip/br/zstd по Accept-Encoding (внешний слой)
+app.add_middleware(CompressionMiddleware)
+
+
+@app.exception_handler(StorageFull)
+async def storage_full_handler(request, exc: StorageFull):
+    """Квота хранилища загрузок занята файлами запросов в работе"""
+    return JSONResponse(status_code=507, content={"detail": str(exc)}, headers={"Retry-After": "30"})
+
 # Монтирование статических файлов
 frontend_path = config.BASE_DIR / "frontend"
 if frontend_path.exists():
@@ -80,6 +110,28 @@ class UsernameCheckRequest(BaseModel):
     username: str
     max_sites: Optional[int] = 20
     extract_metadata: bool = True
+    variants: bool = False  # дополнительно проверить варианты username
+    time_budget: Optional[float] = None  # секунд на поиск; сайты выбираются под бюджет
+
+
+class WatchRequest(BaseModel):
+    kind: str  # username | email
+    value: str
+    interval_hours: Optional[float] = None  # по умолчанию WATCH_INTERVAL_HOURS
+
+
+class UsernameVariantsRequest(BaseModel):
+    name: Optional[str] = None  # "Иван Петров", "John Doe"
+    email: Optional[str] = None
+    seed: Optional[str] = None  # известный username
+    years: Optional[List[int]] = None  # год рождения для суффиксов
+    max_sites: Optional[int] = 20
+    max_candidates: int = config.USERNAME_VARIANT_MAX_CANDIDATES
+
+
+class ExportRequest(BaseModel):
+    targets: List[str]  # usernames или email
+    max_sites: Optional[int] = 20  # сайтов на username
 
 
 class OSINTResponse(BaseModel):
@@ -93,18 +145,6 @@ class OSINTResponse(BaseModel):
 # Utility Functions
 # ============================================
 
-def save_upload_file(upload_file: UploadFile) -> str:
-    """Сохранение загруженного файла"""
-    file_extension = os.path.splitext(upload_file.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = config.UPLOAD_DIR / unique_filename
-
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(upload_file.file, buffer)
-
-    return str(file_path)
-
-
 def validate_image(file: UploadFile) -> bool:
     """Валидация изображения"""
     file_extension = os.path.splitext(file.filename)[1].lower().replace(".", "")
@@ -121,13 +161,63 @@ def validate_image(file: UploadFile) -> bool:
     return True
 
 
-def cleanup_file(file_path: str):
-    """Фоновая очистка файла"""
-    try:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-    except:
-        pass
+# ============================================
+# Application Lifecycle
+# ============================================
+
+# Фоновые задачи приложения (отменяются при остановке)
+background_jobs: List[asyncio.Task] = []
+
+
+@app.on_event("startup")
+async def start_loop_watchdog():
+    """Запуск сторожа event loop (задержка для /metrics + стеки блокировок)"""
+    watchdog.start()
+
+
+@app.on_event("startup")
+async def build_platform_index():
+    """Сборка индекса доменов платформ заранее (база maigret - тысячи сайтов)"""
+    await asyncio.to_thread(domain_index.platform_index)
+
+
+@app.on_event("startup")
+async def start_upload_reaper():
+    """Фоновая уборка осиротевших загрузок (первый проход - сразу)"""
+    temp_storage.start_reaper(config.UPLOAD_REAP_INTERVAL_SECONDS)
+
+
+@app.on_event("startup")
+async def start_watcher():
+    """Фоновая перепроверка целей мониторинга"""
+    if config.WATCH_ENABLED:
+        background_jobs.append(asyncio.create_task(watcher.run(config.WATCH_TICK_SECONDS)))
+
+
+@app.on_event("startup")
+async def start_calibration():
+    """Фоновая калибровка сайтов проверки username (отсев soft-404)"""
+    sites = engine_registry.get("sites")
+    if config.CALIBRATION_ENABLED and sites is not None:
+        background_jobs.append(asyncio.create_task(calibrator.run(sites, config.CALIBRATION_TICK_SECONDS)))
+
+
+@app.on_event("shutdown")
+async def shutdown_http_client():
+    """Остановка фоновых задач и закрытие общей HTTP сессии"""
+    watchdog.stop()
+    temp_storage.stop_reaper()
+    face_engine.shutdown()
+    image_hash.shutdown()
+    await asyncio.to_thread(face_index.close)
+    await asyncio.to_thread(identity_graph.close)
+    for job in background_jobs:
+        job.cancel()
+    background_jobs.clear()
+    await asyncio.to_thread(watch_store.close)
+    await asyncio.to_thread(site_stats.save)
+    await close_sessions()
+    await asyncio.to_thread(tracing.exporter.close)
 
 
 # ============================================
@@ -165,28 +255,144 @@ async def debug_page():
 # API Health & Info
 # ============================================
 
+def _engine_health() -> Dict[str, Dict]:
+    """Доступность, состояние выключателя и задержки каждого движка"""
+    report = {}
+    for engine in engine_registry.all_engines():
+        entry = {"available": engine.available()}
+        if engine.circuit_breaker:
+            entry.update(breakers.engine(engine.name).snapshot())
+        report[engine.name] = entry
+    return report
+
+
+def _engine_usable(entry: Dict) -> bool:
+    return entry["available"] and entry.get("state", STATE_CLOSED) != STATE_OPEN
+
+
 @app.get("/api/health")
 async def health_check():
-    """Проверка работоспособности API"""
+    """
+    Состояние API и upstream источников
+
+    status: healthy - все выключатели замкнуты, degraded - часть движков
+    или сайтов сейчас пропускается (выключатель разомкнут или на пробе)
+    """
+    engines = _engine_health()
+    # Выключатели отдельных сайтов: site:<сайт> и registration:<сайт>
+    sites = {name: entry for name, entry in breakers.snapshot().items() if not name.startswith("engine:")}
+    tripped_sites = {name: entry for name, entry in sites.items() if entry["state"] != STATE_CLOSED}
+    tripped_engines = sorted(
+        name for name, entry in engines.items() if entry.get("state", STATE_CLOSED) != STATE_CLOSED
+    )
+
     return {
-        "status": "healthy",
+        "status": "degraded" if tripped_engines or tripped_sites else "healthy",
         "version": "2.0.0",
-        "services": {
-            "email_checker": "operational",
-            "username_checker": "operational",
-            "photo_search": "operational"
-        },
-        "osint_tools": {
-            "holehe": "integrated",
-            "haveibeenpwned": "integrated",
-            "maigret_logic": "integrated",
-            "yandex_images": "integrated",
-            "google_images": "integrated",
-            "tineye": "integrated"
-        }
+        "engines": engines,
+        "sites": {"tracked": len(sites), "tripped": tripped_sites},
+        "tripped_engines": tripped_engines,
+        "scheduler": get_scheduler().stats()
     }
 
 
+@app.get("/api/ready")
+async def readiness_check():
+    """
+    Готовность к приёму запросов: для каждого типа поиска есть хотя бы
+    один доступный движок, выключатель которого не разомкнут
+
+    Returns:
+        200 или 503 с перечнем типов поиска без рабочих движков
+    """
+    engines = _engine_health()
+    unavailable = [
+        capability for capability in (CAPABILITY_EMAIL, CAPABILITY_USERNAME, CAPABILITY_IMAGE)
+        if not any(
+            _engine_usable(engines[engine.name])
+            for engine in engine_registry.engines_for(capability)
+        )
+    ]
+    body = {"ready": not unavailable, "unavailable": unavailable}
+    return JSONResponse(status_code=503 if unavailable else 200, content=body)
+
+
+@app.get("/api/engines")
+async def list_engines():
+    """Зарегистрированные OSINT движки: capabilities, стоимость, класс лимита, доступность"""
+    return {"engines": [engine.describe() for engine in engine_registry.all_engines()]}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Метрики в формате Prometheus (латентность движков и сайтов, исходы, in-flight)"""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/api/admin/traces")
+async def recent_traces(limit: int = 100):
+    """Последние завершённые спаны (OTLP/JSON)"""
+    return {"spans": tracing.recent_spans(min(limit, config.TRACE_BUFFER_SIZE))}
+
+
+@app.get("/api/admin/loop")
+async def loop_status(limit: int = 20):
+    """Задержка event loop и последние блокирующие вызовы со стеками"""
+    return watchdog.report(limit)
+
+
+@app.get("/api/admin/scheduler")
+async def scheduler_status():
+    """Слоты и очереди планировщика по классам приоритета"""
+    return get_scheduler().stats()
+
+
+@app.get("/api/admin/sites")
+async def sites_status():
+    """Статистика сайтов проверки username по убыванию пользы в секунду"""
+    return site_stats.snapshot()
+
+
+@app.get("/api/admin/calibration")
+async def calibration_status():
+    """Калибровка сайтов: режим (status, soft404, indistinct, error) и отпечатки"""
+    return calibrator.snapshot()
+
+
+@app.post("/api/admin/calibration")
+async def calibration_refresh():
+    """Внеочередная калибровка всех сайтов каталога"""
+    sites = engine_registry.get("sites")
+    if sites is None:
+        raise HTTPException(status_code=503, detail="Движок sites не зарегистрирован")
+    return await calibrator.refresh(sites, force=True)
+
+
+@app.get("/api/admin/proxies")
+async def proxies_status():
+    """Прокси пула: задержка, доля банов, запросы в работе, выбывания"""
+    return get_proxy_pool().snapshot()
+
+
+@app.post("/api/admin/loop/profile")
+async def loop_profile(seconds: float = 5, top: int = 30):
+    """
+    Сэмплирующий профайлер event loop на N секунд
+
+    Args:
+        seconds: длительность (не больше LOOP_PROFILE_MAX_SECONDS)
+        top: количество самых частых стеков в ответе
+
+    Returns:
+        Топ функций и collapsed stacks (для flamegraph.pl)
+    """
+    seconds = max(0.1, min(seconds, config.LOOP_PROFILE_MAX_SECONDS))
+    result = await asyncio.to_thread(watchdog.profile, seconds, 0.005, top)
+    if "error" in result:
+        raise HTTPException(status_code=409, detail=result["error"])
+    return result
+
+
 @app.get("/api/info")
 async def api_info():
     """Информация об API и доступных методах"""
@@ -197,9 +403,17 @@ async def api_info():
         "endpoints": {
             "email": "/api/osint/email - Глубокая проверка email (утечки + регистрации)",
             "username": "/api/osint/username - Поиск по username на 20+ платформах",
+            "username_variants": "/api/osint/username/variants - Поиск по вариантам username из имени/email",
             "photo": "/api/osint/photo - Reverse image search (Yandex + Google + TinEye)",
             "legacy_text": "/api/search/text - Старый метод поиска по тексту",
-            "legacy_image": "/api/search/image - Старый метод поиска по фото"
+            "legacy_image": "/api/search/image - Старый метод поиска по фото",
+            "face_match": "/api/osint/face/match - Поиск лица среди собранных аватаров и миниатюр",
+            "watch": "/api/watch - Мониторинг username/email с событиями об изменениях",
+            "graph": "/api/osint/graph - Связанные сущности из предыдущих поисков (k-hop)",
+            "engines": "/api/engines - Список OSINT движков",
+            "health": "/api/health - Состояние движков и сайтов (circuit breakers, задержки)",
+            "ready": "/api/ready - Готовность (503, если для типа поиска нет рабочих движков)",
+            "metrics": "/metrics - Метрики в формате Prometheus"
         },
         "features": [
             "HaveIBeenPwned integration для проверки утечек",
@@ -218,7 +432,7 @@ async def api_info():
 # ============================================
 
 @app.post("/api/osint/email")
-async def check_email_osint(request: EmailCheckRequest):
+async def check_email_osint(request: EmailCheckRequest, http_request: Request, trace: bool = False):
     """
     🔥 OSINT проверка email адреса
 
@@ -230,33 +444,38 @@ async def check_email_osint(request: EmailCheckRequest):
 
     Args:
         request: EmailCheckRequest с параметрами
+        trace: добавить в ответ тайминги всех этапов (?trace=1)
 
     Returns:
-        Полный отчёт по email
+        Полный отчёт по email (с ETag; 304 при совпадении If-None-Match)
     """
     import time
     start_time = time.time()
 
     try:
         # Запускаем полную проверку
-        result = await check_email_comprehensive(request.email)
+        with tracing.collect("api.osint.email", enabled=trace) as collector:
+            result = await check_email_comprehensive(request.email)
 
         processing_time = time.time() - start_time
 
-        return {
+        response = {
             "success": result.get("success", True),
             "email": request.email,
             "data": result,
             "processing_time": round(processing_time, 2),
             "timestamp": int(time.time())
         }
+        if trace:
+            response["trace"] = collector.waterfall()
+        return conditional_response(http_request, response)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка при проверке email: {str(e)}")
 
 
 @app.post("/api/osint/username")
-async def check_username_osint(request: UsernameCheckRequest):
+async def check_username_osint(request: UsernameCheckRequest, http_request: Request, trace: bool = False):
     """
     🔥 OSINT поиск по username
 
@@ -268,6 +487,7 @@ async def check_username_osint(request: UsernameCheckRequest):
 
     Args:
         request: UsernameCheckRequest с параметрами
+        trace: добавить в ответ тайминги всех этапов (?trace=1)
 
     Returns:
         Полный отчёт по username
@@ -277,26 +497,70 @@ async def check_username_osint(request: UsernameCheckRequest):
 
     try:
         # Запускаем полную проверку
-        result = await check_username_full(request.username, request.max_sites)
+        with tracing.collect("api.osint.username", enabled=trace) as collector:
+            result = await check_username_full(
+                request.username, request.max_sites, variants=request.variants,
+                time_budget=request.time_budget
+            )
 
         processing_time = time.time() - start_time
 
-        return {
+        response = {
             "success": True,
             "username": request.username,
             "data": result,
             "processing_time": round(processing_time, 2),
             "timestamp": int(time.time())
         }
+        if trace:
+            response["trace"] = collector.waterfall()
+        # Напрямую, без jsonable_encoder: сотни записей сериализуются orjson
+        return conditional_response(http_request, response)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка при поиске username: {str(e)}")
 
 
+@app.post("/api/osint/username/variants")
+async def check_username_variants_osint(request: UsernameVariantsRequest, http_request: Request):
+    """
+    Поиск аккаунтов по вариантам username
+
+    Варианты строятся из имени, локальной части email или известного
+    username (john.doe, johndoe, john_doe, jdoe1990...) и проверяются одним
+    пакетом; сайты, не допускающие вариант (regexCheck), не запрашиваются.
+
+    Returns:
+        Кандидаты, найденные аккаунты по вариантам, число запросов и пропусков
+    """
+    import time
+    start_time = time.time()
+
+    if not (request.name or request.email or request.seed):
+        raise HTTPException(status_code=400, detail="Нужно указать name, email или seed")
+
+    result = await check_username_variants(
+        request.name,
+        request.email,
+        request.seed,
+        request.years,
+        request.max_sites,
+        max(1, min(request.max_candidates, 200))
+    )
+    return conditional_response(http_request, {
+        "success": True,
+        "data": result,
+        "processing_time": round(time.time() - start_time, 2)
+    })
+
+
 @app.post("/api/osint/photo")
 async def check_photo_osint(
+    http_request: Request,
     file: UploadFile = File(...),
-    background_tasks: BackgroundTasks = None
+    trace: bool = False,
+    rerank: bool = True,
+    all_results: bool = True
 ):
     """
     🔥 OSINT поиск по фотографии
@@ -310,6 +574,10 @@ async def check_photo_osint(
 
     Args:
         file: Изображение для поиска
+        trace: добавить в ответ тайминги всех этапов (?trace=1)
+        rerank: переранжировать по сходству миниатюр (?rerank=0 - отключить)
+        all_results: включить объединённый список all_results (?all_results=0 -
+            только результаты по движкам в results, ответ примерно вдвое меньше)
 
     Returns:
         Результаты от всех сервисов + социальные профили
@@ -325,36 +593,221 @@ async def check_photo_osint(
                 detail="Недопустимый формат или размер файла"
             )
 
-        # Сохранение
-        file_path = save_upload_file(file)
+        # Файл живёт, пока идёт поиск; удаляется при выходе из блока
+        async with temp_storage.upload(file) as file_path:
+            with tracing.collect("api.osint.photo", enabled=trace) as collector:
+                result = await search_by_photo_advanced(file_path, rerank=rerank and config.RERANK_ENABLED)
+        if not all_results:
+            result.pop("all_results", None)
 
+        processing_time = time.time() - start_time
+
+        response = {
+            "success": result.get("success", True),
+            "filename": file.filename,
+            "data": result,
+            "processing_time": round(processing_time, 2),
+            "timestamp": int(time.time())
+        }
+        if trace:
+            response["trace"] = collector.waterfall()
+        return conditional_response(http_request, response)
+
+    except (HTTPException, StorageFull):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка при поиске по фото: {str(e)}")
+
+
+# ============================================
+# Face Index (поиск по собранным лицам)
+# ============================================
+
+async def _faces_from_upload(file: UploadFile) -> List[Dict]:
+    """Сохранение загрузки, извлечение лиц и удаление файла"""
+    if not validate_image(file):
+        raise HTTPException(status_code=400, detail="Недопустимый формат или размер файла")
+    if not face_engine.available():
+        raise HTTPException(status_code=503, detail="Face pipeline недоступен (нет OpenCV или моделей)")
+
+    async with temp_storage.upload(file) as file_path:
         try:
-            # Запускаем поиск
-            result = await search_by_photo_advanced(file_path)
+            return await asyncio.wait_for(face_engine.analyze(file_path), config.FACE_ANALYZE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Face pipeline не ответил вовремя")
+        except (OSError, RuntimeError) as e:
+            # BrokenProcessPool - RuntimeError; пул пересоздаётся при следующем вызове
+            raise HTTPException(status_code=503, detail=f"Ошибка face pipeline: {e}")
 
-            processing_time = time.time() - start_time
 
-            # Планируем удаление файла
-            if background_tasks:
-                background_tasks.add_task(cleanup_file, file_path)
+@app.post("/api/osint/face/match")
+async def match_face(
+    file: UploadFile = File(...),
+    top_k: int = Form(10),
+    tolerance: Optional[float] = Form(None)
+):
+    """
+    Поиск лиц с фото среди уже собранных (аватары, миниатюры reverse search)
 
-            return {
-                "success": result.get("success", True),
-                "filename": file.filename,
-                "data": result,
-                "processing_time": round(processing_time, 2),
-                "timestamp": int(time.time())
-            }
+    Args:
+        file: изображение с лицом
+        top_k: количество совпадений на каждое лицо
+        tolerance: максимальное косинусное расстояние (по умолчанию FACE_TOLERANCE)
 
-        finally:
-            # Удаляем файл сразу если background_tasks не используется
-            if not background_tasks:
-                cleanup_file(file_path)
+    Returns:
+        Для каждого найденного лица - список совпадений из индекса
+    """
+    import time
+    start_time = time.time()
+
+    faces = await _faces_from_upload(file)
+    top_k = max(1, min(top_k, 100))
+    matches = await asyncio.gather(*[
+        asyncio.to_thread(face_index.search, face["embedding"], top_k, tolerance)
+        for face in faces
+    ])
+
+    return {
+        "success": True,
+        "faces_detected": len(faces),
+        "faces": [
+            {"bbox": face["bbox"], "score": face["score"], "matches": face_matches}
+            for face, face_matches in zip(faces, matches)
+        ],
+        "index_size": await asyncio.to_thread(len, face_index),
+        "processing_time": round(time.time() - start_time, 3)
+    }
+
+
+@app.post("/api/osint/face/index")
+async def index_face(
+    file: UploadFile = File(...),
+    url: Optional[str] = Form(None),
+    source: str = Form("manual"),
+    label: Optional[str] = Form(None)
+):
+    """Добавление всех лиц с фото в индекс"""
+    faces = await _faces_from_upload(file)
+    if not faces:
+        return {"success": False, "error": "Лица не обнаружены на изображении", "ids": []}
+
+    import numpy as np
+    metadata = [
+        {"source": source, "url": url, "label": label, "bbox": face["bbox"]}
+        for face in faces
+    ]
+    ids = await asyncio.to_thread(
+        face_index.add, np.vstack([face["embedding"] for face in faces]), metadata
+    )
+    return {"success": True, "ids": ids}
+
+
+@app.delete("/api/osint/face/{face_id}")
+async def delete_face(face_id: int):
+    """Удаление лица из индекса"""
+    removed = await asyncio.to_thread(face_index.remove, face_id)
+    if not removed:
+        raise HTTPException(status_code=404, detail="Лицо не найдено")
+    return {"success": True, "id": face_id}
+
+
+@app.get("/api/osint/graph")
+async def identity_graph_neighborhood(
+    http_request: Request,
+    kind: str,
+    value: str,
+    hops: int = 2,
+    kinds: Optional[str] = None,
+    limit: int = 500
+):
+    """
+    Связанные сущности из графа идентичностей (без новых запросов в сеть)
+
+    Args:
+        kind: тип сущности (username, email, domain, url, image)
+        value: значение (email, username, URL или pHash)
+        hops: глубина обхода (не больше IDENTITY_GRAPH_MAX_HOPS)
+        kinds: через запятую - вернуть только эти типы (например url)
+        limit: максимум сущностей в ответе
+
+    Returns:
+        Найденные сущности с глубиной и связи между ними с движками
+    """
+    import time
+    start_time = time.time()
+
+    if kind not in graph_kinds:
+        raise HTTPException(status_code=400, detail=f"kind должен быть одним из: {', '.join(graph_kinds)}")
+    wanted = [k.strip() for k in kinds.split(",") if k.strip()] if kinds else None
+
+    result = await asyncio.to_thread(
+        identity_graph.neighborhood, kind, value, hops, wanted, max(1, min(limit, 5000))
+    )
+    if result is None:
+        raise HTTPException(status_code=404, detail="Сущность не встречалась в предыдущих поисках")
+    result["processing_time"] = round(time.time() - start_time, 4)
+    return conditional_response(http_request, result)
+
+
+@app.get("/api/osint/graph/stats")
+async def identity_graph_stats():
+    """Размер графа идентичностей: сущности по типам и число связей"""
+    return await asyncio.to_thread(identity_graph.stats)
+
+
+# ============================================
+# Мониторинг целей
+# ============================================
+
+@app.post("/api/watch")
+async def add_watch_target(request: WatchRequest):
+    """
+    Поставить username или email на мониторинг
+
+    Первая проверка (базовое состояние) выполняется при ближайшем тике,
+    дальше - только просроченные сайты/утечки с условными запросами.
+    События об изменениях - /api/watch/events.
+    """
+    interval = request.interval_hours * 3600 if request.interval_hours else None
+    try:
+        target_id = await watcher.add(request.kind, request.value, interval)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, "id": target_id}
+
+
+@app.get("/api/watch")
+async def list_watch_targets():
+    """Цели мониторинга: число единиц проверки, найденных аккаунтов, сроки"""
+    return {"targets": await asyncio.to_thread(watch_store.targets)}
+
+
+@app.delete("/api/watch/{target_id}")
+async def delete_watch_target(target_id: int):
+    """Снять цель с мониторинга (вместе с состоянием и событиями)"""
+    if not await asyncio.to_thread(watch_store.remove_target, target_id):
+        raise HTTPException(status_code=404, detail="Цель не найдена")
+    return {"success": True, "id": target_id}
+
+
+@app.get("/api/watch/events")
+async def watch_events(since_id: int = 0, target_id: Optional[int] = None, limit: int = 100):
+    """
+    Изменения по целям мониторинга (только диффы)
+
+    Args:
+        since_id: вернуть события после этого id (для инкрементального опроса)
+        target_id: только по одной цели
+        limit: максимум событий
+    """
+    events = await asyncio.to_thread(watch_store.events, since_id, target_id, max(1, min(limit, 1000)))
+    return {"events": events, "last_id": events[-1]["id"] if events else since_id}
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка при поиске по фото: {str(e)}")
+
+@app.post("/api/watch/run")
+async def run_watch_tick():
+    """Внеочередная перепроверка просроченных единиц (статистика тика)"""
+    return await watcher.tick()
 
 
 # ============================================
@@ -403,18 +856,16 @@ async def search_image_legacy(file: UploadFile = File(...)):
         if not validate_image(file):
             raise HTTPException(status_code=400, detail="Invalid file")
 
-        file_path = save_upload_file(file)
-
-        try:
+        async with temp_storage.upload(file) as file_path:
             result = await search_by_image(file_path)
-            return {
-                "success": True if not result.get("error") else False,
-                "results": result.get("results", []),
-                "total_found": result.get("total_found", 0)
-            }
-        finally:
-            cleanup_file(file_path)
+        return {
+            "success": True if not result.get("error") else False,
+            "results": result.get("results", []),
+            "total_found": result.get("total_found", 0)
+        }
 
+    except (HTTPException, StorageFull):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -424,7 +875,7 @@ async def search_image_legacy(file: UploadFile = File(...)):
 # ============================================
 
 @app.post("/api/osint/batch/usernames")
-async def batch_check_usernames(usernames: List[str], max_sites: int = 10):
+async def batch_check_usernames(usernames: List[str], http_request: Request, max_sites: int = 10):
     """
     Пакетная проверка множества usernames
 
@@ -438,28 +889,153 @@ async def batch_check_usernames(usernames: List[str], max_sites: int = 10):
     if len(usernames) > 20:
         raise HTTPException(status_code=400, detail="Максимум 20 usernames за раз")
 
-    results = []
-
-    for username in usernames:
+    # Пакет идёт с приоритетом bulk (AdmissionMiddleware): движки ждут
+    # слотов после одиночных поисков, поэтому username проверяются параллельно
+    async def check_one(username: str) -> Dict:
         try:
             result = await check_username_full(username, max_sites)
-            results.append({
+            return {
                 "username": username,
                 "success": True,
                 "data": result
-            })
+            }
         except Exception as e:
-            results.append({
+            return {
                 "username": username,
                 "success": False,
                 "error": str(e)
-            })
+            }
 
-    return {
+    results = await asyncio.gather(*[check_one(username) for username in usernames])
+
+    return conditional_response(http_request, {
         "success": True,
         "total_checked": len(usernames),
         "results": results
-    }
+    })
+
+
+# ============================================
+# WebSocket сессия (много поисков по одному соединению)
+# ============================================
+
+@app.websocket("/api/ws")
+async def investigation_socket(websocket: WebSocket, api_key: Optional[str] = None):
+    """
+    Сессия расследования: параллельные поиски email, username и фото с
+    id запроса, частичными результатами по движкам и отменой.
+    Протокол - в modules/ws_session.py.
+
+    Args:
+        api_key: ключ клиента для справедливой очереди (если нельзя задать X-API-Key)
+    """
+    await websocket.accept()
+    await InvestigationSession(websocket, client_id(websocket.scope, api_key)).run()
+
+
+# ============================================
+# Export (Parquet / Arrow / CSV)
+# ============================================
+
+def _export_response(fmt: str, kind: str, rows, on_close=None) -> StreamingResponse:
+    """Потоковый ответ экспорта; on_close вызывается, когда поток закончен или оборван"""
+    try:
+        writer = export.make_writer(fmt)
+    except export.ExportError as e:
+        raise HTTPException(status_code=501 if fmt in export.FORMATS else 400, detail=str(e))
+
+    async def body():
+        try:
+            async for chunk in export.encode_stream(rows, writer):
+                yield chunk
+        finally:
+            await rows.aclose()
+            if on_close is not None:
+                await on_close()
+
+    extension = "arrows" if fmt == export.FORMAT_ARROW else fmt
+    return StreamingResponse(
+        body(),
+        media_type=export.MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{kind}-export.{extension}"'}
+    )
+
+
+@app.post("/api/export/photo")
+async def export_photo_results(
+    files: List[UploadFile] = File(...),
+    format: str = export.FORMAT_PARQUET,
+    rerank: bool = True
+):
+    """
+    Экспорт поиска по фотографиям (строка на каждый найденный результат)
+
+    Args:
+        files: изображения (target = имя файла)
+        format: parquet | arrow | csv
+        rerank: переранжировать по сходству миниатюр
+    """
+    if len(files) > config.EXPORT_MAX_TARGETS:
+        raise HTTPException(status_code=400, detail=f"Максимум {config.EXPORT_MAX_TARGETS} файлов за раз")
+    for file in files:
+        if not validate_image(file):
+            raise HTTPException(status_code=400, detail=f"Недопустимый формат или размер файла {file.filename}")
+
+    # Файлы держатся в хранилище до конца потока экспорта
+    paths = []
+    try:
+        for file in files:
+            paths.append(await asyncio.to_thread(temp_storage.save, file.file, file.filename or ""))
+    except BaseException:
+        for path in paths:
+            await asyncio.to_thread(temp_storage.release, path)
+        raise
+
+    async def release():
+        for path in paths:
+            await asyncio.to_thread(temp_storage.release, path)
+
+    async def lookup(path: str) -> Dict:
+        return await search_by_photo_advanced(path, rerank=rerank and config.RERANK_ENABLED)
+
+    rows = export.lookup_rows(
+        ((file.filename or path, path) for file, path in zip(files, paths)), lookup, export.photo_rows
+    )
+    try:
+        return _export_response(format, "photo", rows, on_close=release)
+    except HTTPException:
+        await release()
+        raise
+
+
+@app.post("/api/export/{kind}")
+async def export_results(kind: str, request: ExportRequest, format: str = export.FORMAT_PARQUET):
+    """
+    Колоночный экспорт пакетного поиска по usernames или email
+
+    Схема: target, site, status, confidence, http_status, latency_ms,
+    fetched_at. Ответ пишется потоком по группам строк
+    (EXPORT_ROW_GROUP_SIZE), поэтому память не растёт с числом целей.
+
+    Args:
+        kind: username | email
+        request: цели и число сайтов на username
+        format: parquet | arrow | csv (parquet и arrow требуют pyarrow)
+    """
+    if len(request.targets) > config.EXPORT_MAX_TARGETS:
+        raise HTTPException(status_code=400, detail=f"Максимум {config.EXPORT_MAX_TARGETS} целей за раз")
+
+    if kind == "username":
+        async def lookup(username: str) -> Dict:
+            return await check_username_full(username, request.max_sites, harvest_avatars=False)
+        to_rows = export.username_rows
+    elif kind == "email":
+        lookup, to_rows = check_email_comprehensive, export.email_rows
+    else:
+        raise HTTPException(status_code=400, detail="kind должен быть username или email")
+
+    rows = export.lookup_rows(((target, target) for target in request.targets), lookup, to_rows)
+    return _export_response(format, kind, rows)
 
 
 # ============================================
@@ -467,18 +1043,24 @@ async def batch_check_usernames(usernames: List[str], max_sites: int = 10):
 # ============================================
 
 @app.delete("/api/cleanup")
-async def cleanup_uploads():
-    """Очистка загруженных файлов"""
-    try:
-        deleted_count = 0
-        for file in config.UPLOAD_DIR.glob("*"):
-            if file.is_file():
-                os.remove(file)
-                deleted_count += 1
+async def cleanup_uploads(max_age: int = 0):
+    """
+    Очистка загруженных файлов
 
-        return {"success": True, "files_deleted": deleted_count}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    Файлы запросов в работе не удаляются; файлы, которых этот процесс
+    не знает, - только если им больше минуты (могут быть чужими).
+
+    Args:
+        max_age: удалять файлы старше N секунд (0 - все неиспользуемые)
+    """
+    result = await asyncio.to_thread(temp_storage.reap, max_age, "manual")
+    return {"success": True, **result}
+
+
+@app.get("/api/admin/uploads")
+async def uploads_usage():
+    """Занятое загрузками место, квота и файлы в работе"""
+    return temp_storage.usage()
 
 
 # ============================================
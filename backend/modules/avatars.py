@@ -0,0 +1,228 @@
+"""
+Сбор и сопоставление аватаров найденных профилей
+
+После поиска по username у части профилей есть avatar_url. Этот модуль:
+1. скачивает аватары параллельно через общий HTTP клиент (потоково,
+   с ограничением размера)
+2. считает pHash в пуле потоков и эмбеддинги лиц через face_engine
+3. добавляет лица в face_index (для последующего поиска по фото)
+4. объединяет профили с одинаковыми аватарами в кластеры
+
+Кластер из нескольких платформ - сильный признак того, что профили
+принадлежат одному человеку, и для этого не нужен второй круг запросов.
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import config
+from modules import image_hash, metrics, tracing
+from modules.face_engine import face_engine, is_match
+from modules.face_index import face_index
+from modules.http_client import fetch_limited
+
+
+logger = logging.getLogger(__name__)
+
+# Заглушки вместо аватара совпадают у всех пользователей платформы
+_DEFAULT_AVATAR_MARKERS = ("default", "placeholder", "no-avatar", "noavatar", "blank", "anonymous")
+
+
+def _is_default_avatar(url: str) -> bool:
+    lowered = url.lower()
+    return any(marker in lowered for marker in _DEFAULT_AVATAR_MARKERS)
+
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, item: int) -> int:
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a: int, b: int):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+class AvatarHarvester:
+    """
+    Загрузка, отпечатки и кластеризация аватаров
+
+    Args:
+        max_bytes: максимальный размер аватара
+        concurrency: одновременных загрузок
+        timeout: таймаут загрузки одного аватара
+        hash_distance: максимальное расстояние Хэмминга для "того же" аватара
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 2 * 1024 * 1024,
+        concurrency: int = 8,
+        timeout: float = 10,
+        hash_distance: int = 6
+    ):
+        self.max_bytes = max_bytes
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.hash_distance = hash_distance
+
+    async def _fetch(self, url: str, platform: str, semaphore: asyncio.Semaphore) -> Optional[bytes]:
+        async with semaphore:
+            with metrics.track_probe("avatars", platform) as probe, \
+                    tracing.start_span("avatar.fetch", tracing.KIND_CLIENT, site=platform) as span:
+                try:
+                    # Аватары отдают CDN, а не проверяемые сайты - общий rate limiter не нужен
+                    data = await fetch_limited(url, self.max_bytes, timeout=self.timeout, throttle=False)
+                except Exception as e:
+                    span.record_exception(e)
+                    probe.outcome = "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+                    return None
+                probe.outcome = "found" if data else "not_found"
+                span.set_attribute("http.response.body.size", len(data) if data else 0)
+                return data
+
+    async def _fingerprint(self, url: str, data: bytes, platform: str, username: str) -> Dict:
+        """pHash + лица одного аватара"""
+        hash_task = image_hash.phash_async(data)
+        if face_engine.available():
+            phash, faces = await asyncio.gather(hash_task, face_engine.analyze(data), return_exceptions=True)
+            if isinstance(faces, Exception):
+                logger.warning("Ошибка анализа лица на аватаре %s: %s", url, faces)
+                faces = []
+            if isinstance(phash, Exception):
+                phash = None
+        else:
+            phash, faces = await hash_task, []
+
+        indexed = bool(faces) and await asyncio.to_thread(face_index.contains_url, url)
+        if faces:
+            metrics.record_cache("face_index_url", hit=indexed)
+        if faces and not indexed:
+            await asyncio.to_thread(
+                face_index.add,
+                np.vstack([face["embedding"] for face in faces]),
+                [
+                    {"source": "avatar", "url": url, "platform": platform, "username": username, "bbox": face["bbox"]}
+                    for face in faces
+                ]
+            )
+
+        return {"phash": phash, "faces": faces, "size": len(data)}
+
+    def _cluster(self, entries: List[Dict]) -> List[Dict]:
+        """Объединение аватаров с близким pHash или совпадающим лицом"""
+        if len(entries) < 2:
+            return []
+
+        groups = _UnionFind(len(entries))
+        reasons: Dict[int, set] = {}
+
+        hashed = [i for i, entry in enumerate(entries) if entry["phash"] is not None]
+        if len(hashed) > 1:
+            distances = image_hash.hamming_matrix([entries[i]["phash"] for i in hashed])
+            for a, b in zip(*np.nonzero(np.triu(distances <= self.hash_distance, k=1))):
+                groups.union(hashed[a], hashed[b])
+                reasons.setdefault(hashed[a], set()).add("phash")
+
+        with_faces = [i for i, entry in enumerate(entries) if entry["faces"]]
+        for pos, a in enumerate(with_faces):
+            for b in with_faces[pos + 1:]:
+                if groups.find(a) == groups.find(b):
+                    continue
+                if any(
+                    is_match(face_a["embedding"], face_b["embedding"])
+                    for face_a in entries[a]["faces"]
+                    for face_b in entries[b]["faces"]
+                ):
+                    groups.union(a, b)
+                    reasons.setdefault(a, set()).add("face")
+
+        members: Dict[int, List[int]] = {}
+        for i in range(len(entries)):
+            members.setdefault(groups.find(i), []).append(i)
+
+        clusters = []
+        for root, indices in members.items():
+            platforms = sorted({p for i in indices for p in entries[i]["platforms"]})
+            if len(platforms) < 2:
+                continue
+            matched_by = set()
+            for i in indices:
+                matched_by |= reasons.get(i, set())
+            clusters.append({
+                "platforms": platforms,
+                "avatar_urls": [entries[i]["url"] for i in indices],
+                "phash": image_hash.to_hex(entries[root]["phash"]) if entries[root]["phash"] is not None else None,
+                "matched_by": sorted(matched_by) or ["identical_url"]
+            })
+
+        clusters.sort(key=lambda cluster: len(cluster["platforms"]), reverse=True)
+        return clusters
+
+    async def harvest(self, results: List[Dict], username: str = "") -> List[Dict]:
+        """
+        Обработка аватаров найденных профилей
+
+        Дополняет результаты полем "avatar" (phash, size, faces_detected)
+        и возвращает кластеры аватаров, встречающихся на 2+ платформах.
+
+        Args:
+            results: результаты поиска по username (platform, avatar_url)
+            username: искомый username (сохраняется в метаданных face_index)
+
+        Returns:
+            List кластеров: platforms, avatar_urls, phash, matched_by
+        """
+        # Один URL может встречаться у нескольких платформ (общий CDN)
+        by_url: Dict[str, List[Dict]] = {}
+        for result in results:
+            url = result.get("avatar_url")
+            if url and url.startswith(("http://", "https://")) and not _is_default_avatar(url):
+                by_url.setdefault(url, []).append(result)
+        if not by_url:
+            return []
+
+        with tracing.start_span("avatars.harvest", avatars=len(by_url)):
+            semaphore = asyncio.Semaphore(self.concurrency)
+            urls = list(by_url)
+            downloads = await asyncio.gather(*[
+                self._fetch(url, by_url[url][0]["platform"], semaphore) for url in urls
+            ])
+
+            fetched = [(url, data) for url, data in zip(urls, downloads) if data]
+            fingerprints = await asyncio.gather(*[
+                self._fingerprint(url, data, by_url[url][0]["platform"], username)
+                for url, data in fetched
+            ])
+
+            entries = []
+            for (url, _), fingerprint in zip(fetched, fingerprints):
+                for result in by_url[url]:
+                    result["avatar"] = {
+                        "phash": image_hash.to_hex(fingerprint["phash"]) if fingerprint["phash"] is not None else None,
+                        "size": fingerprint["size"],
+                        "faces_detected": len(fingerprint["faces"])
+                    }
+                entries.append({
+                    "url": url,
+                    "platforms": [result["platform"] for result in by_url[url]],
+                    **fingerprint
+                })
+
+            return self._cluster(entries)
+
+
+avatar_harvester = AvatarHarvester(
+    max_bytes=config.AVATAR_MAX_BYTES,
+    concurrency=config.AVATAR_CONCURRENCY,
+    timeout=config.AVATAR_FETCH_TIMEOUT,
+    hash_distance=config.AVATAR_HASH_DISTANCE
+)
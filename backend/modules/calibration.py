@@ -0,0 +1,303 @@
+"""
+Калибровка сайтов проверки username: отсев ложных "найден"
+
+Многие сайты (Instagram, TikTok, Facebook) отвечают 200 и на
+несуществующий профиль. Для каждого сайта каталога фоново проверяются
+заведомо занятый (username_claimed) и заведомо свободный
+(username_unclaimed) username, и запоминается компактный отпечаток
+ответа каждого:
+
+- статус
+- полоса длины тела (log2 - разница в несколько байт из-за username
+  не меняет полосу)
+- хеш <title> с username, заменённым на {} (шаблон заголовка)
+
+Живой ответ сравнивается с отпечатками:
+- статусы занятого и свободного различаются - решает статус
+- статусы одинаковые (soft-404) - решает заголовок, иначе полоса длины;
+  совпал с отпечатком свободного - профиля нет
+- отпечатки неразличимы - ответ сайта ничего не значит (uncertain)
+
+Без калибровки сайта действует прежнее правило: 200 - найден, 404 - нет.
+Отпечатки хранятся в JSON (CALIBRATION_PATH) и обновляются фоново раз
+в CALIBRATION_MAX_AGE_HOURS; неудачная калибровка повторяется через
+CALIBRATION_RETRY_MINUTES.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+
+import aiohttp
+
+import config
+from modules import metrics
+
+
+logger = logging.getLogger(__name__)
+
+VERDICT_FOUND = "found"
+VERDICT_NOT_FOUND = "not_found"
+VERDICT_UNCERTAIN = "uncertain"
+
+_TITLE_RE = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+_SPACES_RE = re.compile(r"\s+")
+
+CALIBRATIONS = metrics.REGISTRY.register(metrics.Counter(
+    "osint_calibration_total",
+    "Site calibration runs by outcome (distinct, status, soft404, indistinct, error)",
+    ("outcome",)
+))
+SUPPRESSED = metrics.REGISTRY.register(metrics.Counter(
+    "osint_calibration_suppressed_total",
+    "HTTP 200 answers reclassified by calibration as not found or uncertain",
+    ("site", "verdict")
+))
+
+
+class Fingerprint(NamedTuple):
+    """Отпечаток ответа сайта"""
+
+    status: int
+    length_band: int
+    title: Optional[str]  # хеш шаблона заголовка
+
+
+def fingerprint(status: int, body: str, username: str) -> Fingerprint:
+    """
+    Отпечаток ответа
+
+    Args:
+        status: HTTP статус
+        body: тело ответа
+        username: проверявшийся username (вырезается из заголовка)
+    """
+    title = None
+    match = _TITLE_RE.search(body, 0, 65536)
+    if match:
+        text = _SPACES_RE.sub(" ", match.group(1)).strip().lower()
+        if username:
+            text = text.replace(username.lower(), "{}")
+        title = hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+    return Fingerprint(status, len(body).bit_length(), title)
+
+
+def _definitive(status: int) -> bool:
+    """Статус, годный для отпечатка: 2xx, 3xx (редирект не пройден) или 404"""
+    return 200 <= status < 400 or status == 404
+
+
+class SiteCalibration(NamedTuple):
+    claimed: Optional[Fingerprint]
+    unclaimed: Optional[Fingerprint]
+    checked_at: float
+    error: Optional[str] = None
+
+    def mode(self) -> str:
+        """Чем сайт отличает занятый username: status, soft404, indistinct, error"""
+        if self.error or self.claimed is None or self.unclaimed is None:
+            return "error"
+        if self.claimed.status != self.unclaimed.status:
+            return "status"
+        if self.claimed.title != self.unclaimed.title or self.claimed.length_band != self.unclaimed.length_band:
+            return "soft404"
+        return "indistinct"
+
+
+class Calibrator:
+    """
+    Отпечатки сайтов, классификация ответов и фоновое обновление
+
+    Args:
+        path: JSON файл отпечатков (пусто - только в памяти)
+        max_age: секунд до обновления отпечатков сайта
+        retry: секунд до повтора неудачной калибровки
+        concurrency: сайтов, калибруемых одновременно
+    """
+
+    def __init__(self, path: Optional[Path], max_age: float, retry: float, concurrency: int = 4):
+        self.path = Path(path) if path else None
+        self.max_age = max_age
+        self.retry = retry
+        self.concurrency = concurrency
+        self._sites: Optional[Dict[str, SiteCalibration]] = None
+
+    @property
+    def sites(self) -> Dict[str, SiteCalibration]:
+        if self._sites is None:
+            self._sites = self._load()
+        return self._sites
+
+    def _load(self) -> Dict[str, SiteCalibration]:
+        if self.path is None or not self.path.exists():
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            return {
+                name: SiteCalibration(
+                    Fingerprint(*entry["claimed"]) if entry.get("claimed") else None,
+                    Fingerprint(*entry["unclaimed"]) if entry.get("unclaimed") else None,
+                    entry["checked_at"],
+                    entry.get("error")
+                )
+                for name, entry in data.get("sites", {}).items()
+            }
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            logger.warning("Калибровка сайтов %s не прочитана: %s", self.path, e)
+            return {}
+
+    def _write(self, data: Dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def _dump(self) -> Dict:
+        return {"sites": {name: calibration._asdict() for name, calibration in self.sites.items()}}
+
+    # ---------- классификация
+
+    def needs_body(self, site_name: str) -> bool:
+        """Нужно ли тело ответа 200, чтобы понять, найден ли профиль"""
+        calibration = self.sites.get(site_name)
+        return calibration is not None and calibration.mode() in ("soft404", "indistinct")
+
+    def classify(self, site_name: str, observed: Fingerprint) -> Optional[str]:
+        """
+        Вердикт по отпечаткам сайта
+
+        Returns:
+            found, not_found, uncertain или None (сайт не откалиброван или
+            ответ не похож ни на один отпечаток - действует правило по статусу)
+        """
+        calibration = self.sites.get(site_name)
+        metrics.record_cache("calibration", hit=calibration is not None)
+        if calibration is None:
+            return None
+        mode = calibration.mode()
+        claimed, unclaimed = calibration.claimed, calibration.unclaimed
+
+        if mode == "status":
+            if observed.status == claimed.status:
+                return VERDICT_FOUND
+            if observed.status == unclaimed.status:
+                return VERDICT_NOT_FOUND
+            return None
+        if mode == "error" or observed.status != claimed.status:
+            return None
+        if mode == "indistinct":
+            return VERDICT_UNCERTAIN
+
+        if claimed.title != unclaimed.title:
+            return VERDICT_NOT_FOUND if observed.title == unclaimed.title else VERDICT_FOUND
+        if observed.length_band == unclaimed.length_band:
+            return VERDICT_NOT_FOUND
+        if observed.length_band == claimed.length_band:
+            return VERDICT_FOUND
+        return VERDICT_UNCERTAIN
+
+    def suppressed(self, site_name: str, verdict: str):
+        """Учёт ответа 200, который калибровка не признала найденным профилем"""
+        SUPPRESSED.inc(site_name, verdict)
+
+    # ---------- обновление
+
+    def _stale(self, site_name: str, now: float) -> bool:
+        calibration = self.sites.get(site_name)
+        if calibration is None:
+            return True
+        age = now - calibration.checked_at
+        return age >= (self.retry if calibration.mode() == "error" else self.max_age)
+
+    async def refresh(self, engine, force: bool = False) -> Dict:
+        """
+        Калибровка сайтов каталога, чьи отпечатки устарели
+
+        Args:
+            engine: движок проверки сайтов (SiteProbeEngine - каталог и запросы)
+            force: калибровать все сайты
+
+        Returns:
+            Dict: calibrated, по режимам
+        """
+        now = time.time()
+        due = [
+            (name, data) for name, data in engine.catalog.items()
+            if data.get("username_claimed") and data.get("username_unclaimed")
+            and (force or self._stale(name, now))
+        ]
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def calibrate(site_name: str, site_data: Dict):
+            async with semaphore:
+                try:
+                    claimed, unclaimed = await asyncio.gather(
+                        engine.fingerprint_probe(site_data["username_claimed"], site_data),
+                        engine.fingerprint_probe(site_data["username_unclaimed"], site_data)
+                    )
+                    if _definitive(claimed.status) and _definitive(unclaimed.status):
+                        calibration = SiteCalibration(claimed, unclaimed, time.time())
+                    else:
+                        # 429/5xx/403 - временный отказ, а не ответ о профиле: такой
+                        # отпечаток превратил бы живые 429 в "не найден"
+                        calibration = SiteCalibration(
+                            None, None, time.time(),
+                            f"HTTP {claimed.status}/{unclaimed.status} (claimed/unclaimed)"
+                        )
+                except (asyncio.TimeoutError, aiohttp.ClientError, UnicodeDecodeError) as e:
+                    calibration = SiteCalibration(None, None, time.time(), str(e) or type(e).__name__)
+            self.sites[site_name] = calibration
+            CALIBRATIONS.inc(calibration.mode())
+            return calibration.mode()
+
+        modes = await asyncio.gather(*[calibrate(name, data) for name, data in due])
+        if due and self.path is not None:
+            await asyncio.to_thread(self._write, self._dump())
+
+        summary = {"calibrated": len(due)}
+        for mode in modes:
+            summary[mode] = summary.get(mode, 0) + 1
+        return summary
+
+    async def run(self, engine, tick_seconds: float):
+        """Фоновый цикл: устаревшие отпечатки обновляются раз в tick_seconds"""
+        while True:
+            try:
+                summary = await self.refresh(engine)
+                if summary["calibrated"]:
+                    logger.info("Калибровка сайтов: %s", summary)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Ошибка калибровки сайтов: %s", e)
+            await asyncio.sleep(tick_seconds)
+
+    def snapshot(self) -> Dict:
+        """Режимы и отпечатки сайтов (для /api/admin/calibration)"""
+        return {
+            "sites": {
+                name: {
+                    "mode": calibration.mode(),
+                    "claimed": calibration.claimed._asdict() if calibration.claimed else None,
+                    "unclaimed": calibration.unclaimed._asdict() if calibration.unclaimed else None,
+                    "checked_at": calibration.checked_at,
+                    "error": calibration.error
+                }
+                for name, calibration in sorted(self.sites.items())
+            }
+        }
+
+
+calibrator = Calibrator(
+    config.CALIBRATION_PATH,
+    max_age=config.CALIBRATION_MAX_AGE_HOURS * 3600,
+    retry=config.CALIBRATION_RETRY_MINUTES * 60,
+    concurrency=config.CALIBRATION_CONCURRENCY
+)
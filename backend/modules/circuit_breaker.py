@@ -0,0 +1,177 @@
+"""
+Автоматические выключатели (circuit breakers) для внешних источников
+
+Выключатель на каждый upstream: движок (hibp, holehe, maigret,
+yandex_images...) и каждый сайт проверки username.
+
+Состояния:
+- closed: вызовы идут, подряд идущие ошибки считаются
+- open: после BREAKER_FAILURE_THRESHOLD ошибок подряд вызовы сразу
+  пропускаются (без ожидания полного таймаута)
+- half_open: через BREAKER_RESET_SECONDS пропускается один пробный
+  вызов; успех закрывает выключатель, ошибка снова открывает
+
+Для /api/health выключатель хранит последние задержки (p50/p95) и
+последнюю ошибку.
+"""
+import time
+from collections import deque
+from typing import Dict, Optional
+
+import config
+from modules import metrics
+
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+_STATE_VALUES = {STATE_CLOSED: 0, STATE_HALF_OPEN: 1, STATE_OPEN: 2}
+
+BREAKER_STATE = metrics.REGISTRY.register(metrics.Gauge(
+    "osint_breaker_state",
+    "Circuit breaker state per upstream (0 closed, 1 half-open, 2 open)",
+    ("upstream",)
+))
+BREAKER_REJECTED = metrics.REGISTRY.register(metrics.Counter(
+    "osint_breaker_rejected_total",
+    "Calls skipped because the upstream circuit breaker was open",
+    ("upstream",)
+))
+
+
+class CircuitBreaker:
+    """
+    Выключатель одного upstream
+
+    Args:
+        name: имя upstream (engine:hibp, site:GitHub)
+        failure_threshold: ошибок подряд до размыкания
+        reset_timeout: секунд до пробного вызова
+        window: сколько последних задержек хранить
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float, window: int = 50):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self.total_calls = 0
+        self.total_failures = 0
+        self.opened_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._trial_started: Optional[float] = None
+        self._latencies: deque = deque(maxlen=window)
+
+    def allow(self) -> bool:
+        """Можно ли вызывать upstream сейчас (в half_open - один пробный вызов)"""
+        if self.state == STATE_CLOSED:
+            return True
+
+        now = time.monotonic()
+        if self.state == STATE_OPEN:
+            if now - self.opened_at < self.reset_timeout:
+                BREAKER_REJECTED.inc(self.name)
+                return False
+            self._set_state(STATE_HALF_OPEN)
+
+        # Пробный вызов один; если он потерялся (отмена), через reset_timeout - следующий
+        if self._trial_started is None or now - self._trial_started >= self.reset_timeout:
+            self._trial_started = now
+            return True
+        BREAKER_REJECTED.inc(self.name)
+        return False
+
+    def is_open(self) -> bool:
+        """Вызовы сейчас отклоняются (без перехода в half_open, в отличие от allow)"""
+        return self.state == STATE_OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def release_trial(self):
+        """Вызов не состоялся (отмена, дедлайн запроса) - пробный слот свободен"""
+        self._trial_started = None
+
+    def record_success(self, latency: float):
+        self.total_calls += 1
+        self._latencies.append(latency)
+        self.consecutive_failures = 0
+        self._trial_started = None
+        if self.state != STATE_CLOSED:
+            self._set_state(STATE_CLOSED)
+
+    def record_failure(self, latency: float, error: str = ""):
+        self.total_calls += 1
+        self.total_failures += 1
+        self._latencies.append(latency)
+        self.consecutive_failures += 1
+        self.last_error = error or None
+        self._trial_started = None
+        if self.state == STATE_HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._set_state(STATE_OPEN)
+
+    def _set_state(self, state: str):
+        self.state = state
+        BREAKER_STATE.set(self.name, value=_STATE_VALUES[state])
+
+    def latency_ms(self) -> Optional[Dict]:
+        """p50/p95 последних вызовов"""
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return {
+            "p50": round(ordered[len(ordered) // 2] * 1000, 1),
+            "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1)
+        }
+
+    def snapshot(self) -> Dict:
+        snapshot = {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "calls": self.total_calls,
+            "failures": self.total_failures,
+            "latency_ms": self.latency_ms(),
+            "last_error": self.last_error
+        }
+        if self.state != STATE_CLOSED:
+            snapshot["retry_in_s"] = round(max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at)), 1)
+        return snapshot
+
+
+class BreakerRegistry:
+    """Выключатели по имени upstream (создаются при первом обращении)"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, window: int):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.window = window
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = self._breakers[name] = CircuitBreaker(
+                name, self.failure_threshold, self.reset_timeout, self.window
+            )
+        return breaker
+
+    def engine(self, engine_name: str) -> CircuitBreaker:
+        return self.get(f"engine:{engine_name}")
+
+    def site(self, site_name: str) -> CircuitBreaker:
+        return self.get(f"site:{site_name}")
+
+    def snapshot(self, prefix: str = "") -> Dict[str, Dict]:
+        """Состояние выключателей (имя без префикса -> snapshot)"""
+        return {
+            name[len(prefix):]: breaker.snapshot()
+            for name, breaker in sorted(self._breakers.items())
+            if name.startswith(prefix)
+        }
+
+
+breakers = BreakerRegistry(
+    failure_threshold=config.BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=config.BREAKER_RESET_SECONDS,
+    window=config.BREAKER_LATENCY_WINDOW
+)
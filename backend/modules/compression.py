@@ -0,0 +1,207 @@
+"""
+Сжатие ответов API по Accept-Encoding (zstd, brotli, gzip)
+
+Кодировка выбирается по q-значениям клиента, при равенстве - по порядку
+RESPONSE_COMPRESSION. brotli и zstd подключаются, если установлены
+пакеты brotli/zstandard; gzip есть всегда.
+
+Сжимаются текстовые ответы (JSON, CSV, JS, HTML) больше
+RESPONSE_COMPRESSION_MIN_BYTES. Потоковые ответы (экспорт) сжимаются
+по частям с flush после каждой, чтобы клиент получал данные сразу.
+Строгий ETag сжатого ответа становится слабым (W/) - байты другие,
+содержимое то же.
+"""
+import zlib
+from typing import Dict, List, Optional
+
+import config
+from modules import metrics
+
+try:
+    import brotli
+except ImportError:  # без brotli - zstd/gzip
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # без zstandard - brotli/gzip
+    zstandard = None
+
+
+RESPONSE_BYTES = metrics.REGISTRY.register(metrics.Counter(
+    "osint_response_bytes_total",
+    "Response body bytes before (raw) and after (sent) compression",
+    ("encoding", "stage")
+))
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/vnd.apache.arrow.stream",
+    "image/svg+xml",
+    "text/",
+)
+
+
+class _Gzip:
+    def __init__(self):
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _Brotli:
+    def __init__(self):
+        # Качество 5: заметно лучше gzip при сопоставимом времени
+        self._compressor = brotli.Compressor(quality=5)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        chunk = self._compressor.process(data)
+        return chunk + (self._compressor.finish() if final else self._compressor.flush())
+
+
+class _Zstd:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        mode = zstandard.COMPRESSOBJ_FLUSH_FINISH if final else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        return self._compressor.compress(data) + self._compressor.flush(mode)
+
+
+def _encoders() -> Dict[str, type]:
+    """Доступные кодировки в порядке предпочтения сервера"""
+    available = {"gzip": _Gzip}
+    if brotli is not None:
+        available["br"] = _Brotli
+    if zstandard is not None:
+        available["zstd"] = _Zstd
+    return {name: available[name] for name in config.RESPONSE_COMPRESSION if name in available}
+
+
+ENCODERS = _encoders()
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """
+    Кодировка ответа по заголовку Accept-Encoding
+
+    Returns:
+        Имя кодировки или None (отдавать без сжатия)
+    """
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+
+    best, best_q = None, 0.0
+    for name in ENCODERS:
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def _compressible(headers: List) -> bool:
+    content_type = ""
+    for key, value in headers:
+        key = key.lower()
+        if key == b"content-encoding":
+            return False
+        if key == b"content-type":
+            content_type = value.decode("latin-1").lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def _compressed_headers(headers: List, encoding: str, length: Optional[int]) -> List:
+    result = []
+    vary = None
+    for key, value in headers:
+        lower = key.lower()
+        if lower == b"content-length":
+            continue
+        if lower == b"vary":
+            vary = value
+            continue
+        if lower == b"etag" and not value.startswith(b"W/"):
+            value = b"W/" + value
+        result.append((key, value))
+    result.append((b"content-encoding", encoding.encode()))
+    result.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+    if length is not None:
+        result.append((b"content-length", str(length).encode()))
+    return result
+
+
+class CompressionMiddleware:
+    """Сжатие тел ответов выбранной по Accept-Encoding кодировкой"""
+
+    def __init__(self, app, minimum_size: int = config.RESPONSE_COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENCODERS:
+            return await self.app(scope, receive, send)
+        accept_encoding = ""
+        for key, value in scope.get("headers", []):
+            if key == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = negotiate(accept_encoding)
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+        encoder = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, encoder, passthrough
+            if passthrough:
+                return await send(message)
+
+            if message["type"] == "http.response.start":
+                if message["status"] in (204, 304) or not _compressible(message.get("headers", [])):
+                    passthrough = True
+                    return await send(message)
+                # Заголовки отправим, когда станет ясен размер первой части тела
+                start = message
+                return
+
+            if message["type"] != "http.response.body":
+                return await send(message)
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if encoder is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    return await send(message)
+                encoder = ENCODERS[encoding]()
+                data = encoder.compress(body, final=not more_body)
+                await send({
+                    **start,
+                    "headers": _compressed_headers(start.get("headers", []), encoding, None if more_body else len(data))
+                })
+            else:
+                data = encoder.compress(body, final=not more_body)
+
+            RESPONSE_BYTES.inc(encoding, "raw", amount=len(body))
+            RESPONSE_BYTES.inc(encoding, "sent", amount=len(data))
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
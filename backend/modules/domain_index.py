@@ -0,0 +1,238 @@
+"""
+Индекс доменов платформ (суффиксное дерево по меткам домена)
+
+Классификация URL из выдачи: хост разбивается на метки и проходится
+от TLD вглубь (com -> vk -> m), поэтому поиск занимает O(число меток)
+независимо от числа платформ, а поддомены (m.vk.com, user.livejournal.com)
+относятся к своей платформе без перебора.
+
+Источники (в порядке приоритета):
+1. PLATFORM_DOMAINS_FILE - свой JSON
+2. SOCIAL_PLATFORMS - встроенный список соцсетей и алиасов
+3. SITE_CATALOG - каталог сайтов проверки username
+4. база сайтов maigret (3000+ платформ), если maigret установлен
+"""
+import importlib.util
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import config
+from modules.engines.sites import SITE_CATALOG
+from modules.urls import url_host
+
+
+logger = logging.getLogger(__name__)
+
+# Встроенный список: домен -> (название, теги)
+SOCIAL_PLATFORMS: Dict[str, tuple] = {
+    "vk.com": ("VKontakte", ("social",)),
+    "vk.ru": ("VKontakte", ("social",)),
+    "ok.ru": ("Odnoklassniki", ("social",)),
+    "instagram.com": ("Instagram", ("social", "photo")),
+    "instagr.am": ("Instagram", ("social", "photo")),
+    "facebook.com": ("Facebook", ("social",)),
+    "fb.com": ("Facebook", ("social",)),
+    "twitter.com": ("Twitter", ("social", "news")),
+    "x.com": ("Twitter", ("social", "news")),
+    "linkedin.com": ("LinkedIn", ("professional",)),
+    "youtube.com": ("YouTube", ("video",)),
+    "youtu.be": ("YouTube", ("video",)),
+    "tiktok.com": ("TikTok", ("video", "social")),
+    "t.me": ("Telegram", ("messaging",)),
+    "telegram.me": ("Telegram", ("messaging",)),
+    "pinterest.com": ("Pinterest", ("photo", "social")),
+    "reddit.com": ("Reddit", ("social", "forum")),
+    "tumblr.com": ("Tumblr", ("blog", "social")),
+    "flickr.com": ("Flickr", ("photo",)),
+    "livejournal.com": ("LiveJournal", ("blog",)),
+    "github.com": ("GitHub", ("coding", "tech")),
+    "medium.com": ("Medium", ("blog",)),
+    "twitch.tv": ("Twitch", ("video", "gaming")),
+    "snapchat.com": ("Snapchat", ("social",)),
+    "threads.net": ("Threads", ("social",)),
+    "mastodon.social": ("Mastodon", ("social",)),
+    "myspace.com": ("MySpace", ("social",)),
+    "my.mail.ru": ("Мой Мир", ("social",)),
+    "dzen.ru": ("Дзен", ("blog",)),
+    "habr.com": ("Habr", ("tech", "blog")),
+    "pikabu.ru": ("Pikabu", ("social", "forum")),
+    "rutube.ru": ("Rutube", ("video",)),
+    "behance.net": ("Behance", ("art", "professional")),
+    "dribbble.com": ("Dribbble", ("art", "professional")),
+    "deviantart.com": ("DeviantArt", ("art",)),
+    "soundcloud.com": ("SoundCloud", ("music",)),
+    "vimeo.com": ("Vimeo", ("video",)),
+    "quora.com": ("Quora", ("forum",)),
+    "weibo.com": ("Weibo", ("social",)),
+}
+
+_TERMINAL = ""  # ключ данных платформы в узле дерева (метки домена непустые)
+
+
+class DomainIndex:
+    """
+    Суффиксное дерево доменов: узел - dict метка -> дочерний узел,
+    данные платформы лежат под ключом _TERMINAL
+    """
+
+    def __init__(self):
+        self._root: Dict = {}
+        self._by_name: Dict[str, str] = {}
+        self.size = 0
+
+    def add(self, domain: str, name: str, tags: Iterable[str] = (), replace: bool = False) -> bool:
+        """
+        Добавление домена платформы
+
+        Args:
+            domain: домен (www. отбрасывается)
+            name: название платформы
+            tags: категории
+            replace: заменить уже существующую запись
+
+        Returns:
+            True если запись добавлена
+        """
+        domain = domain.strip().lower().rstrip(".")
+        if domain.startswith("www."):
+            domain = domain[4:]
+        if not domain:
+            return False
+
+        node = self._root
+        for label in reversed(domain.split(".")):
+            node = node.setdefault(label, {})
+        if _TERMINAL in node and not replace:
+            return False
+        if _TERMINAL not in node:
+            self.size += 1
+        node[_TERMINAL] = {"network": name, "domain": domain, "tags": list(tags)}
+        self._by_name.setdefault(name.lower(), domain)
+        return True
+
+    def lookup(self, host: str) -> Optional[Dict]:
+        """
+        Платформа для хоста (самый длинный совпавший суффикс)
+
+        Args:
+            host: хост URL (например m.vk.com)
+
+        Returns:
+            Dict (network, domain, tags) или None
+        """
+        node = self._root
+        match = None
+        for label in reversed(host.lower().rstrip(".").split(".")):
+            node = node.get(label)
+            if node is None:
+                break
+            match = node.get(_TERMINAL, match)
+        return match
+
+    def domain_for(self, name: str) -> Optional[str]:
+        """Основной домен платформы по названию (GitHub -> github.com)"""
+        return self._by_name.get(name.lower())
+
+    def classify(self, url: str) -> Optional[Dict]:
+        """Платформа для URL"""
+        host = url_host(url)
+        return self.lookup(host) if host else None
+
+    def __len__(self) -> int:
+        return self.size
+
+
+def _maigret_sites() -> Dict[str, Dict]:
+    """Сайты из базы maigret (без импорта самого пакета)"""
+    spec = importlib.util.find_spec("maigret")
+    if spec is None or not spec.origin:
+        return {}
+    data_file = Path(spec.origin).parent / "resources" / "data.json"
+    try:
+        with open(data_file, "r", encoding="utf-8") as f:
+            return json.load(f).get("sites", {})
+    except (OSError, ValueError) as e:
+        logger.warning("Не удалось прочитать базу сайтов maigret: %s", e)
+        return {}
+
+
+def _custom_domains(path: str) -> Dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("Не удалось прочитать PLATFORM_DOMAINS_FILE %s: %s", path, e)
+        return {}
+
+
+def build_index(custom_file: str = "") -> DomainIndex:
+    """Сборка индекса из всех источников (первый источник имеет приоритет)"""
+    index = DomainIndex()
+
+    if custom_file:
+        for domain, entry in _custom_domains(custom_file).items():
+            if isinstance(entry, dict):
+                index.add(domain, entry.get("name", domain), entry.get("tags", ()))
+            else:
+                index.add(domain, str(entry))
+
+    for domain, (name, tags) in SOCIAL_PLATFORMS.items():
+        index.add(domain, name, tags)
+
+    for sources in (SITE_CATALOG, _maigret_sites()):
+        for name, site in sources.items():
+            if site.get("disabled"):
+                continue
+            host = url_host(site.get("urlMain") or "")
+            if host:
+                index.add(host, name, site.get("tags", ()))
+
+    return index
+
+
+_index: Optional[DomainIndex] = None
+_index_lock = threading.Lock()
+
+
+def platform_index() -> DomainIndex:
+    """Общий индекс платформ (собирается при первом обращении)"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = build_index(config.PLATFORM_DOMAINS_FILE)
+                logger.info("Индекс доменов платформ: %d доменов", len(_index))
+    return _index
+
+
+def classify_profiles(results: List[Dict]) -> List[Dict]:
+    """
+    Результаты выдачи, ведущие на известные платформы
+
+    Args:
+        results: результаты поиска (с полем url)
+
+    Returns:
+        List профилей: network, url, domain, tags, similarity, source
+    """
+    index = platform_index()
+    profiles = []
+
+    for result in results:
+        url = result.get("url") or ""
+        platform = index.classify(url)
+        if platform is None:
+            continue
+        profiles.append({
+            "network": platform["network"],
+            "url": url,
+            "domain": url_host(url),
+            "tags": platform["tags"],
+            "similarity": result.get("similarity", 0.5),
+            "source": result.get("source")
+        })
+
+    return profiles
@@ -0,0 +1,33 @@
+"""
+OSINT движки: единый интерфейс, реестр и планировщик
+
+Каждый движок - подкласс Engine (search, capabilities, cost,
+rate_limit_class). Порядок регистрации задаёт приоритет при слиянии
+результатов. Все эндпоинты запускают движки через fan_out().
+"""
+from . import registry
+from .base import (
+    Engine,
+    EngineError,
+    CAPABILITY_EMAIL,
+    CAPABILITY_USERNAME,
+    CAPABILITY_IMAGE,
+)
+from .email import HibpEngine, HoleheEngine, RegistrationEngine, EmailMetadataEngine
+from .images import YandexImagesEngine, GoogleImagesEngine, TinEyeEngine
+from .username import MaigretEngine, SiteProbeEngine
+from .scheduler import fan_out, merge_results, engine_report, STATUS_OK
+
+
+for _engine in (
+    EmailMetadataEngine(),
+    HibpEngine(),
+    HoleheEngine(),
+    RegistrationEngine(),
+    MaigretEngine(),
+    SiteProbeEngine(),
+    YandexImagesEngine(),
+    GoogleImagesEngine(),
+    TinEyeEngine(),
+):
+    registry.register(_engine)
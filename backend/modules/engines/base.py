@@ -0,0 +1,86 @@
+"""
+Базовый класс OSINT движка
+"""
+from typing import Dict, FrozenSet, Optional
+
+
+# Что умеет искать движок
+CAPABILITY_EMAIL = "email"
+CAPABILITY_USERNAME = "username"
+CAPABILITY_IMAGE = "image"
+
+# Классы ограничения параллелизма (см. scheduler)
+RATE_API = "api"                # внешний API (HIBP)
+RATE_SCRAPE = "scrape"          # загрузка/парсинг страниц поисковиков (Yandex, Google, TinEye)
+RATE_SUBPROCESS = "subprocess"  # внешний CLI (holehe, maigret)
+RATE_PROBE = "probe"            # множество лёгких запросов к сайтам (свои лимиты внутри)
+RATE_LOCAL = "local"            # без сетевых запросов или почти без них
+
+
+class EngineError(Exception):
+    """Движок не смог выполнить поиск (результат не получен)"""
+
+
+class Engine:
+    """
+    Описание одного движка
+
+    Движок отвечает только за поиск и разбор ответа. Параллельный запуск,
+    дедлайны, ограничения параллелизма, метрики и трассировку выполняет
+    планировщик (modules.engines.scheduler).
+
+    Атрибуты:
+        name: уникальное имя (используется в метриках и ответах API)
+        capabilities: типы целей (email, username, image)
+        cost: относительная стоимость запуска (примерно секунды работы)
+        rate_limit_class: класс ограничения параллелизма
+        timeout: таймаут одного запуска в секундах
+        fallback_for: имя движка, при неудаче которого запускается этот
+        circuit_breaker: вести выключатель на весь движок (False - у движка
+            свои выключатели по сайтам или нет внешнего upstream)
+    """
+
+    name: str = ""
+    capabilities: FrozenSet[str] = frozenset()
+    cost: float = 1.0
+    rate_limit_class: str = RATE_SCRAPE
+    timeout: float = 30
+    fallback_for: Optional[str] = None
+    circuit_breaker: bool = True
+
+    def available(self) -> bool:
+        """Можно ли запускать движок в текущем окружении"""
+        return True
+
+    async def search(self, target: str, **options) -> Dict:
+        """
+        Поиск по цели
+
+        Args:
+            target: email, username или путь к изображению
+            options: параметры запроса (max_sites и т.д.), лишние игнорируются
+
+        Returns:
+            Dict с ключом "results" (List найденных записей, у записей
+            со ссылкой есть поле "url") и любыми полями движка
+
+        Raises:
+            EngineError: если результат получить не удалось
+        """
+        raise NotImplementedError
+
+    def outcome(self, payload: Dict) -> str:
+        """Исход для метрик по результату поиска"""
+        return "found" if payload.get("results") else "not_found"
+
+    def describe(self) -> Dict:
+        return {
+            "name": self.name,
+            "capabilities": sorted(self.capabilities),
+            "cost": self.cost,
+            "rate_limit_class": self.rate_limit_class,
+            "timeout": self.timeout,
+            "fallback_for": self.fallback_for,
+            "circuit_breaker": self.circuit_breaker,
+            "available": self.available()
+        }
@@ -0,0 +1,241 @@
+"""
+Проверка email: HaveIBeenPwned, Holehe, проверка регистраций (fallback) и метаданные
+"""
+import asyncio
+import subprocess
+from typing import Dict, Optional
+
+import aiohttp
+from tenacity import retry, retry_if_exception_type, retry_if_not_exception_type, stop_after_attempt, wait_exponential
+
+from modules import tracing
+from modules.http_client import conditional_headers, request, response_validators
+from modules.proxy_pool import ProxyUnavailable
+from modules.process_utils import run_command
+from modules.registration import check_registrations
+from .base import Engine, EngineError, CAPABILITY_EMAIL, RATE_API, RATE_LOCAL, RATE_PROBE, RATE_SUBPROCESS
+
+
+class HibpEngine(Engine):
+    """Проверка email в базе HaveIBeenPwned (утечки данных)"""
+
+    name = "hibp"
+    capabilities = frozenset({CAPABILITY_EMAIL})
+    rate_limit_class = RATE_API
+    cost = 1.0
+    timeout = 45
+
+    api_url = "https://haveibeenpwned.com/api/v3"
+
+    def __init__(self):
+        self.headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+            'Accept': 'application/json'
+        }
+
+    @retry(
+        # Нет свободного прокси - повтор через секунды не поможет
+        retry=retry_if_exception_type(aiohttp.ClientError) & retry_if_not_exception_type(ProxyUnavailable),
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=2, max=10),
+        before_sleep=tracing.count_retry,
+        reraise=True
+    )
+    async def search(
+        self,
+        target: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        **options
+    ) -> Dict:
+        """
+        Args:
+            target: email
+            etag, last_modified: валидаторы прошлого ответа - условный
+                запрос; при 304 возвращается {"not_modified": True}
+        """
+        url = f"{self.api_url}/breachedaccount/{target}"
+        async with request(
+            "GET", url,
+            timeout=15,
+            headers={**self.headers, **conditional_headers(etag, last_modified)}
+        ) as response:
+            body = await response.read()
+            span = tracing.current_span()
+            if span is not None:
+                span.set_attribute("http.status_code", response.status)
+                span.set_attribute("http.response.body.size", len(body))
+
+            if response.status == 304:
+                return {"not_modified": True, "results": []}
+            if response.status == 200:
+                breaches = await response.json()
+                return {
+                    **response_validators(response),
+                    "found": True,
+                    "breach_count": len(breaches),
+                    "breaches": [
+                        {
+                            "name": breach.get("Name"),
+                            "title": breach.get("Title"),
+                            "domain": breach.get("Domain"),
+                            "breach_date": breach.get("BreachDate"),
+                            "data_classes": breach.get("DataClasses", []),
+                            "pwn_count": breach.get("PwnCount", 0)
+                        }
+                        for breach in breaches[:20]  # Первые 20
+                    ],
+                    "results": []
+                }
+            if response.status == 404:
+                return {
+                    "found": False,
+                    "breach_count": 0,
+                    "breaches": [],
+                    "message": "Email не найден в утечках",
+                    "results": []
+                }
+            raise EngineError(f"HIBP API вернул статус {response.status}")
+
+    def outcome(self, payload: Dict) -> str:
+        return "found" if payload.get("found") else "not_found"
+
+
+class HoleheEngine(Engine):
+    """
+    Проверка регистраций email через РЕАЛЬНУЮ библиотеку Holehe
+
+    Holehe проверяет 100+ сайтов используя их официальные API
+    """
+
+    name = "holehe"
+    capabilities = frozenset({CAPABILITY_EMAIL})
+    rate_limit_class = RATE_SUBPROCESS
+    cost = 30.0
+    timeout = 60
+
+    async def search(self, target: str, **options) -> Dict:
+        try:
+            # holehe работает как CLI - запускаем subprocess, не блокируя event loop
+            result = await run_command(['holehe', target, '--only-used'], timeout=self.timeout)
+        except FileNotFoundError:
+            raise EngineError("holehe не установлена")
+        except subprocess.TimeoutExpired:
+            raise asyncio.TimeoutError()
+
+        span = tracing.current_span()
+        if span is not None:
+            span.set_attribute("process.exit_code", result.returncode)
+            span.set_attribute("process.stdout.size", len(result.stdout))
+
+        if result.returncode != 0:
+            raise EngineError(f"holehe завершилась с кодом {result.returncode}")
+
+        sites = []
+        for line in result.stdout.split('\n'):
+            line = line.strip()
+            # Holehe показывает найденные как "[+] Email used on sitename"
+            if '[+]' not in line:
+                continue
+            parts = line.split(']', 1)
+            if len(parts) > 1:
+                site_info = parts[1].strip()
+                site_name = site_info.split(' on ')[-1].strip() if ' on ' in site_info else site_info
+                sites.append({
+                    "site": site_name,
+                    "registered": "yes",
+                    "confidence": 0.95
+                })
+
+        return {
+            "email": target,
+            "registrations_found": len(sites),
+            "sites": sites,
+            "method": "holehe_real",
+            "results": []
+        }
+
+    def outcome(self, payload: Dict) -> str:
+        return "found" if payload.get("registrations_found") else "not_found"
+
+
+class RegistrationEngine(Engine):
+    """
+    Упрощенная проверка регистраций (fallback если holehe не работает)
+
+    Все сайты из modules.registration проверяются параллельно,
+    поэтому время проверки ограничено самым медленным сайтом
+    """
+
+    name = "registration"
+    capabilities = frozenset({CAPABILITY_EMAIL})
+    rate_limit_class = RATE_PROBE
+    cost = 2.0
+    timeout = 30
+    fallback_for = "holehe"
+    circuit_breaker = False  # выключатели по сайтам (modules.registration)
+
+    async def search(self, target: str, **options) -> Dict:
+        return {**await check_registrations(target), "results": []}
+
+    def outcome(self, payload: Dict) -> str:
+        return "found" if payload.get("registrations_found") else "not_found"
+
+
+class EmailMetadataEngine(Engine):
+    """Метаданные email: провайдер, одноразовый домен, MX записи"""
+
+    name = "email_metadata"
+    capabilities = frozenset({CAPABILITY_EMAIL})
+    rate_limit_class = RATE_LOCAL
+    cost = 0.1
+    timeout = 10
+    circuit_breaker = False
+
+    PROVIDERS = {
+        "gmail.com": "Google Gmail",
+        "yahoo.com": "Yahoo Mail",
+        "outlook.com": "Microsoft Outlook",
+        "hotmail.com": "Microsoft Hotmail",
+        "icloud.com": "Apple iCloud",
+        "mail.ru": "Mail.ru",
+        "yandex.ru": "Yandex Mail",
+        "yandex.com": "Yandex Mail",
+        "protonmail.com": "ProtonMail",
+        "proton.me": "ProtonMail"
+    }
+
+    DISPOSABLE_DOMAINS = frozenset({
+        "tempmail.com", "guerrillamail.com", "10minutemail.com",
+        "throwaway.email", "temp-mail.org", "mailinator.com",
+        "trashmail.com", "getnada.com", "maildrop.cc"
+    })
+
+    async def search(self, target: str, **options) -> Dict:
+        parts = target.split('@')
+        if len(parts) != 2:
+            raise EngineError("Invalid email format")
+
+        username, domain = parts
+        return {
+            "username": username,
+            "domain": domain,
+            "provider": self.PROVIDERS.get(domain.lower(), "Unknown/Custom"),
+            "disposable": domain.lower() in self.DISPOSABLE_DOMAINS,
+            "mx_valid": await self._check_mx_records(domain),
+            "results": []
+        }
+
+    async def _check_mx_records(self, domain: str) -> bool:
+        """Проверка MX записей домена"""
+        try:
+            import dns.resolver
+            with tracing.start_span("engine.mx_lookup", domain=domain):
+                # dns.resolver синхронный - выполняем в потоке
+                answers = await asyncio.to_thread(dns.resolver.resolve, domain, 'MX')
+            return len(answers) > 0
+        except Exception:
+            return False
+
+    def outcome(self, payload: Dict) -> str:
+        return "found"
@@ -0,0 +1,216 @@
+"""
+Reverse image search: Yandex Images, Google Images, TinEye
+
+Изображение загружается через cloudscraper (обход Cloudflare, синхронный -
+выполняется в потоке), HTML разбирается BeautifulSoup тоже в потоке:
+парсинг страниц выдачи занимает десятки миллисекунд и блокировал бы event loop.
+"""
+import asyncio
+from pathlib import Path
+from typing import Dict, List
+from urllib.parse import urlparse
+
+import cloudscraper
+from bs4 import BeautifulSoup
+from fake_useragent import UserAgent
+
+from modules import tracing
+from modules.http_client import upstream_url
+from modules.proxy_pool import get_proxy_pool
+from .base import Engine, EngineError, CAPABILITY_IMAGE, RATE_SCRAPE
+
+
+def extract_domain(url: str) -> str:
+    """Извлечение домена из URL"""
+    try:
+        return urlparse(url).netloc
+    except Exception:
+        return "unknown"
+
+
+class ImageSearchEngine(Engine):
+    """
+    Общая часть движков reverse image search
+
+    Подклассы задают upload_url, file_field, extra_headers и parse().
+    """
+
+    capabilities = frozenset({CAPABILITY_IMAGE})
+    rate_limit_class = RATE_SCRAPE
+    cost = 3.0
+    timeout = 30
+
+    upload_url: str = ""
+    file_field: str = "image"
+    extra_headers: Dict = {}
+
+    def __init__(self):
+        self.ua = UserAgent()
+        self._scraper = None
+
+    @property
+    def scraper(self):
+        # cloudscraper создаётся лениво: при импорте модуля сеть не нужна
+        if self._scraper is None:
+            self._scraper = cloudscraper.create_scraper(
+                browser={
+                    'browser': 'chrome',
+                    'platform': 'windows',
+                    'mobile': False
+                }
+            )
+        return self._scraper
+
+    async def search(self, target: str, **options) -> Dict:
+        image_data = await asyncio.to_thread(Path(target).read_bytes)
+        headers = {'User-Agent': self.ua.random, **self.extra_headers}
+
+        # Прокси из общего пула (ошибки соединения requests - OSError,
+        # пул засчитывает их прокси сам)
+        async with get_proxy_pool().lease(self.upload_url) as lease:
+            response = await asyncio.to_thread(
+                self.scraper.post,
+                upstream_url(self.upload_url),
+                files={self.file_field: ('image.jpg', image_data, 'image/jpeg')},
+                headers=headers,
+                timeout=self.timeout,
+                proxies={"http": lease.url, "https": lease.url} if lease.url else None
+            )
+            lease.observe(response.status_code)
+        span = tracing.current_span()
+        if span is not None:
+            span.set_attribute("http.status_code", response.status_code)
+            span.set_attribute("http.response.body.size", len(response.content))
+
+        if response.status_code != 200:
+            raise EngineError(f"{self.name} вернул статус {response.status_code}")
+
+        results = await asyncio.to_thread(self._parse_html, response.text)
+        return {"results": results}
+
+    def _parse_html(self, html: str) -> List[Dict]:
+        return self.parse(BeautifulSoup(html, 'html.parser'))
+
+    def parse(self, soup: BeautifulSoup) -> List[Dict]:
+        """Разбор страницы выдачи в список результатов"""
+        raise NotImplementedError
+
+
+class YandexImagesEngine(ImageSearchEngine):
+    """Yandex лучше всего работает с российскими лицами и VK профилями"""
+
+    name = "yandex_images"
+    upload_url = "https://yandex.ru/images/touch/search"
+    file_field = "upfile"
+    extra_headers = {
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
+        'Referer': 'https://yandex.ru/images/'
+    }
+
+    def parse(self, soup: BeautifulSoup) -> List[Dict]:
+        results = []
+
+        # Похожие изображения
+        for idx, img_div in enumerate(soup.find_all('div', class_='cbir-similar__thumb')[:15]):
+            img_tag = img_div.find('img')
+            link_tag = img_div.find_parent('a')
+            if img_tag and link_tag:
+                results.append({
+                    "source": "Yandex Images",
+                    "thumbnail": img_tag.get('src'),
+                    "url": link_tag.get('href'),
+                    "similarity": 0.8 - (idx * 0.02),  # Примерная оценка (уточняется rerank)
+                    "index": idx
+                })
+
+        # Страницы, где встречается изображение
+        for page in soup.find_all('div', class_='cbir-sites__thumb')[:10]:
+            link = page.find('a')
+            if link:
+                results.append({
+                    "source": "Yandex Images - Sites",
+                    "url": link.get('href'),
+                    "domain": extract_domain(link.get('href', '')),
+                    "type": "webpage",
+                    "similarity": 0.7
+                })
+
+        # Десктопная выдача
+        for idx, item in enumerate(soup.find_all('div', class_='serp-item')[:10]):
+            link = item.find('a', href=True)
+            if link:
+                results.append({
+                    "source": "Yandex Images",
+                    "url": link['href'],
+                    "title": link.get('title', 'No title')[:100],
+                    "similarity": 0.7 - (idx * 0.02),
+                    "index": idx
+                })
+
+        return results
+
+
+class GoogleImagesEngine(ImageSearchEngine):
+    name = "google_images"
+    upload_url = "https://www.google.com/searchbyimage/upload"
+    file_field = "encoded_image"
+
+    def parse(self, soup: BeautifulSoup) -> List[Dict]:
+        results = []
+
+        for idx, result in enumerate(soup.find_all('div', class_='g')[:10]):
+            link_tag = result.find('a')
+            title_tag = result.find('h3')
+            if link_tag and title_tag:
+                img_tag = result.find('img')
+                results.append({
+                    "source": "Google Images",
+                    "url": link_tag.get('href'),
+                    "title": title_tag.get_text(strip=True),
+                    "thumbnail": img_tag.get('src') if img_tag else None,
+                    "similarity": 0.75 - (idx * 0.03),
+                    "index": idx
+                })
+
+        if not results:
+            # Упрощённая разметка: внешние ссылки страницы
+            for link in soup.find_all('a', href=True):
+                href = link['href']
+                if 'http' in href and 'google' not in href:
+                    results.append({
+                        "source": "Google Images",
+                        "url": href,
+                        "title": link.get_text(strip=True)[:100],
+                        "similarity": 0.7,
+                        "index": len(results)
+                    })
+                    if len(results) >= 10:
+                        break
+
+        return results
+
+
+class TinEyeEngine(ImageSearchEngine):
+    name = "tineye"
+    upload_url = "https://tineye.com/search"
+    file_field = "image"
+
+    def parse(self, soup: BeautifulSoup) -> List[Dict]:
+        results = []
+
+        for idx, match in enumerate(soup.find_all('div', class_='match')[:10]):
+            link = match.find('a', class_='image-link') or match.find('a', href=True)
+            domain_tag = match.find('p', class_='domain')
+            img = match.find('img')
+            if link:
+                results.append({
+                    "source": "TinEye",
+                    "url": link.get('href'),
+                    "domain": domain_tag.get_text(strip=True) if domain_tag else "Unknown",
+                    "thumbnail": img.get('src') if img else None,
+                    "similarity": 0.85,
+                    "index": idx
+                })
+
+        return results
@@ -0,0 +1,38 @@
+"""
+Реестр OSINT движков
+"""
+from typing import Dict, Iterable, List, Optional
+
+from .base import Engine
+
+
+_ENGINES: Dict[str, Engine] = {}
+
+
+def register(engine: Engine) -> Engine:
+    """Регистрация движка (повторная регистрация с тем же именем заменяет прежний)"""
+    _ENGINES[engine.name] = engine
+    return engine
+
+
+def get(name: str) -> Optional[Engine]:
+    return _ENGINES.get(name)
+
+
+def all_engines() -> List[Engine]:
+    return list(_ENGINES.values())
+
+
+def engines_for(capability: str, names: Optional[Iterable[str]] = None) -> List[Engine]:
+    """
+    Движки с указанной capability в порядке регистрации
+
+    Args:
+        capability: тип цели (email, username, image)
+        names: если задано - только движки с этими именами
+    """
+    wanted = set(names) if names is not None else None
+    return [
+        engine for engine in _ENGINES.values()
+        if capability in engine.capabilities and (wanted is None or engine.name in wanted)
+    ]
@@ -0,0 +1,269 @@
+"""
+Планировщик движков: параллельный запуск, дедлайны, слияние результатов
+
+Все поисковые эндпоинты (новые и legacy) идут через fan_out(), поэтому
+ограничения параллелизма, таймауты, метрики и трассировка движков
+реализованы в одном месте.
+
+Порядок работы:
+1. выбираются доступные движки с нужной capability (и, опционально, по
+   имени и суммарной стоимости)
+2. основные движки запускаются параллельно, каждый - с таймаутом
+   min(engine.timeout, остаток дедлайна запроса)
+3. движки с fallback_for запускаются, только если их основной движок
+   не вернул результат
+4. перед запуском движок ждёт слот fair_queue (приоритет и справедливая
+   очередь между API клиентами); движок с разомкнутым выключателем
+   (modules.circuit_breaker) пропускается без ожидания таймаута
+5. результаты всех движков объединяются с дедупликацией по
+   нормализованному URL
+
+Исход каждого движка сразу передаётся слушателю engine_listener (если он
+задан в контексте) - так WebSocket сессия отдаёт частичные результаты,
+не дожидаясь остальных движков.
+"""
+import asyncio
+import contextvars
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+import config
+from modules import fair_queue, metrics, tracing
+from modules.circuit_breaker import breakers
+from modules.proxy_pool import ProxyUnavailable
+from modules.urls import normalize_url, url_host
+from . import registry
+from .base import Engine, EngineError, RATE_API, RATE_SCRAPE, RATE_SUBPROCESS
+
+
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+STATUS_TIMEOUT = "timeout"
+STATUS_SKIPPED = "skipped"
+
+# Одновременных запусков движков одного класса (на весь процесс)
+_CLASS_LIMITS = {
+    RATE_SUBPROCESS: config.ENGINE_SUBPROCESS_CONCURRENCY,
+    RATE_SCRAPE: config.ENGINE_SCRAPE_CONCURRENCY,
+    RATE_API: config.ENGINE_API_CONCURRENCY,
+}
+
+# Слушатель исходов движков текущего поиска: await listener(имя движка, исход)
+engine_listener: contextvars.ContextVar[Optional[Callable[[str, Dict], Awaitable[None]]]] = contextvars.ContextVar(
+    "engine_listener", default=None
+)
+
+# Семафоры храним по event loop (как сессии в http_client)
+_limiters: Dict[int, Dict[str, asyncio.Semaphore]] = {}
+
+
+def _limiter(rate_limit_class: str) -> Optional[asyncio.Semaphore]:
+    limit = _CLASS_LIMITS.get(rate_limit_class)
+    if not limit:
+        return None
+    per_loop = _limiters.setdefault(id(asyncio.get_running_loop()), {})
+    semaphore = per_loop.get(rate_limit_class)
+    if semaphore is None:
+        semaphore = per_loop[rate_limit_class] = asyncio.Semaphore(limit)
+    return semaphore
+
+
+async def _run_engine(engine: Engine, target: str, deadline_at: float, options: Dict) -> Dict:
+    """Запуск одного движка с таймаутом, метриками и спаном"""
+    start = time.perf_counter()
+    outcome = {"status": STATUS_OK, "results": []}
+
+    remaining = deadline_at - time.monotonic()
+    if remaining <= 0:
+        return {"status": STATUS_SKIPPED, "results": [], "error": "deadline", "elapsed_ms": 0.0}
+
+    # Upstream лежит - пропускаем сразу, не тратя таймаут (сработает fallback)
+    breaker = breakers.engine(engine.name) if engine.circuit_breaker else None
+    if breaker is not None and not breaker.allow():
+        return {"status": STATUS_SKIPPED, "results": [], "error": "circuit open", "elapsed_ms": 0.0}
+
+    # Слот справедливой очереди; ожидание слота входит в дедлайн запроса
+    fair = fair_queue.get_scheduler()
+    try:
+        token = await fair.acquire(engine.cost, timeout=remaining)
+    except asyncio.TimeoutError:
+        if breaker is not None:
+            breaker.release_trial()
+        return {
+            "status": STATUS_SKIPPED, "results": [], "error": "deadline (queued)",
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)
+        }
+
+    timeout = min(engine.timeout, deadline_at - time.monotonic())
+    try:
+        if timeout <= 0:
+            raise asyncio.TimeoutError()
+        with metrics.track_engine(engine.name) as tracker, \
+                tracing.start_span(f"engine.{engine.name}", tracing.KIND_CLIENT, cost=engine.cost) as span:
+            limiter = _limiter(engine.rate_limit_class)
+            if limiter is not None:
+                async with limiter:
+                    payload = await asyncio.wait_for(engine.search(target, **options), timeout)
+            else:
+                payload = await asyncio.wait_for(engine.search(target, **options), timeout)
+            tracker.outcome = engine.outcome(payload)
+            span.set_attribute("engine.results", len(payload.get("results", [])))
+        outcome.update(payload)
+    except asyncio.TimeoutError:
+        outcome["status"] = STATUS_TIMEOUT
+        outcome["error"] = f"timeout after {round(timeout, 1)}s"
+    except EngineError as e:
+        outcome["status"] = STATUS_ERROR
+        outcome["error"] = str(e)
+    except ProxyUnavailable as e:
+        # Пул прокси исчерпан - upstream не виноват, выключатель не трогаем
+        outcome["status"] = STATUS_SKIPPED
+        outcome["error"] = str(e)
+    except Exception as e:
+        outcome["status"] = STATUS_ERROR
+        outcome["error"] = str(e) or type(e).__name__
+    finally:
+        fair.release(token)
+
+    elapsed = time.perf_counter() - start
+    if breaker is not None:
+        if outcome["status"] == STATUS_OK:
+            breaker.record_success(elapsed)
+        elif outcome["status"] == STATUS_SKIPPED:
+            breaker.release_trial()
+        elif outcome["status"] == STATUS_ERROR or timeout >= engine.timeout:
+            # Таймаут из-за короткого остатка дедлайна запроса - не вина upstream
+            breaker.record_failure(elapsed, outcome.get("error", ""))
+        else:
+            breaker.release_trial()
+
+    outcome["elapsed_ms"] = round(elapsed * 1000, 1)
+
+    listener = engine_listener.get()
+    if listener is not None:
+        await listener(engine.name, outcome)
+    return outcome
+
+
+def engine_report(outcomes: Dict[str, Dict]) -> Dict[str, Dict]:
+    """Краткий отчёт по движкам для ответа API (статус, время, ошибка)"""
+    return {
+        name: {key: outcome[key] for key in ("status", "elapsed_ms", "error") if key in outcome}
+        for name, outcome in outcomes.items()
+    }
+
+
+def merge_results(outcomes: Dict[str, Dict], order: Iterable[str]) -> List[Dict]:
+    """
+    Объединение результатов движков с дедупликацией по нормализованному URL
+
+    URL записей заменяются каноническими (без обёрток-редиректов и
+    трекинговых параметров), domain - хост канонического URL. Первая
+    запись (в порядке order) остаётся, у неё накапливается список
+    engines, а similarity/confidence берутся максимальными.
+
+    Args:
+        outcomes: результаты fan_out по имени движка
+        order: порядок движков (приоритет при совпадении)
+
+    Returns:
+        List уникальных записей
+    """
+    merged: List[Dict] = []
+    by_url: Dict[str, Dict] = {}
+
+    for name in order:
+        for item in outcomes.get(name, {}).get("results", []):
+            url = item.get("url")
+            key = normalize_url(url) if url else None
+            existing = by_url.get(key) if key else None
+            if existing is None:
+                if key:
+                    item["url"] = key
+                    host = url_host(key)
+                    if host:
+                        item["domain"] = host
+                item.setdefault("engines", [name])
+                merged.append(item)
+                if key:
+                    by_url[key] = item
+                continue
+
+            if name not in existing["engines"]:
+                existing["engines"].append(name)
+            for score in ("similarity", "confidence"):
+                if item.get(score) is not None and item[score] > existing.get(score, float("-inf")):
+                    existing[score] = item[score]
+
+    return merged
+
+
+async def fan_out(
+    capability: str,
+    target: str,
+    engines: Optional[Iterable[str]] = None,
+    deadline: Optional[float] = None,
+    max_cost: Optional[float] = None,
+    **options
+) -> Dict:
+    """
+    Поиск по цели всеми подходящими движками
+
+    Args:
+        capability: тип цели (email, username, image)
+        target: email, username или путь к изображению
+        engines: имена движков (по умолчанию все с этой capability)
+        deadline: лимит времени на весь поиск в секундах
+        max_cost: бюджет суммарной стоимости (дорогие движки отбрасываются)
+        options: параметры для движков (max_sites и т.д.)
+
+    Returns:
+        Dict: engines - исход каждого движка (status, results, elapsed_ms, поля движка),
+        results - объединённые уникальные результаты
+    """
+    selected = registry.engines_for(capability, engines)
+    outcomes: Dict[str, Dict] = {}
+
+    # Бюджет стоимости: сначала дешёвые движки
+    if max_cost is not None:
+        spent = 0.0
+        within_budget = []
+        for engine in sorted(selected, key=lambda e: e.cost):
+            if spent + engine.cost <= max_cost:
+                within_budget.append(engine)
+                spent += engine.cost
+            else:
+                outcomes[engine.name] = {"status": STATUS_SKIPPED, "results": [], "error": "cost budget"}
+        selected = [engine for engine in selected if engine in within_budget]
+
+    for engine in list(selected):
+        if not engine.available():
+            outcomes[engine.name] = {"status": STATUS_SKIPPED, "results": [], "error": "unavailable"}
+            selected.remove(engine)
+
+    deadline_at = time.monotonic() + (deadline if deadline is not None else float("inf"))
+    selected_names = {engine.name for engine in selected}
+    # Fallback без основного движка в выборке запускается сразу
+    primary = [e for e in selected if not e.fallback_for or e.fallback_for not in selected_names]
+    fallbacks = [e for e in selected if e not in primary]
+
+    with tracing.start_span("engines.fan_out", capability=capability, engines=len(selected)):
+        results = await asyncio.gather(*[
+            _run_engine(engine, target, deadline_at, options) for engine in primary
+        ])
+        outcomes.update(zip([engine.name for engine in primary], results))
+
+        needed = [e for e in fallbacks if outcomes[e.fallback_for]["status"] != STATUS_OK]
+        for engine in fallbacks:
+            if engine not in needed:
+                outcomes[engine.name] = {"status": STATUS_SKIPPED, "results": [], "error": "primary succeeded"}
+        if needed:
+            results = await asyncio.gather(*[
+                _run_engine(engine, target, deadline_at, options) for engine in needed
+            ])
+            outcomes.update(zip([engine.name for engine in needed], results))
+
+    return {
+        "engines": outcomes,
+        "results": merge_results(outcomes, [engine.name for engine in selected])
+    }
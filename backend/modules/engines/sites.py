@@ -0,0 +1,190 @@
+"""
+Каталог сайтов для проверки username (формат Sherlock/Maigret)
+
+Поля:
+    url: шаблон адреса профиля ({} - username)
+    urlMain: главная страница сайта
+    regexCheck: допустимые username на сайте (если нет - любые); кандидаты,
+        которые сайт не принимает, не проверяются
+    errorType: способ определить отсутствие профиля (status_code)
+    caseInsensitive: регистр username не различается (JohnDoe и johndoe -
+        один профиль); без флага разные написания проверяются отдельно
+    tags: категории платформы
+    username_claimed: заведомо существующий username (для калибровки)
+    username_unclaimed: заведомо свободный username (для калибровки)
+"""
+from typing import Dict
+
+
+SITE_CATALOG: Dict[str, Dict] = {
+    "GitHub": {
+        "url": "https://github.com/{}",
+        "urlMain": "https://github.com/",
+        "regexCheck": "^[a-zA-Z0-9](?:[a-zA-Z0-9]|-(?=[a-zA-Z0-9])){0,38}$",
+        "errorType": "status_code",
+        "caseInsensitive": True,
+        "tags": ["coding", "tech"],
+        "username_claimed": "blue",
+        "username_unclaimed": "noonewouldeverusethis7"
+    },
+    "Instagram": {
+        "url": "https://www.instagram.com/{}/",
+        "urlMain": "https://www.instagram.com/",
+        "regexCheck": "^[a-zA-Z0-9._]{1,30}$",
+        "errorType": "status_code",
+        "caseInsensitive": True,
+        "tags": ["social", "photo"],
+        "username_claimed": "instagram",
+        "username_unclaimed": "noonewouldeverusethis7"
+    },
+    "Twitter": {
+        "url": "https://twitter.com/{}",
+        "urlMain": "https://twitter.com/",
+        "regexCheck": "^[a-zA-Z0-9_]{1,15}$",
+        "errorType": "status_code",
+        "caseInsensitive": True,
+        "tags": ["social", "news"],
+        "username_claimed": "elonmusk",
+        "username_unclaimed": "noonewouldeverusethis7"
+    },
+    "Reddit": {
+        "url": "https://www.reddit.com/user/{}",
+        "urlMain": "https://www.reddit.com/",
+        "regexCheck": "^[a-zA-Z0-9_-]{3,20}$",
+        "errorType": "status_code",
+        "caseInsensitive": True,
+        "tags": ["social", "forum"],
+        "username_claimed": "blue",
+        "username_unclaimed": "noonewouldeverusethis7"
+    },
+    "Medium": {
+        "url": "https://medium.com/@{}",
+        "urlMain": "https://medium.com/",
+        "errorType": "status_code",
+        "tags": ["blogging", "writing"],
+        "username_claimed": "medium",
+        "username_unclaimed": "noonewouldeverusethis7"
+    },
+    "YouTube": {
+        "url": "https://www.youtube.com/@{}",
+        "urlMain": "https://www.youtube.com/",
+        "regexCheck": "^[a-zA-Z0-9._-]{3,30}$",
+        "errorType": "status_code",
+        "caseInsensitive": True,
+        "tags": ["video", "social"],
+        "username_claimed": "youtube",
+        "username_unclaimed": "noonewouldeverusethis7"
+    },
+    "TikTok": {
+        "url": "https://www.tiktok.com/@{}",
+        "urlMain": "https://www.tiktok.com/",
+        "regexCheck": "^[a-zA-Z0-9_.]{2,24}$",
+        "errorType": "status_code",
+        "caseInsensitive": True,
+        "tags": ["video", "social"],
+        "username_claimed": "tiktok",
+        "username_unclaimed": "noonewouldeverusethis7"
+    },
+    "Telegram": {
+        "url": "https://t.me/{}",
+        "urlMain": "https://t.me/",
+        "regexCheck": "^[a-zA-Z][a-zA-Z0-9_]{4,31}$",
+        "errorType": "status_code",
+        "caseInsensitive": True,
+        "tags": ["messenger", "social"],
+        "username_claimed": "telegram",
+        "username_unclaimed": "noonewouldeverusethis7"
+    },
+    "VK": {
+        "url": "https://vk.com/{}",
+        "urlMain": "https://vk.com/",
+        "regexCheck": "^[a-zA-Z0-9_.]{2,32}$",
+        "errorType": "status_code",
+        "tags": ["social", "russian"],
+        "username_claimed": "vk",
+        "username_unclaimed": "noonewouldeverusethis7"
+    },
+    "Habr": {
+        "url": "https://habr.com/ru/users/{}",
+        "urlMain": "https://habr.com/",
+        "errorType": "status_code",
+        "tags": ["tech", "russian", "blogging"],
+        "username_claimed": "boomburum",
+        "username_unclaimed": "noonewouldeverusethis7"
+    },
+    "Behance": {
+        "url": "https://www.behance.net/{}",
+        "urlMain": "https://www.behance.net/",
+        "errorType": "status_code",
+        "tags": ["design", "portfolio"],
+        "username_claimed": "behance",
+        "username_unclaimed": "noonewouldeverusethis7"
+    },
+    "Dribbble": {
+        "url": "https://dribbble.com/{}",
+        "urlMain": "https://dribbble.com/",
+        "errorType": "status_code",
+        "tags": ["design", "portfolio"],
+        "username_claimed": "dribbble",
+        "username_unclaimed": "noonewouldeverusethis7"
+    },
+    "LinkedIn": {
+        "url": "https://www.linkedin.com/in/{}",
+        "urlMain": "https://www.linkedin.com/",
+        "regexCheck": "^[a-zA-Z0-9-]{3,100}$",
+        "errorType": "status_code",
+        "tags": ["professional", "networking"],
+        "username_claimed": "linkedin",
+        "username_unclaimed": "noonewouldeverusethis7"
+    },
+    "Twitch": {
+        "url": "https://www.twitch.tv/{}",
+        "urlMain": "https://www.twitch.tv/",
+        "regexCheck": "^[a-zA-Z0-9_]{4,25}$",
+        "errorType": "status_code",
+        "caseInsensitive": True,
+        "tags": ["gaming", "streaming"],
+        "username_claimed": "twitch",
+        "username_unclaimed": "noonewouldeverusethis7"
+    },
+    "Pinterest": {
+        "url": "https://www.pinterest.com/{}",
+        "urlMain": "https://www.pinterest.com/",
+        "regexCheck": "^[a-zA-Z0-9_]{3,30}$",
+        "errorType": "status_code",
+        "caseInsensitive": True,
+        "tags": ["photo", "social"],
+        "username_claimed": "pinterest",
+        "username_unclaimed": "noonewouldeverusethis7"
+    },
+    "Tumblr": {
+        "url": "https://{}.tumblr.com",
+        "urlMain": "https://www.tumblr.com/",
+        "regexCheck": "^[a-zA-Z0-9-]{1,32}$",
+        "errorType": "status_code",
+        "caseInsensitive": True,
+        "tags": ["blogging", "social"],
+        "username_claimed": "tumblr",
+        "username_unclaimed": "noonewouldeverusethis7"
+    },
+    "Facebook": {
+        "url": "https://www.facebook.com/{}",
+        "urlMain": "https://www.facebook.com/",
+        "regexCheck": "^[a-zA-Z0-9.]{5,50}$",
+        "errorType": "status_code",
+        "caseInsensitive": True,
+        "tags": ["social"],
+        "username_claimed": "facebook",
+        "username_unclaimed": "noonewouldeverusethis7"
+    },
+    "Snapchat": {
+        "url": "https://www.snapchat.com/add/{}",
+        "urlMain": "https://www.snapchat.com/",
+        "regexCheck": "^[a-zA-Z][a-zA-Z0-9._-]{1,13}[a-zA-Z0-9]$",
+        "errorType": "status_code",
+        "caseInsensitive": True,
+        "tags": ["social", "messenger"],
+        "username_claimed": "snapchat",
+        "username_unclaimed": "noonewouldeverusethis7"
+    }
+}
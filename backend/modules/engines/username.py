@@ -0,0 +1,527 @@
+"""
+Поиск по username: Maigret (CLI, 500+ сайтов) и собственная проверка каталога сайтов
+"""
+import asyncio
+import json
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import aiohttp
+from bs4 import BeautifulSoup
+
+import config
+from modules import fair_queue, metrics, tracing
+from modules.circuit_breaker import CircuitBreaker, breakers
+from modules.records import ProfileResult
+from modules.http_client import conditional_headers, get_session, request, response_validators
+from modules.proxy_pool import ProxyUnavailable
+from modules import single_flight
+from modules.calibration import Fingerprint, calibrator, fingerprint
+from modules.site_stats import OUTCOME_ERROR, OUTCOME_FOUND, OUTCOME_NOT_FOUND, OUTCOME_UNCERTAIN, site_stats
+from modules.process_utils import run_command
+from .base import Engine, EngineError, CAPABILITY_USERNAME, RATE_PROBE, RATE_SUBPROCESS
+from .sites import SITE_CATALOG
+
+
+# Таймаут проверки одного сайта (бюджет времени поиска может его уменьшить)
+PROBE_TIMEOUT = 10
+
+# Maigret сохраняет отчёты в backend/reports (рабочая директория сервера)
+REPORTS_DIR = Path(__file__).resolve().parent.parent.parent / 'reports'
+
+
+class MaigretEngine(Engine):
+    """
+    Поиск username через РЕАЛЬНУЮ библиотеку Maigret
+
+    Maigret имеет базу из 500+ сайтов и продвинутые методы проверки
+    """
+
+    name = "maigret"
+    capabilities = frozenset({CAPABILITY_USERNAME})
+    rate_limit_class = RATE_SUBPROCESS
+    cost = 60.0
+    timeout = 120
+
+    async def search(self, target: str, max_sites: Optional[int] = None, **options) -> Dict:
+        cmd = ['maigret', target, '--json', 'simple', '--timeout', '10']
+        # Если указано max_sites, используем топ сайты
+        if max_sites:
+            cmd.extend(['--top-sites', str(max_sites)])
+
+        try:
+            result = await run_command(cmd, timeout=self.timeout)
+        except FileNotFoundError:
+            raise EngineError("maigret не установлен")
+        except subprocess.TimeoutExpired:
+            raise asyncio.TimeoutError()
+
+        span = tracing.current_span()
+        if span is not None:
+            span.set_attribute("process.exit_code", result.returncode)
+
+        report_file = REPORTS_DIR / f'report_{target}_simple.json'
+        if result.returncode != 0 or not report_file.exists():
+            raise EngineError(f"maigret завершился с кодом {result.returncode}")
+
+        try:
+            maigret_data = await asyncio.to_thread(self._read_report, report_file)
+        except (json.JSONDecodeError, IOError) as e:
+            raise EngineError(f"Некорректный отчёт maigret: {e}")
+
+        return {"results": self._convert(maigret_data)}
+
+    @staticmethod
+    def _read_report(report_file: Path) -> Dict:
+        with open(report_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        # Удаляем файл отчета после чтения
+        try:
+            report_file.unlink()
+        except OSError:
+            pass
+        return data
+
+    @staticmethod
+    def _convert(maigret_data: Dict) -> List[ProfileResult]:
+        """Конвертирует отчёт maigret в наш формат (только найденные профили)"""
+        results = []
+
+        for site_name, site_data in maigret_data.items():
+            if not isinstance(site_data, dict):
+                continue
+            status_obj = site_data.get('status', {})
+            if not (isinstance(status_obj, dict) and status_obj.get('status') == 'Claimed'):
+                continue
+
+            results.append(ProfileResult(
+                platform=site_name,
+                url=site_data.get('url_user', site_data.get('url', '')),
+                http_status=site_data.get('http_status', 200),
+                tags=tuple(status_obj.get('tags', site_data.get('site', {}).get('tags', []))),
+                # Метаданные, если maigret их извлёк
+                full_name=site_data.get('name'),
+                avatar_url=site_data.get('avatar_url'),
+                bio=site_data.get('bio') or site_data.get('description')
+            ))
+
+        return results
+
+
+class SiteProbeEngine(Engine):
+    """
+    Проверка username по каталогу сайтов (fallback, если maigret не сработал)
+
+    Все сайты проверяются параллельно через общую сессию; со страниц
+    найденных профилей извлекаются имя, аватар и биография. Сайты, чей
+    regexCheck не принимает username, пропускаются без запроса, как и
+    сайты с разомкнутым выключателем (modules.circuit_breaker). При
+    max_sites или бюджете времени берутся сайты с лучшей историей
+    находок в секунду (modules.site_stats), а не первые в каталоге.
+    """
+
+    name = "sites"
+    capabilities = frozenset({CAPABILITY_USERNAME})
+    rate_limit_class = RATE_PROBE
+    cost = 5.0
+    timeout = 30
+    fallback_for = "maigret"
+    circuit_breaker = False  # выключатели по сайтам
+
+    def __init__(self, catalog: Optional[Dict[str, Dict]] = None):
+        self.catalog = SITE_CATALOG if catalog is None else catalog
+        self.rules = {
+            site_name: re.compile(site_data["regexCheck"])
+            for site_name, site_data in self.catalog.items()
+            if site_data.get("regexCheck")
+        }
+        # Названия интернированы, теги - один tuple на сайт для всех записей
+        self.names = {site_name: sys.intern(site_name) for site_name in self.catalog}
+        self.tags = {
+            site_name: tuple(site_data.get("tags", ()))
+            for site_name, site_data in self.catalog.items()
+        }
+        self.headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        }
+
+    def accepts(self, site_name: str, username: str) -> bool:
+        """Допускает ли сайт такой username (regexCheck каталога)"""
+        rule = self.rules.get(site_name)
+        return rule is None or rule.fullmatch(username) is not None
+
+    def profile_key(self, site_name: str, url: str) -> str:
+        """Ключ профиля: URL, без регистра - для сайтов с caseInsensitive"""
+        return url.lower() if self.catalog[site_name].get("caseInsensitive") else url
+
+    def _sites(self, max_sites: Optional[int], time_budget: Optional[float] = None) -> List:
+        """Сайты под бюджет по статистике (modules.site_stats), без сломанных"""
+        names = site_stats.select(list(self.catalog), max_sites, time_budget)
+        return [(name, self.catalog[name]) for name in names]
+
+    async def search(
+        self,
+        target: str,
+        max_sites: Optional[int] = None,
+        time_budget: Optional[float] = None,
+        **options
+    ) -> Dict:
+        sites = self._sites(max_sites, time_budget)
+        allowed = [(name, data) for name, data in sites if self.accepts(name, target)]
+        timeout = min(PROBE_TIMEOUT, time_budget) if time_budget else PROBE_TIMEOUT
+
+        session = await get_session()
+        outcomes = await asyncio.gather(*[
+            self.probe(target, site_name, site_data, session, timeout)
+            for site_name, site_data in allowed
+        ], return_exceptions=True)
+
+        return {
+            "results": [outcome for outcome in outcomes if isinstance(outcome, ProfileResult)],
+            "sites_checked": len(allowed),
+            "sites_pruned": len(sites) - len(allowed)
+        }
+
+    async def probe_batch(
+        self,
+        usernames: List[str],
+        max_sites: Optional[int] = None,
+        concurrency: int = 50,
+        deadline: Optional[float] = None
+    ) -> Dict:
+        """
+        Проверка набора username одним расписанием
+
+        Пары (username, сайт) отбрасываются до запросов, если сайт не
+        принимает username (regexCheck) или URL профиля уже в расписании.
+        Все проверки идут через общую сессию с общим лимитом параллелизма.
+
+        Расписание выполняется частями по concurrency проверок; каждая
+        часть занимает слот fair_queue в классе bulk (пакет не обгоняет
+        одиночные поиски). Части, не успевшие до дедлайна, не проверяются.
+
+        Args:
+            usernames: кандидаты
+            max_sites: ограничение каталога
+            concurrency: одновременных запросов на всё расписание
+            deadline: секунд на всё расписание (по умолчанию USERNAME_SEARCH_TIMEOUT)
+
+        Returns:
+            Dict: results (с полем username), probes, pruned по сайтам,
+            skipped (не проверено из-за дедлайна)
+        """
+        sites = self._sites(max_sites)
+        schedule = []
+        seen_urls = set()
+        pruned: Dict[str, int] = {}
+
+        for site_name, site_data in sites:
+            for username in usernames:
+                if not self.accepts(site_name, username):
+                    pruned[site_name] = pruned.get(site_name, 0) + 1
+                    continue
+                url = self.profile_key(site_name, site_data["url"].format(username))
+                if url in seen_urls:
+                    continue
+                seen_urls.add(url)
+                schedule.append((username, site_name, site_data))
+
+        session = await get_session()
+        deadline_at = time.monotonic() + (deadline or config.USERNAME_SEARCH_TIMEOUT)
+        fair = fair_queue.get_scheduler()
+        client, _ = fair_queue.current_client.get()
+        step = max(concurrency, 1)
+
+        async def run(username: str, site_name: str, site_data: Dict) -> Optional[ProfileResult]:
+            timeout = min(PROBE_TIMEOUT, max(deadline_at - time.monotonic(), 0.1))
+            outcome = await self.probe(username, site_name, site_data, session, timeout)
+            if outcome is not None:
+                outcome.username = username
+            return outcome
+
+        outcomes = []
+        probed = 0
+        with tracing.start_span("probe.batch", probes=len(schedule), candidates=len(usernames)) as span:
+            for start in range(0, len(schedule), step):
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                # Пакет - всегда bulk, даже внутри одиночного поиска (variants=True)
+                bulk = fair_queue.current_client.set((client, fair_queue.PRIORITY_BULK))
+                try:
+                    token = await fair.acquire(self.cost, timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                finally:
+                    fair_queue.current_client.reset(bulk)
+                try:
+                    chunk = schedule[start:start + step]
+                    outcomes += await asyncio.gather(*[run(*entry) for entry in chunk], return_exceptions=True)
+                    probed += len(chunk)
+                finally:
+                    fair.release(token)
+            span.set_attribute("probe.skipped", len(schedule) - probed)
+
+        return {
+            "results": [outcome for outcome in outcomes if isinstance(outcome, ProfileResult)],
+            "probes": probed,
+            "pruned": pruned,
+            "skipped": len(schedule) - probed
+        }
+
+    async def probe(
+        self,
+        username: str,
+        site_name: str,
+        site_data: Dict,
+        session: aiohttp.ClientSession,
+        timeout: float = PROBE_TIMEOUT
+    ) -> Optional[ProfileResult]:
+        """
+        Проверка username на одном сайте
+
+        Ответ сверяется с отпечатками калибровки сайта (modules.calibration):
+        200 от сайта, отвечающего 200 и на свободные username, не считается
+        найденным профилем. Исход и задержка уходят в статистику сайта
+        (modules.site_stats). Одновременные проверки того же профиля (из
+        разных поисков и пакетов вариантов) делают один запрос (single_flight).
+
+        Args:
+            username: username для поиска
+            site_name: название сайта
+            site_data: запись каталога
+            session: aiohttp сессия
+            timeout: таймаут запроса в секундах
+
+        Returns:
+            ProfileResult (found/uncertain) или None
+        """
+        url = site_data["url"].format(username)
+        return await single_flight.probes.do(
+            (site_name, self.profile_key(site_name, url)),
+            lambda: self._probe(username, url, site_name, session, timeout)
+        )
+
+    async def _probe(
+        self,
+        username: str,
+        url: str,
+        site_name: str,
+        session: aiohttp.ClientSession,
+        timeout: float
+    ) -> Optional[ProfileResult]:
+        breaker = breakers.site(site_name)
+        if not breaker.allow():
+            return None
+        started = time.perf_counter()
+
+        try:
+            with metrics.track_probe(self.name, site_name) as probe, \
+                    tracing.start_span("probe.site", tracing.KIND_CLIENT, site=site_name) as span:
+                async with request(
+                    "GET", url,
+                    timeout=timeout,
+                    session=session,
+                    headers=self.headers,
+                    allow_redirects=True
+                ) as response:
+                    span.set_attribute("http.status_code", response.status)
+                    latency_ms = _record(breaker, response.status, started)
+                    html = await response.text() if response.status == 200 else ""
+                    outcome = _calibrated(site_name, response.status, html, username)
+                    if outcome != _outcome(response.status):
+                        span.set_attribute("calibration.verdict", outcome)
+                    site_stats.record(site_name, outcome, latency_ms / 1000)
+                    probe.outcome = outcome
+
+                    if outcome == OUTCOME_FOUND:
+                        span.set_attribute("http.response.body.size", len(html))
+                        # Парсинг HTML в потоке, чтобы не блокировать event loop
+                        extracted_data = await asyncio.to_thread(extract_profile_data, html)
+
+                        return ProfileResult(
+                            platform=self.names.get(site_name, site_name),
+                            url=url,
+                            http_status=response.status,
+                            latency_ms=latency_ms,
+                            tags=self.tags.get(site_name, ()),
+                            **extracted_data
+                        )
+                    elif outcome == OUTCOME_NOT_FOUND:
+                        return None
+                    else:
+                        return ProfileResult(
+                            platform=self.names.get(site_name, site_name),
+                            url=url,
+                            status="uncertain",
+                            confidence=0.5,
+                            http_status=response.status,
+                            latency_ms=latency_ms,
+                            tags=self.tags.get(site_name, ())
+                        )
+        except ProxyUnavailable:
+            # Сайт не виноват - выключатель не трогаем
+            return None
+        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+            elapsed = time.perf_counter() - started
+            breaker.record_failure(elapsed, str(e) or type(e).__name__)
+            site_stats.record(site_name, OUTCOME_ERROR, elapsed, str(e) or type(e).__name__)
+            return None
+
+    async def check(
+        self,
+        username: str,
+        site_name: str,
+        site_data: Dict,
+        session: aiohttp.ClientSession,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None
+    ) -> Dict:
+        """
+        Лёгкая проверка наличия профиля для мониторинга
+
+        Условный запрос по валидаторам прошлого ответа; тело читается
+        только для сайтов, отвечающих 200 и на свободные username
+        (modules.calibration). Статусы: found, not_found, not_modified,
+        uncertain, error.
+
+        Returns:
+            Dict: status, http_status, etag/last_modified (если сайт их отдаёт)
+        """
+        url = site_data["url"].format(username)
+        breaker = breakers.site(site_name)
+        if not breaker.allow():
+            return {"status": "error", "error": "circuit open"}
+        started = time.perf_counter()
+
+        try:
+            with metrics.track_probe(self.name, site_name) as probe, \
+                    tracing.start_span("probe.site", tracing.KIND_CLIENT, site=site_name, conditional=bool(etag or last_modified)) as span:
+                async with request(
+                    "GET", url,
+                    timeout=PROBE_TIMEOUT,
+                    session=session,
+                    headers={**self.headers, **conditional_headers(etag, last_modified)},
+                    allow_redirects=True
+                ) as response:
+                    span.set_attribute("http.status_code", response.status)
+                    _record(breaker, response.status, started)
+                    if response.status == 304:
+                        status = "not_modified"
+                    elif response.status == 200 and calibrator.needs_body(site_name):
+                        status = _calibrated(site_name, 200, await response.text(), username)
+                    else:
+                        status = _calibrated(site_name, response.status, "", username)
+                    probe.outcome = status
+                    return {"status": status, "http_status": response.status, **response_validators(response)}
+        except ProxyUnavailable as e:
+            return {"status": "error", "error": str(e)}
+        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+            breaker.record_failure(time.perf_counter() - started, str(e) or type(e).__name__)
+            return {"status": "error", "error": str(e) or type(e).__name__}
+
+    async def fingerprint_probe(self, username: str, site_data: Dict) -> Fingerprint:
+        """
+        Отпечаток ответа сайта на username (калибровка, modules.calibration)
+
+        Идёт мимо выключателя и статистики сайта: калибровка не должна
+        влиять на выбор сайтов для поиска.
+        """
+        url = site_data["url"].format(username)
+        async with request(
+            "GET", url,
+            timeout=PROBE_TIMEOUT,
+            headers=self.headers,
+            allow_redirects=True
+        ) as response:
+            return fingerprint(response.status, await response.text(), username)
+
+
+def _outcome(status: int) -> str:
+    """Исход проверки сайта по статусу ответа"""
+    if status == 200:
+        return OUTCOME_FOUND
+    if status == 404:
+        return OUTCOME_NOT_FOUND
+    return OUTCOME_UNCERTAIN
+
+
+def _calibrated(site_name: str, status: int, body: str, username: str) -> str:
+    """
+    Исход проверки с учётом калибровки сайта (modules.calibration)
+
+    Калибровка может только опровергнуть "найден" (soft-404) или признать
+    ответ отказом; неизвестный ей ответ решается по статусу.
+    """
+    outcome = _outcome(status)
+    verdict = calibrator.classify(site_name, fingerprint(status, body, username))
+    if verdict is None or verdict == outcome:
+        return outcome
+    if outcome == OUTCOME_FOUND:
+        calibrator.suppressed(site_name, verdict)
+        return verdict
+    return verdict if verdict == OUTCOME_NOT_FOUND else outcome
+
+
+def _record(breaker: CircuitBreaker, status: int, started: float) -> float:
+    """
+    Ответ сайта в выключатель: 429 и 5xx - сбой, остальное - сайт работает
+
+    Returns:
+        Время до ответа в миллисекундах
+    """
+    elapsed = time.perf_counter() - started
+    if status == 429 or status >= 500:
+        breaker.record_failure(elapsed, f"HTTP {status}")
+    else:
+        breaker.record_success(elapsed)
+    return round(elapsed * 1000, 1)
+
+
+def extract_profile_data(html: str) -> Dict:
+    """
+    Извлечение данных профиля из HTML (упрощенная версия socid-extractor)
+
+    Args:
+        html: HTML страницы
+
+    Returns:
+        Dict с извлеченными данными (full_name, avatar_url, bio)
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    extracted = {}
+
+    selectors = {
+        'full_name': [
+            ('meta', {'property': 'og:title'}),
+            ('meta', {'name': 'twitter:title'}),
+            ('h1', {}),
+            ('span', {'class': 'ProfileHeaderCard-name'}),
+        ],
+        'avatar_url': [
+            ('meta', {'property': 'og:image'}),
+            ('img', {'class': 'avatar'}),
+            ('img', {'class': 'profile-pic'}),
+        ],
+        'bio': [
+            ('meta', {'property': 'og:description'}),
+            ('meta', {'name': 'description'}),
+            ('p', {'class': 'bio'}),
+        ],
+    }
+
+    for field, candidates in selectors.items():
+        for tag, attrs in candidates:
+            element = soup.find(tag, attrs)
+            if element:
+                if field == 'avatar_url':
+                    extracted[field] = element.get('content') or element.get('src')
+                else:
+                    extracted[field] = element.get('content') or element.get_text(strip=True)
+                break
+
+    return extracted
@@ -0,0 +1,293 @@
+"""
+Экспорт результатов пакетных поисков в колоночном виде (Parquet, Arrow, CSV)
+
+Фиксированная схема строки: target, site, status, confidence, http_status,
+latency_ms, fetched_at. Одна строка - один профиль/утечка/регистрация/
+результат выдачи; неудачные движки дают строку site="engine:<имя>".
+
+Поиски по целям идут окном из EXPORT_CONCURRENCY, строки копятся до
+EXPORT_ROW_GROUP_SIZE и пишутся одной группой строк (record batch), после
+чего байты сразу уходят клиенту. Память не зависит от числа целей и строк:
+в работе максимум окно ответов и одна группа строк.
+
+Parquet и Arrow требуют pyarrow; CSV работает без него.
+"""
+import asyncio
+import csv
+import io
+import logging
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import config
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # без pyarrow доступен только CSV
+    pa = pq = None
+
+
+logger = logging.getLogger(__name__)
+
+
+COLUMNS = ("target", "site", "status", "confidence", "http_status", "latency_ms", "fetched_at")
+
+FORMAT_PARQUET = "parquet"
+FORMAT_ARROW = "arrow"
+FORMAT_CSV = "csv"
+FORMATS = (FORMAT_PARQUET, FORMAT_ARROW, FORMAT_CSV)
+
+MEDIA_TYPES = {
+    FORMAT_PARQUET: "application/vnd.apache.parquet",
+    FORMAT_ARROW: "application/vnd.apache.arrow.stream",
+    FORMAT_CSV: "text/csv; charset=utf-8",
+}
+
+Row = Tuple[str, str, str, Optional[float], Optional[int], Optional[float], float]
+
+
+class ExportError(Exception):
+    """Формат экспорта недоступен или неизвестен"""
+
+
+def available_formats() -> List[str]:
+    return list(FORMATS) if pa is not None else [FORMAT_CSV]
+
+
+# ---------- строки из ответов поиска
+
+def _engine_rows(target: str, engines: Dict[str, Dict], fetched_at: float) -> Iterator[Row]:
+    """Строки для движков, не вернувших результат (таймаут, ошибка, выключатель)"""
+    for name, report in engines.items():
+        if report.get("status") not in ("ok", "skipped"):
+            yield (target, f"engine:{name}", report["status"], None, None, report.get("elapsed_ms"), fetched_at)
+
+
+def username_rows(target: str, response: Dict, fetched_at: float) -> Iterator[Row]:
+    for result in response.get("results", []):
+        yield (
+            target, result.get("platform"), result.get("status"), result.get("confidence"),
+            result.get("http_status"), result.get("latency_ms"), fetched_at
+        )
+    yield from _engine_rows(target, response.get("engines", {}), fetched_at)
+
+
+def email_rows(target: str, response: Dict, fetched_at: float) -> Iterator[Row]:
+    for breach in response.get("breaches", {}).get("breaches", []):
+        yield (target, breach.get("domain") or breach.get("name"), "breached", 1.0, None, None, fetched_at)
+
+    registrations = response.get("registrations", {})
+    found = {site.get("site"): site for site in registrations.get("sites", [])}
+    timings = registrations.get("site_timings")
+    if timings:
+        # Fallback проверка: строки по всем сайтам, включая незарегистрированные
+        for site, timing in timings.items():
+            if site in found:
+                status, confidence = "registered", found[site].get("confidence")
+            elif timing.get("error"):
+                status, confidence = "error", None
+            else:
+                status, confidence = "not_registered", None
+            yield (target, site, status, confidence, timing.get("http_status"), timing.get("elapsed_ms"), fetched_at)
+    else:
+        for site, entry in found.items():
+            yield (target, site, "registered", entry.get("confidence"), None, None, fetched_at)
+
+    yield from _engine_rows(target, response.get("engines", {}), fetched_at)
+
+
+def photo_rows(target: str, response: Dict, fetched_at: float) -> Iterator[Row]:
+    for result in response.get("all_results", []):
+        yield (
+            target, result.get("domain") or result.get("source"), "found",
+            result.get("similarity"), None, None, fetched_at
+        )
+    yield from _engine_rows(target, response.get("engines", {}), fetched_at)
+
+
+# ---------- поиск по целям окном
+
+async def lookup_rows(
+    targets: Iterable[Tuple[str, str]],
+    lookup: Callable,
+    to_rows: Callable,
+    concurrency: int = config.EXPORT_CONCURRENCY
+) -> AsyncIterator[List[Row]]:
+    """
+    Строки по целям по мере завершения поисков (не больше concurrency одновременно)
+
+    Args:
+        targets: пары (метка для колонки target, значение для поиска)
+        lookup: async функция поиска по значению
+        to_rows: функция (метка, ответ, fetched_at) -> строки
+        concurrency: поисков одновременно
+    """
+    async def run(label: str, value: str) -> List[Row]:
+        try:
+            response = await lookup(value)
+        except Exception as e:
+            logger.warning("Экспорт: поиск %s не удался: %s", label, e)
+            return [(label, "lookup", "error", None, None, None, time.time())]
+        return list(to_rows(label, response, time.time()))
+
+    iterator = iter(targets)
+    pending = set()
+
+    def launch() -> bool:
+        target = next(iterator, None)
+        if target is None:
+            return False
+        pending.add(asyncio.ensure_future(run(*target)))
+        return True
+
+    for _ in range(concurrency):
+        if not launch():
+            break
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                launch()
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+# ---------- потоковые писатели
+
+class _Sink:
+    """Файл для pyarrow, байты которого забираются после каждой группы строк"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _arrow_schema():
+    return pa.schema([
+        ("target", pa.string()),
+        ("site", pa.string()),
+        ("status", pa.dictionary(pa.int8(), pa.string())),
+        ("confidence", pa.float64()),
+        ("http_status", pa.int16()),
+        ("latency_ms", pa.float32()),
+        ("fetched_at", pa.timestamp("ms", tz="UTC")),
+    ])
+
+
+class _ArrowWriter:
+    """Parquet (группа строк на батч) или Arrow IPC stream"""
+
+    def __init__(self, fmt: str):
+        self.schema = _arrow_schema()
+        self.sink = _Sink()
+        if fmt == FORMAT_PARQUET:
+            self.writer = pq.ParquetWriter(
+                pa.PythonFile(self.sink, mode="w"), self.schema,
+                compression=config.EXPORT_PARQUET_COMPRESSION
+            )
+        else:
+            self.writer = pa.ipc.new_stream(pa.PythonFile(self.sink, mode="w"), self.schema)
+
+    def write(self, rows: List[Row]) -> bytes:
+        if rows:
+            columns = list(zip(*rows))
+            arrays = [
+                pa.array(columns[0], pa.string()),
+                pa.array(columns[1], pa.string()),
+                pa.array(columns[2], pa.string()).dictionary_encode().cast(self.schema.field("status").type),
+                pa.array(columns[3], pa.float64()),
+                pa.array(columns[4], pa.int16()),
+                pa.array(columns[5], pa.float32()),
+                pa.array([int(ts * 1000) for ts in columns[6]], pa.int64()).cast(pa.timestamp("ms", tz="UTC")),
+            ]
+            self.writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        return self.sink.drain()
+
+    def close(self) -> bytes:
+        self.writer.close()
+        return self.sink.drain()
+
+
+class _CsvWriter:
+    def __init__(self):
+        self.header = True
+
+    def write(self, rows: List[Row]) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if self.header:
+            writer.writerow(COLUMNS)
+            self.header = False
+        for row in rows:
+            fetched_at = datetime.fromtimestamp(row[6], timezone.utc).isoformat(timespec="milliseconds")
+            writer.writerow(row[:6] + (fetched_at,))
+        return buffer.getvalue().encode("utf-8")
+
+    def close(self) -> bytes:
+        return self.write([]) if self.header else b""
+
+
+def make_writer(fmt: str):
+    """
+    Писатель формата
+
+    Raises:
+        ExportError: формат неизвестен или нужен pyarrow
+    """
+    if fmt == FORMAT_CSV:
+        return _CsvWriter()
+    if fmt not in FORMATS:
+        raise ExportError(f"Неизвестный формат {fmt}, доступны: {', '.join(FORMATS)}")
+    if pa is None:
+        raise ExportError(f"Формат {fmt} требует pyarrow")
+    return _ArrowWriter(fmt)
+
+
+async def encode_stream(
+    batches: AsyncIterator[List[Row]],
+    writer,
+    row_group_size: int = config.EXPORT_ROW_GROUP_SIZE
+) -> AsyncIterator[bytes]:
+    """
+    Байты экспорта по мере накопления групп строк
+
+    Кодирование группы идёт в потоке, чтобы не блокировать event loop.
+    """
+    rows: List[Row] = []
+    async for batch in batches:
+        rows.extend(batch)
+        if len(rows) >= row_group_size:
+            chunk = await asyncio.to_thread(writer.write, rows)
+            rows = []
+            if chunk:
+                yield chunk
+
+    tail = await asyncio.to_thread(writer.write, rows) if rows else b""
+    tail += await asyncio.to_thread(writer.close)
+    if tail:
+        yield tail
@@ -0,0 +1,287 @@
+"""
+Локальный CPU пайплайн лиц: детекция, выравнивание, эмбеддинги
+
+Модели OpenCV Zoo (ONNX, запускаются через OpenCV DNN):
+- YuNet (face_detection_yunet_2023mar.onnx) - детекция лиц и 5 точек
+- SFace (face_recognition_sface_2021dec.onnx) - 128-мерный эмбеддинг
+
+Модели загружаются один раз в каждом процессе пула (initializer), работа
+выполняется в ProcessPoolExecutor, запросы собираются в батчи: выровненные
+лица всех изображений батча проходят через SFace одним forward.
+
+Целевая латентность на одно изображение (1 поток x86-64, до 640px, 1-3 лица):
+- детекция YuNet: ~5-10 мс
+- эмбеддинг SFace: ~5-10 мс на лицо (в батче дешевле)
+- итого p50 <= 40 мс, p95 <= 120 мс с учётом очереди и передачи в процесс
+
+Сравнение: косинусное расстояние 1 - cos(a, b) между нормированными
+эмбеддингами, совпадение при расстоянии <= config.FACE_TOLERANCE
+(порог SFace из OpenCV Zoo: cos >= 0.363, т.е. расстояние <= 0.637).
+"""
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+import config
+
+try:
+    import cv2
+except ImportError:  # opencv не установлен - пайплайн отключается
+    cv2 = None
+
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_SIZE = 128
+
+# Состояние процесса-воркера (заполняется в _init_worker)
+_detector = None
+_recognizer = None
+_recognizer_net = None
+_batch_forward = True
+_max_side = 640
+
+
+def _init_worker(detector_model: str, recognizer_model: str, min_score: float, max_side: int):
+    """Загрузка моделей один раз на процесс пула"""
+    global _detector, _recognizer, _recognizer_net, _max_side
+    cv2.setNumThreads(1)  # параллелизм даёт пул процессов
+    _detector = cv2.FaceDetectorYN.create(detector_model, "", (320, 320), min_score, 0.3, 50)
+    _recognizer = cv2.FaceRecognizerSF.create(recognizer_model, "")
+    _recognizer_net = cv2.dnn.readNetFromONNX(recognizer_model)
+    _max_side = max_side
+
+
+def _load_image(item: Union[str, bytes]):
+    if isinstance(item, (bytes, bytearray)):
+        return cv2.imdecode(np.frombuffer(item, dtype=np.uint8), cv2.IMREAD_COLOR)
+    return cv2.imread(item, cv2.IMREAD_COLOR)
+
+
+def _detect(image) -> Tuple[np.ndarray, np.ndarray, float]:
+    """Детекция на уменьшенной копии, возвращает лица и масштаб"""
+    height, width = image.shape[:2]
+    scale = min(1.0, _max_side / max(height, width))
+    if scale < 1.0:
+        image = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    _detector.setInputSize((image.shape[1], image.shape[0]))
+    _, faces = _detector.detect(image)
+    return image, (faces if faces is not None else np.empty((0, 15), dtype=np.float32)), scale
+
+
+def _embed(crops: List[np.ndarray]) -> np.ndarray:
+    """Эмбеддинги выровненных лиц 112x112 одним батчем"""
+    global _batch_forward
+    if not crops:
+        return np.empty((0, EMBEDDING_SIZE), dtype=np.float32)
+
+    features = None
+    if _batch_forward and len(crops) > 1:
+        try:
+            # Та же предобработка, что в FaceRecognizerSF.feature
+            blob = cv2.dnn.blobFromImages(crops, 1.0, (112, 112), (0, 0, 0), True, False)
+            _recognizer_net.setInput(blob)
+            features = _recognizer_net.forward().reshape(len(crops), -1)
+        except cv2.error:
+            # Модель экспортирована с фиксированным batch=1
+            _batch_forward = False
+    if features is None:
+        features = np.vstack([_recognizer.feature(crop).reshape(1, -1) for crop in crops])
+
+    features = features.astype(np.float32)
+    norms = np.linalg.norm(features, axis=1, keepdims=True)
+    return features / np.maximum(norms, 1e-12)
+
+
+def _analyze_batch(items: List[Union[str, bytes]]) -> List[List[Dict]]:
+    """
+    Обработка батча изображений в процессе-воркере
+
+    Args:
+        items: пути к файлам или байты изображений
+
+    Returns:
+        Для каждого изображения список лиц (bbox, score, landmarks, embedding)
+    """
+    per_image: List[List[Dict]] = []
+    crops: List[np.ndarray] = []
+    owners: List[Dict] = []
+
+    for item in items:
+        faces_out: List[Dict] = []
+        per_image.append(faces_out)
+        image = _load_image(item)
+        if image is None:
+            continue
+
+        small, faces, scale = _detect(image)
+        for face in faces:
+            crops.append(_recognizer.alignCrop(small, face))
+            record = {
+                "bbox": [round(float(v) / scale, 1) for v in face[:4]],
+                "landmarks": [
+                    [round(float(face[4 + 2 * i]) / scale, 1), round(float(face[5 + 2 * i]) / scale, 1)]
+                    for i in range(5)
+                ],
+                "score": round(float(face[14]), 4)
+            }
+            faces_out.append(record)
+            owners.append(record)
+
+    for record, embedding in zip(owners, _embed(crops)):
+        record["embedding"] = embedding
+
+    return per_image
+
+
+def distance(a: np.ndarray, b: np.ndarray) -> float:
+    """Косинусное расстояние между нормированными эмбеддингами"""
+    return float(1.0 - np.dot(a, b))
+
+
+def is_match(a: np.ndarray, b: np.ndarray, tolerance: Optional[float] = None) -> bool:
+    """Совпадение лиц с учётом config.FACE_TOLERANCE"""
+    tolerance = config.FACE_TOLERANCE if tolerance is None else tolerance
+    return distance(a, b) <= tolerance
+
+
+class FaceEngine:
+    """
+    Асинхронный фасад над пулом процессов с микробатчингом
+
+    Вызовы analyze() в пределах batch_wait секунд (или до batch_size штук)
+    объединяются в один вызов воркера.
+    """
+
+    def __init__(
+        self,
+        detector_model: Path,
+        recognizer_model: Path,
+        workers: int,
+        batch_size: int = 8,
+        batch_wait: float = 0.01,
+        min_score: float = 0.8,
+        max_side: int = 640
+    ):
+        self.detector_model = Path(detector_model)
+        self.recognizer_model = Path(recognizer_model)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.min_score = min_score
+        self.max_side = max_side
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending: List[Tuple[Union[str, bytes], asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    def available(self) -> bool:
+        """Установлен ли OpenCV и есть ли файлы моделей"""
+        return (
+            cv2 is not None
+            and self.detector_model.exists()
+            and self.recognizer_model.exists()
+        )
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                # spawn: fork процесса с event loop и потоками небезопасен
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(str(self.detector_model), str(self.recognizer_model), self.min_score, self.max_side)
+            )
+        return self._pool
+
+    async def analyze(self, image: Union[str, bytes]) -> List[Dict]:
+        """
+        Поиск лиц и эмбеддингов на изображении
+
+        Args:
+            image: путь к файлу или байты изображения
+
+        Returns:
+            List лиц: bbox [x, y, w, h], landmarks, score, embedding (np.float32[128]).
+            Пустой список, если лиц нет или пайплайн недоступен.
+        """
+        if not self.available():
+            return []
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((image, future))
+
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        loop = asyncio.get_running_loop()
+        try:
+            job = loop.run_in_executor(self._get_pool(), _analyze_batch, [item for item, _ in batch])
+        except RuntimeError as e:
+            # Пул сломан (BrokenProcessPool) или закрыт - пересоздаётся при следующем вызове
+            self._reset_pool(e)
+            self._fail(batch, e)
+            return
+
+        def deliver(done: asyncio.Future):
+            # Задача пула отменена (shutdown с cancel_futures) - ждущие не должны висеть
+            error = RuntimeError("face pipeline job cancelled") if done.cancelled() else done.exception()
+            if error is not None:
+                logger.warning("Ошибка face pipeline: %s", str(error) or type(error).__name__)
+                if isinstance(error, BrokenProcessPool):
+                    self._reset_pool(error)
+                self._fail(batch, error)
+                return
+            results = done.result()
+            for index, (_, future) in enumerate(batch):
+                if not future.done():
+                    future.set_result(results[index])
+
+        job.add_done_callback(deliver)
+
+    @staticmethod
+    def _fail(batch: List[Tuple[Union[str, bytes], asyncio.Future]], error: BaseException):
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def _reset_pool(self, error: BaseException):
+        """Сломанный пул (упавший воркер, OOM killer) - закрыть, следующий вызов создаст новый"""
+        if self._pool is not None:
+            logger.error("Пул face pipeline сломан, пересоздаётся: %s", error)
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+face_engine = FaceEngine(
+    detector_model=config.FACE_DETECTOR_MODEL,
+    recognizer_model=config.FACE_RECOGNIZER_MODEL,
+    workers=config.FACE_WORKERS,
+    batch_size=config.FACE_BATCH_SIZE,
+    batch_wait=config.FACE_BATCH_WAIT_MS / 1000,
+    min_score=config.FACE_MIN_SCORE,
+    max_side=config.FACE_DETECT_MAX_SIDE
+)
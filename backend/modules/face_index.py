@@ -0,0 +1,340 @@
+"""
+Хранилище эмбеддингов лиц с приближённым поиском ближайших соседей
+
+Эмбеддинги (нормированные, 128 float) лежат в memory-mapped файле float16:
+строка файла = слот лица. Метаданные (источник, URL, платформа) и пометки
+удаления - в SQLite рядом. Поиск:
+- HNSW (hnswlib, если установлен) - миллисекунды на миллионах векторов
+- иначе NumPy brute force по memmap блоками (точный, линейный)
+
+Вставки инкрементальные, удаление - пометка (mark_deleted в HNSW и маска
+в brute force). Все методы синхронные и потокобезопасные - из async кода
+их вызывают через asyncio.to_thread.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import config
+
+try:
+    import hnswlib
+except ImportError:  # без hnswlib работает brute force
+    hnswlib = None
+
+
+logger = logging.getLogger(__name__)
+
+DIM = 128
+_ROW_BYTES = DIM * 2  # float16
+
+
+class FaceIndex:
+    """
+    Персистентный индекс эмбеддингов лиц
+
+    Args:
+        directory: каталог хранилища
+        backend: "auto" (hnsw если доступен), "hnsw" или "numpy"
+        m, ef_construction, ef_search: параметры HNSW
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        backend: str = "auto",
+        m: int = 16,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+        initial_capacity: int = 10000
+    ):
+        self.directory = Path(directory)
+        self.vectors_path = self.directory / "vectors.f16"
+        self.hnsw_path = self.directory / "hnsw.bin"
+        self.meta_path = self.directory / "faces.sqlite"
+        self.use_hnsw = hnswlib is not None and backend in ("auto", "hnsw")
+        if backend == "hnsw" and hnswlib is None:
+            logger.warning("hnswlib не установлен, face index работает в режиме brute force")
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.initial_capacity = initial_capacity
+
+        self._lock = threading.RLock()
+        self._opened = False
+        self._count = 0
+        self._capacity = 0
+        self._vectors: Optional[np.memmap] = None
+        self._alive: Optional[np.ndarray] = None
+        self._hnsw = None
+        self._dirty = False
+        self._db: Optional[sqlite3.Connection] = None
+
+    # ---------- открытие / хранение
+
+    def _open(self):
+        if self._opened:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self._db = sqlite3.connect(str(self.meta_path), check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS faces (
+                id INTEGER PRIMARY KEY,
+                source TEXT,
+                url TEXT,
+                metadata TEXT,
+                added_at REAL,
+                deleted INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_faces_url ON faces(url)")
+        self._db.commit()
+
+        row = self._db.execute("SELECT COALESCE(MAX(id) + 1, 0) FROM faces").fetchone()
+        self._count = row[0]
+        self._capacity = max(self.initial_capacity, self._count)
+        self._map_vectors(self._capacity)
+
+        self._alive = np.zeros(self._capacity, dtype=bool)
+        self._alive[:self._count] = True
+        for (face_id,) in self._db.execute("SELECT id FROM faces WHERE deleted = 1"):
+            self._alive[face_id] = False
+
+        if self.use_hnsw:
+            self._load_hnsw()
+        self._opened = True
+
+    def _map_vectors(self, capacity: int):
+        """(Пере)открытие memmap файла с нужной ёмкостью"""
+        if self._vectors is not None:
+            self._vectors.flush()
+            del self._vectors
+        size = capacity * _ROW_BYTES
+        if not self.vectors_path.exists() or self.vectors_path.stat().st_size < size:
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(size)
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float16, mode="r+", shape=(capacity, DIM))
+
+    def _load_hnsw(self):
+        self._hnsw = hnswlib.Index(space="ip", dim=DIM)
+        if self.hnsw_path.exists():
+            try:
+                self._hnsw.load_index(str(self.hnsw_path), max_elements=self._capacity, allow_replace_deleted=False)
+                if self._hnsw.get_current_count() == self._count:
+                    self._hnsw.set_ef(self.ef_search)
+                    return
+            except RuntimeError as e:
+                logger.warning("HNSW индекс повреждён, пересобираем: %s", e)
+            self._hnsw = hnswlib.Index(space="ip", dim=DIM)
+
+        # Пересборка из memmap (после сбоя или первого запуска)
+        self._hnsw.init_index(max_elements=self._capacity, M=self.m, ef_construction=self.ef_construction)
+        self._hnsw.set_ef(self.ef_search)
+        if self._count:
+            ids = np.arange(self._count)
+            self._hnsw.add_items(np.asarray(self._vectors[:self._count], dtype=np.float32), ids)
+            for face_id in np.flatnonzero(~self._alive[:self._count]):
+                self._hnsw.mark_deleted(int(face_id))
+        self._dirty = True
+
+    def _grow(self, needed: int):
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= 2
+        if capacity == self._capacity:
+            return
+        self._map_vectors(capacity)
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self._capacity] = self._alive
+        self._alive = alive
+        if self._hnsw is not None:
+            self._hnsw.resize_index(capacity)
+        self._capacity = capacity
+
+    def flush(self):
+        """Сброс memmap и HNSW на диск"""
+        with self._lock:
+            if not self._opened:
+                return
+            self._vectors.flush()
+            if self._hnsw is not None and self._dirty:
+                tmp_path = self.hnsw_path.with_suffix(".tmp")
+                self._hnsw.save_index(str(tmp_path))
+                os.replace(tmp_path, self.hnsw_path)
+                self._dirty = False
+
+    def close(self):
+        with self._lock:
+            if not self._opened:
+                return
+            self.flush()
+            self._db.close()
+            self._vectors = None
+            self._hnsw = None
+            self._opened = False
+
+    # ---------- операции
+
+    def add(self, embeddings: np.ndarray, metadata: List[Dict]) -> List[int]:
+        """
+        Добавление эмбеддингов
+
+        Args:
+            embeddings: массив (N, 128), нормированный
+            metadata: для каждого эмбеддинга dict (source, url и любые поля)
+
+        Returns:
+            List идентификаторов добавленных лиц
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(-1, DIM)
+        if len(embeddings) != len(metadata):
+            raise ValueError("embeddings и metadata должны быть одной длины")
+        if not len(embeddings):
+            return []
+
+        with self._lock:
+            self._open()
+            start = self._count
+            end = start + len(embeddings)
+            self._grow(end)
+
+            self._vectors[start:end] = embeddings.astype(np.float16)
+            self._alive[start:end] = True
+            now = time.time()
+            self._db.executemany(
+                "INSERT INTO faces (id, source, url, metadata, added_at) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (start + i, meta.get("source"), meta.get("url"), json.dumps(meta, ensure_ascii=False), now)
+                    for i, meta in enumerate(metadata)
+                ]
+            )
+            self._db.commit()
+            if self._hnsw is not None:
+                self._hnsw.add_items(embeddings, np.arange(start, end))
+                self._dirty = True
+            self._count = end
+            return list(range(start, end))
+
+    def remove(self, face_id: int) -> bool:
+        """Удаление лица по идентификатору"""
+        with self._lock:
+            self._open()
+            if face_id < 0 or face_id >= self._count or not self._alive[face_id]:
+                return False
+            self._alive[face_id] = False
+            self._db.execute("UPDATE faces SET deleted = 1 WHERE id = ?", (face_id,))
+            self._db.commit()
+            if self._hnsw is not None:
+                self._hnsw.mark_deleted(face_id)
+                self._dirty = True
+            return True
+
+    def remove_by_url(self, url: str) -> int:
+        """Удаление всех лиц, добавленных с указанного URL"""
+        with self._lock:
+            self._open()
+            ids = [row[0] for row in self._db.execute(
+                "SELECT id FROM faces WHERE url = ? AND deleted = 0", (url,)
+            )]
+            return sum(1 for face_id in ids if self.remove(face_id))
+
+    def contains_url(self, url: str) -> bool:
+        with self._lock:
+            self._open()
+            row = self._db.execute(
+                "SELECT 1 FROM faces WHERE url = ? AND deleted = 0 LIMIT 1", (url,)
+            ).fetchone()
+            return row is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._open()
+            return int(self._alive[:self._count].sum())
+
+    def search(self, embedding: np.ndarray, k: int = 10, tolerance: Optional[float] = None) -> List[Dict]:
+        """
+        Поиск ближайших лиц
+
+        Args:
+            embedding: нормированный эмбеддинг запроса (128,)
+            k: количество соседей
+            tolerance: максимальное косинусное расстояние (по умолчанию FACE_TOLERANCE)
+
+        Returns:
+            List совпадений (id, distance, similarity, metadata), по возрастанию distance
+        """
+        tolerance = config.FACE_TOLERANCE if tolerance is None else tolerance
+        query = np.asarray(embedding, dtype=np.float32).reshape(DIM)
+
+        with self._lock:
+            self._open()
+            alive = int(self._alive[:self._count].sum())
+            if not alive:
+                return []
+            k = min(k, alive)
+
+            if self._hnsw is not None:
+                self._hnsw.set_ef(max(self.ef_search, k))
+                labels, distances = self._hnsw.knn_query(query, k=k)
+                pairs = list(zip(labels[0].tolist(), distances[0].tolist()))
+            else:
+                pairs = self._brute_force(query, k)
+
+            pairs = [(int(face_id), float(dist)) for face_id, dist in pairs if dist <= tolerance]
+            if not pairs:
+                return []
+            placeholders = ",".join("?" * len(pairs))
+            meta = {
+                row[0]: json.loads(row[1])
+                for row in self._db.execute(
+                    f"SELECT id, metadata FROM faces WHERE id IN ({placeholders})",
+                    [face_id for face_id, _ in pairs]
+                )
+            }
+
+        return [
+            {
+                "id": face_id,
+                "distance": round(dist, 4),
+                "similarity": round(1.0 - dist, 4),
+                "metadata": meta.get(face_id, {})
+            }
+            for face_id, dist in pairs
+        ]
+
+    def _brute_force(self, query: np.ndarray, k: int, chunk: int = 262144) -> List:
+        """Точный поиск по memmap блоками (без загрузки всего файла в память)"""
+        best_ids = np.empty(0, dtype=np.int64)
+        best_dist = np.empty(0, dtype=np.float32)
+        query16 = query.astype(np.float16)
+
+        for start in range(0, self._count, chunk):
+            end = min(start + chunk, self._count)
+            scores = (self._vectors[start:end] @ query16).astype(np.float32)
+            scores[~self._alive[start:end]] = -np.inf
+            take = min(k, end - start)
+            top = np.argpartition(-scores, take - 1)[:take]
+            best_ids = np.concatenate([best_ids, top + start])
+            best_dist = np.concatenate([best_dist, 1.0 - scores[top]])
+
+        order = np.argsort(best_dist)[:k]
+        return [
+            (best_ids[i], best_dist[i]) for i in order if np.isfinite(best_dist[i])
+        ]
+
+
+face_index = FaceIndex(
+    directory=config.FACE_INDEX_DIR,
+    backend=config.FACE_INDEX_BACKEND,
+    m=config.FACE_INDEX_HNSW_M,
+    ef_construction=config.FACE_INDEX_HNSW_EF_CONSTRUCTION,
+    ef_search=config.FACE_INDEX_HNSW_EF_SEARCH
+)
@@ -0,0 +1,353 @@
+"""
+Приоритетное планирование и справедливая очередь между API клиентами
+
+Каждый запуск движка (engines.scheduler._run_engine) занимает слот
+планировщика. Слоты раздаются:
+- по классу приоритета: interactive (одиночные поиски) всегда раньше
+  bulk (пакеты, варианты username); bulk не может занять больше
+  SCHEDULER_BULK_SLOTS, поэтому у interactive всегда есть свободные слоты
+- внутри класса - взвешенная справедливая очередь (WFQ) по API ключу:
+  у каждого клиента своё виртуальное время, растущее на cost / вес,
+  и слот получает ожидающий с наименьшим временем завершения
+
+Контроль допуска (AdmissionMiddleware) работает на входе запроса: при
+переполненной очереди класса или слишком большом числе запросов клиента
+в работе сразу возвращается 429 с Retry-After.
+
+Клиент определяется по заголовку X-API-Key (иначе - по IP), класс - по
+пути запроса; заголовок X-Priority: bulk позволяет клиенту понизить
+свой приоритет (но не повысить).
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import json
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+import config
+from modules import metrics
+
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BULK = "bulk"
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BULK)  # порядок = старшинство
+
+DEFAULT_CLIENT = "internal"
+
+# (клиент, приоритет) текущего запроса; без контекста - внутренний interactive
+current_client: contextvars.ContextVar[Tuple[str, str]] = contextvars.ContextVar(
+    "fair_queue_client", default=(DEFAULT_CLIENT, PRIORITY_INTERACTIVE)
+)
+
+QUEUE_DEPTH = metrics.REGISTRY.register(metrics.Gauge(
+    "osint_scheduler_queue_depth",
+    "Engine runs waiting for a scheduler slot",
+    ("priority",)
+))
+SLOTS_IN_USE = metrics.REGISTRY.register(metrics.Gauge(
+    "osint_scheduler_slots_in_use",
+    "Scheduler slots held by running engines",
+    ("priority",)
+))
+REJECTED = metrics.REGISTRY.register(metrics.Counter(
+    "osint_scheduler_rejected_total",
+    "Requests rejected by admission control (429)",
+    ("priority",)
+))
+QUEUE_WAIT = metrics.REGISTRY.register(metrics.Histogram(
+    "osint_scheduler_wait_seconds",
+    "Time engine runs spent waiting for a scheduler slot",
+    ("priority",)
+))
+
+
+class Overloaded(Exception):
+    """Очередь переполнена - запрос нужно повторить через retry_after секунд"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """"key1:4,key2:2" -> {"key1": 4.0, "key2": 2.0}"""
+    weights = {}
+    for item in spec.split(","):
+        key, _, weight = item.strip().partition(":")
+        if key and weight:
+            try:
+                weights[key] = max(0.01, float(weight))
+            except ValueError:
+                continue
+    return weights
+
+
+class FairScheduler:
+    """
+    Слоты выполнения движков с приоритетами и WFQ по клиентам
+
+    Args:
+        slots: одновременных запусков движков всего
+        bulk_slots: из них максимум для bulk
+        max_queue: предел очереди по классу (дальше - 429)
+        max_client_requests: запросов одного клиента в работе по классу
+        weights: веса API ключей (по умолчанию 1)
+    """
+
+    def __init__(
+        self,
+        slots: int,
+        bulk_slots: int,
+        max_queue: Dict[str, int],
+        max_client_requests: Dict[str, int],
+        weights: Optional[Dict[str, float]] = None
+    ):
+        self.slots = slots
+        self.bulk_slots = min(bulk_slots, slots)
+        self.max_queue = max_queue
+        self.max_client_requests = max_client_requests
+        self.weights = weights or {}
+
+        self._in_use = {priority: 0 for priority in PRIORITIES}
+        self._queues: Dict[str, List] = {priority: [] for priority in PRIORITIES}
+        self._waiting = {priority: 0 for priority in PRIORITIES}
+        self._vtime = {priority: 0.0 for priority in PRIORITIES}
+        self._finish: Dict[Tuple[str, str], float] = {}
+        self._requests: Dict[Tuple[str, str], int] = {}
+        self._service_time = {priority: 1.0 for priority in PRIORITIES}  # EWMA, секунды
+        self._seq = itertools.count()
+
+    # ---------- допуск запросов
+
+    def retry_after(self, priority: str) -> int:
+        """Оценка времени до освобождения очереди класса"""
+        capacity = self.bulk_slots if priority == PRIORITY_BULK else self.slots
+        backlog = self._waiting[priority] + self._in_use[priority]
+        return max(1, min(60, math.ceil(backlog * self._service_time[priority] / max(1, capacity))))
+
+    def admit(self, client: str, priority: str):
+        """
+        Регистрация запроса клиента
+
+        Raises:
+            Overloaded: очередь класса переполнена или у клиента слишком много запросов
+        """
+        key = (client, priority)
+        if self._waiting[priority] >= self.max_queue[priority]:
+            REJECTED.inc(priority)
+            raise Overloaded(f"Очередь {priority} переполнена", self.retry_after(priority))
+        if self._requests.get(key, 0) >= self.max_client_requests[priority]:
+            REJECTED.inc(priority)
+            raise Overloaded(
+                f"Слишком много одновременных запросов ({priority}) от клиента", self.retry_after(priority)
+            )
+        self._requests[key] = self._requests.get(key, 0) + 1
+
+    def finish_request(self, client: str, priority: str):
+        key = (client, priority)
+        remaining = self._requests.get(key, 0) - 1
+        if remaining > 0:
+            self._requests[key] = remaining
+        else:
+            self._requests.pop(key, None)
+
+    # ---------- слоты движков
+
+    def _can_run(self, priority: str) -> bool:
+        if sum(self._in_use.values()) >= self.slots:
+            return False
+        return priority != PRIORITY_BULK or self._in_use[PRIORITY_BULK] < self.bulk_slots
+
+    def _grant(self, priority: str):
+        self._in_use[priority] += 1
+        SLOTS_IN_USE.set(priority, value=self._in_use[priority])
+
+    def _dispatch(self):
+        """Раздача освободившихся слотов ожидающим (старший класс первым)"""
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            while queue and self._can_run(priority):
+                finish, _, start, future = heapq.heappop(queue)
+                if future.done():  # отменён, пока ждал
+                    continue
+                self._waiting[priority] -= 1
+                self._vtime[priority] = start
+                self._grant(priority)
+                future.set_result(None)
+            QUEUE_DEPTH.set(priority, value=self._waiting[priority])
+
+        # Не даём словарю времён завершения расти бесконечно
+        if len(self._finish) > 10000:
+            self._finish = {
+                key: finish for key, finish in self._finish.items()
+                if finish > self._vtime[key[1]]
+            }
+
+    async def acquire(self, cost: float = 1.0, timeout: Optional[float] = None) -> Tuple[str, float]:
+        """
+        Слот для запуска движка (клиент и класс - из current_client)
+
+        Args:
+            cost: стоимость запуска (движки дороже сдвигают клиента дальше в очереди)
+            timeout: максимум ожидания слота
+
+        Returns:
+            Токен слота для release()
+
+        Raises:
+            asyncio.TimeoutError: слот не освободился за timeout
+        """
+        client, priority = current_client.get()
+        waited_from = time.perf_counter()
+
+        queued = any(self._queues[p] for p in PRIORITIES[:PRIORITIES.index(priority) + 1])
+        if not queued and self._can_run(priority):
+            self._grant(priority)
+        else:
+            key = (client, priority)
+            start = max(self._vtime[priority], self._finish.get(key, 0.0))
+            finish = start + cost / self.weights.get(client, 1.0)
+            self._finish[key] = finish
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._queues[priority], (finish, next(self._seq), start, future))
+            self._waiting[priority] += 1
+            QUEUE_DEPTH.set(priority, value=self._waiting[priority])
+            try:
+                await asyncio.wait_for(future, timeout)
+            except (asyncio.CancelledError, asyncio.TimeoutError):
+                if future.done() and not future.cancelled():
+                    # Слот уже выдан - возвращаем
+                    self._release(priority)
+                else:
+                    future.cancel()
+                    self._waiting[priority] -= 1
+                    QUEUE_DEPTH.set(priority, value=self._waiting[priority])
+                raise
+
+        started = time.perf_counter()
+        QUEUE_WAIT.observe(priority, value=started - waited_from)
+        return priority, started
+
+    def release(self, token: Tuple[str, float]):
+        """Освобождение слота, полученного через acquire()"""
+        priority, started = token
+        elapsed = time.perf_counter() - started
+        self._service_time[priority] = 0.8 * self._service_time[priority] + 0.2 * elapsed
+        self._release(priority)
+
+    def _release(self, priority: str):
+        self._in_use[priority] -= 1
+        SLOTS_IN_USE.set(priority, value=self._in_use[priority])
+        self._dispatch()
+
+    def stats(self) -> Dict:
+        return {
+            priority: {
+                "in_use": self._in_use[priority],
+                "waiting": self._waiting[priority],
+                "avg_service_ms": round(self._service_time[priority] * 1000, 1)
+            }
+            for priority in PRIORITIES
+        }
+
+
+# Планировщик по event loop (как сессии в http_client)
+_schedulers: Dict[int, FairScheduler] = {}
+
+
+def get_scheduler() -> FairScheduler:
+    loop_id = id(asyncio.get_running_loop())
+    scheduler = _schedulers.get(loop_id)
+    if scheduler is None:
+        scheduler = _schedulers[loop_id] = FairScheduler(
+            slots=config.SCHEDULER_SLOTS,
+            bulk_slots=config.SCHEDULER_BULK_SLOTS,
+            max_queue={
+                PRIORITY_INTERACTIVE: config.SCHEDULER_MAX_QUEUE_INTERACTIVE,
+                PRIORITY_BULK: config.SCHEDULER_MAX_QUEUE_BULK,
+            },
+            max_client_requests={
+                PRIORITY_INTERACTIVE: config.SCHEDULER_MAX_CLIENT_REQUESTS_INTERACTIVE,
+                PRIORITY_BULK: config.SCHEDULER_MAX_CLIENT_REQUESTS_BULK,
+            },
+            weights=parse_weights(config.API_CLIENT_WEIGHTS)
+        )
+    return scheduler
+
+
+# ---------- ASGI middleware
+
+# Пути поиска и их класс (остальные - без контроля допуска)
+BULK_PATHS = ("/api/osint/batch/", "/api/osint/username/variants", "/api/export/")
+SCHEDULED_PATHS = ("/api/osint/", "/api/search/", "/api/export/")
+UNSCHEDULED_PATHS = ("/api/osint/graph", "/api/osint/face/")
+
+
+def _headers(scope: Dict) -> Dict[str, str]:
+    return {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in scope.get("headers", [])}
+
+
+def client_id(scope: Dict, api_key: Optional[str] = None) -> str:
+    """
+    Клиент запроса: API ключ (X-API-Key или api_key) или IP
+
+    Args:
+        scope: ASGI scope (http или websocket)
+        api_key: ключ не из заголовка (браузерный WebSocket не может задать заголовки)
+    """
+    api_key = _headers(scope).get("x-api-key") or api_key
+    if api_key:
+        return f"key:{api_key}"
+    return f"ip:{(scope.get('client') or ('unknown', 0))[0]}"
+
+
+def classify_request(scope: Dict) -> Optional[Tuple[str, str]]:
+    """(клиент, приоритет) для HTTP запроса или None, если путь не планируется"""
+    path = scope.get("path", "")
+    if not path.startswith(SCHEDULED_PATHS) or path.startswith(UNSCHEDULED_PATHS):
+        return None
+
+    bulk = path.startswith(BULK_PATHS) or _headers(scope).get("x-priority", "").lower() == PRIORITY_BULK
+    return client_id(scope), PRIORITY_BULK if bulk else PRIORITY_INTERACTIVE
+
+
+class AdmissionMiddleware:
+    """Контроль допуска и контекст клиента для планировщика движков"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        classified = classify_request(scope)
+        if classified is None:
+            return await self.app(scope, receive, send)
+
+        client, priority = classified
+        scheduler = get_scheduler()
+        try:
+            scheduler.admit(client, priority)
+        except Overloaded as e:
+            body = json.dumps({"detail": str(e), "retry_after": e.retry_after}, ensure_ascii=False).encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"retry-after", str(e.retry_after).encode()),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        token = current_client.set((client, priority))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_client.reset(token)
+            scheduler.finish_request(client, priority)
@@ -0,0 +1,221 @@
+"""
+Общий HTTP слой для OSINT модулей
+Одна aiohttp сессия на event loop + общий rate limiter + пул прокси
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+from urllib.parse import urlsplit
+import aiohttp
+from asyncio_throttle import Throttler
+
+import config
+from modules.proxy_pool import get_proxy_pool
+
+
+# Общий rate limiter для всех исходящих запросов к сайтам
+rate_limiter = Throttler(rate_limit=config.HTTP_RATE_LIMIT, period=1.0)
+
+# Сессии храним по event loop (uvicorn --reload и тесты создают новые loop)
+_sessions: Dict[int, aiohttp.ClientSession] = {}
+
+
+def upstream_url(url: str) -> str:
+    """
+    Адрес для исходящего запроса с учётом config.UPSTREAM_OVERRIDE
+
+    Если override задан (бенчмарки), https://github.com/user превращается
+    в {override}/github.com/user, и mock-сервер отвечает вместо сайта.
+
+    Args:
+        url: исходный адрес
+
+    Returns:
+        Адрес, по которому реально нужно идти
+    """
+    if not config.UPSTREAM_OVERRIDE:
+        return url
+    parts = urlsplit(url)
+    rewritten = f"{config.UPSTREAM_OVERRIDE}/{parts.netloc}{parts.path or '/'}"
+    if parts.query:
+        rewritten += f"?{parts.query}"
+    return rewritten
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """
+    Возвращает общую aiohttp сессию для текущего event loop
+
+    Сессия переиспользует TCP/TLS соединения между запросами,
+    поэтому её нельзя закрывать в вызывающем коде.
+
+    Returns:
+        aiohttp.ClientSession
+    """
+    loop_id = id(asyncio.get_running_loop())
+    session = _sessions.get(loop_id)
+
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=config.HTTP_MAX_CONNECTIONS,
+            limit_per_host=config.HTTP_MAX_CONNECTIONS_PER_HOST,
+            ttl_dns_cache=300
+        )
+        session = aiohttp.ClientSession(connector=connector)
+        _sessions[loop_id] = session
+
+    return session
+
+
+async def close_sessions():
+    """Закрытие всех общих сессий (вызывается при остановке приложения)"""
+    for loop_id, session in list(_sessions.items()):
+        if not session.closed:
+            await session.close()
+        _sessions.pop(loop_id, None)
+
+
+@asynccontextmanager
+async def request(
+    method: str,
+    url: str,
+    timeout: float = 10,
+    session: Optional[aiohttp.ClientSession] = None,
+    **kwargs
+) -> AsyncIterator[aiohttp.ClientResponse]:
+    """
+    Запрос к сайту через пул прокси (без rate limiter)
+
+    Прокси выбирается по домену исходного url, статус ответа уходит
+    в его статистику. Модули ходят к сайтам через эту функцию.
+
+        async with request("GET", url) as response:
+            ...
+
+    Args:
+        method: HTTP метод
+        url: адрес запроса
+        timeout: таймаут в секундах
+        session: сессия (по умолчанию общая)
+
+    Raises:
+        proxy_pool.ProxyUnavailable: нет свободного прокси (ClientConnectionError)
+    """
+    if session is None:
+        session = await get_session()
+
+    async with get_proxy_pool().lease(url) as lease:
+        async with session.request(
+            method,
+            upstream_url(url),
+            timeout=aiohttp.ClientTimeout(total=timeout),
+            proxy=lease.url,
+            **kwargs
+        ) as response:
+            lease.observe(response.status)
+            yield response
+
+
+async def throttled_request(
+    method: str,
+    url: str,
+    timeout: float = 10,
+    session: Optional[aiohttp.ClientSession] = None,
+    **kwargs
+) -> aiohttp.ClientResponse:
+    """
+    Запрос через общий rate limiter
+
+    Ответ уже прочитан (`await response.read()`), поэтому его можно
+    использовать вне контекстного менеджера.
+
+    Args:
+        method: HTTP метод
+        url: адрес запроса
+        timeout: таймаут в секундах
+        session: сессия (по умолчанию общая)
+
+    Returns:
+        aiohttp.ClientResponse с прочитанным телом
+    """
+    async with rate_limiter:
+        async with request(method, url, timeout, session, **kwargs) as response:
+            await response.read()
+            return response
+
+
+async def fetch_limited(
+    url: str,
+    max_bytes: int,
+    timeout: float = 10,
+    session: Optional[aiohttp.ClientSession] = None,
+    throttle: bool = True,
+    **kwargs
+) -> Optional[bytes]:
+    """
+    GET с потоковым чтением и ограничением размера тела
+
+    Тело читается кусками и не накапливается сверх max_bytes, поэтому
+    огромный или бесконечный ответ не занимает память.
+
+    Args:
+        url: адрес
+        max_bytes: максимальный размер тела
+        timeout: таймаут в секундах
+        session: сессия (по умолчанию общая)
+        throttle: учитывать общий rate limiter (CDN изображений можно без него -
+            параллелизм ограничивает вызывающий код)
+
+    Returns:
+        Байты тела или None (не 200 или ответ больше max_bytes)
+    """
+    if session is None:
+        session = await get_session()
+
+    if throttle:
+        async with rate_limiter:
+            return await _read_limited(session, url, max_bytes, timeout, **kwargs)
+    return await _read_limited(session, url, max_bytes, timeout, **kwargs)
+
+
+async def _read_limited(
+    session: aiohttp.ClientSession,
+    url: str,
+    max_bytes: int,
+    timeout: float,
+    **kwargs
+) -> Optional[bytes]:
+    async with request("GET", url, timeout, session, **kwargs) as response:
+        if response.status != 200:
+            return None
+        if response.content_length is not None and response.content_length > max_bytes:
+            return None
+
+        chunks = []
+        received = 0
+        async for chunk in response.content.iter_chunked(65536):
+            received += len(chunk)
+            if received > max_bytes:
+                return None
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+
+def conditional_headers(etag: Optional[str] = None, last_modified: Optional[str] = None) -> Dict[str, str]:
+    """Заголовки условного запроса по валидаторам прошлого ответа"""
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    return headers
+
+
+def response_validators(response: aiohttp.ClientResponse) -> Dict[str, str]:
+    """ETag / Last-Modified ответа (только присутствующие)"""
+    validators = {}
+    if response.headers.get("ETag"):
+        validators["etag"] = response.headers["ETag"]
+    if response.headers.get("Last-Modified"):
+        validators["last_modified"] = response.headers["Last-Modified"]
+    return validators
@@ -0,0 +1,362 @@
+"""
+Граф идентичностей: сущности и связи, найденные движками
+
+Результаты поиска сохраняются в SQLite, чтобы повторные расследования
+превращались в локальные запросы вместо нового сканирования сети.
+
+Сущности (kind, value): username, email, domain, url (профиль или
+страница), image (pHash). Связь хранится на каждый движок, который её
+нашёл (engine), с уверенностью и временем первого/последнего наблюдения.
+
+Обход графа - рекурсивный CTE по таблице смежности links (обе стороны
+каждой связи, PRIMARY KEY (a, b)), поэтому каждый шаг - поиск по индексу.
+Домены - узлы-хабы (gmail.com связан со всеми адресами на нём), поэтому
+через них обход не продолжается: они попадают в ответ, но не расширяют его.
+
+Методы синхронные и потокобезопасные - из async кода их вызывают через
+asyncio.to_thread (как face_index).
+"""
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import config
+from modules.domain_index import platform_index
+from modules.urls import normalize_url, url_host
+
+
+logger = logging.getLogger(__name__)
+
+KIND_USERNAME = "username"
+KIND_EMAIL = "email"
+KIND_DOMAIN = "domain"
+KIND_URL = "url"
+KIND_IMAGE = "image"
+KINDS = (KIND_USERNAME, KIND_EMAIL, KIND_DOMAIN, KIND_URL, KIND_IMAGE)
+
+# Узлы, через которые продолжается обход (домены - хабы)
+TRAVERSABLE_KINDS = (KIND_USERNAME, KIND_EMAIL, KIND_URL, KIND_IMAGE)
+
+Entity = Tuple[str, str]
+# (откуда, куда, связь, движок, уверенность)
+Edge = Tuple[Entity, Entity, str, str, float]
+
+
+def normalize_entity(kind: str, value: str) -> Optional[Entity]:
+    """Каноническое значение сущности (None, если пустое или неизвестный тип)"""
+    if kind not in KINDS or not value:
+        return None
+    value = value.strip()
+    if kind == KIND_URL:
+        value = normalize_url(value)
+    elif kind != KIND_IMAGE:
+        value = value.lower()
+    return (kind, value) if value else None
+
+
+class IdentityGraph:
+    """
+    Персистентный граф идентичностей
+
+    Args:
+        path: файл SQLite
+        max_hops: максимальная глубина обхода
+    """
+
+    def __init__(self, path: Path, max_hops: int = 3):
+        self.path = Path(path)
+        self.max_hops = max_hops
+        self._lock = threading.RLock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    def _open(self):
+        if self._db is not None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(str(self.path), check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript("""
+            CREATE TABLE IF NOT EXISTS entities (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                UNIQUE (kind, value)
+            );
+            CREATE TABLE IF NOT EXISTS edges (
+                src INTEGER NOT NULL,
+                dst INTEGER NOT NULL,
+                relation TEXT NOT NULL,
+                engine TEXT NOT NULL,
+                confidence REAL,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                seen_count INTEGER NOT NULL DEFAULT 1,
+                PRIMARY KEY (src, dst, relation, engine)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS links (
+                a INTEGER NOT NULL,
+                b INTEGER NOT NULL,
+                PRIMARY KEY (a, b)
+            ) WITHOUT ROWID;
+        """)
+        db.commit()
+        self._db = db
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # ---------- запись
+
+    def _entity_ids(self, entities: Iterable[Entity], now: float) -> Dict[Entity, int]:
+        db = self._db
+        entities = list(entities)
+        db.executemany(
+            "INSERT OR IGNORE INTO entities (kind, value, first_seen, last_seen) VALUES (?, ?, ?, ?)",
+            [(kind, value, now, now) for kind, value in entities]
+        )
+        db.executemany(
+            "UPDATE entities SET last_seen = ? WHERE kind = ? AND value = ?",
+            [(now, kind, value) for kind, value in entities]
+        )
+        return {
+            entity: db.execute(
+                "SELECT id FROM entities WHERE kind = ? AND value = ?", entity
+            ).fetchone()[0]
+            for entity in entities
+        }
+
+    def record(self, edges: Iterable[Edge]) -> int:
+        """
+        Сохранение связей (одна транзакция на вызов)
+
+        Args:
+            edges: (откуда, куда, связь, движок, уверенность), сущности - (kind, value)
+
+        Returns:
+            Количество сохранённых связей
+        """
+        normalized = []
+        for src, dst, relation, engine, confidence in edges:
+            src, dst = normalize_entity(*src), normalize_entity(*dst)
+            if src and dst and src != dst:
+                normalized.append((src, dst, relation, engine, confidence))
+        if not normalized:
+            return 0
+
+        now = time.time()
+        with self._lock:
+            self._open()
+            with self._db:
+                ids = self._entity_ids(
+                    dict.fromkeys(entity for edge in normalized for entity in edge[:2]), now
+                )
+                rows = [
+                    (ids[src], ids[dst], relation, engine, confidence, now, now)
+                    for src, dst, relation, engine, confidence in normalized
+                ]
+                self._db.executemany("""
+                    INSERT INTO edges (src, dst, relation, engine, confidence, first_seen, last_seen)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (src, dst, relation, engine) DO UPDATE SET
+                        confidence = MAX(COALESCE(confidence, 0), COALESCE(excluded.confidence, 0)),
+                        last_seen = excluded.last_seen,
+                        seen_count = seen_count + 1
+                """, rows)
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO links (a, b) VALUES (?, ?)",
+                    [(row[0], row[1]) for row in rows] + [(row[1], row[0]) for row in rows]
+                )
+        return len(normalized)
+
+    # ---------- запросы
+
+    def neighborhood(
+        self,
+        kind: str,
+        value: str,
+        hops: int = 2,
+        kinds: Optional[Iterable[str]] = None,
+        limit: int = 500
+    ) -> Optional[Dict]:
+        """
+        Сущности в пределах hops связей от заданной
+
+        Args:
+            kind, value: начальная сущность
+            hops: глубина обхода (не больше max_hops)
+            kinds: вернуть только сущности этих типов (по умолчанию все)
+            limit: максимум сущностей в ответе
+
+        Returns:
+            Dict (root, entities с глубиной, edges между ними) или None,
+            если сущность не встречалась
+        """
+        root = normalize_entity(kind, value)
+        if root is None:
+            return None
+        hops = max(0, min(hops, self.max_hops))
+        traversable = ",".join("?" * len(TRAVERSABLE_KINDS))
+
+        with self._lock:
+            self._open()
+            row = self._db.execute(
+                "SELECT id, first_seen, last_seen FROM entities WHERE kind = ? AND value = ?", root
+            ).fetchone()
+            if row is None:
+                return None
+            root_id = row[0]
+
+            found = self._db.execute(f"""
+                WITH RECURSIVE walk (id, depth) AS (
+                    SELECT ?, 0
+                    UNION
+                    SELECT l.b, w.depth + 1
+                    FROM walk w
+                    JOIN entities e ON e.id = w.id
+                    JOIN links l ON l.a = w.id
+                    WHERE w.depth < ? AND (w.depth = 0 OR e.kind IN ({traversable}))
+                    LIMIT ?
+                )
+                SELECT e.id, e.kind, e.value, MIN(w.depth), e.first_seen, e.last_seen
+                FROM walk w JOIN entities e ON e.id = w.id
+                GROUP BY e.id
+                ORDER BY MIN(w.depth), e.kind, e.value
+            """, (root_id, hops, *TRAVERSABLE_KINDS, limit * 20)).fetchall()
+
+            wanted = set(kinds) if kinds else None
+            entities = {
+                entity_id: {"kind": e_kind, "value": e_value, "depth": depth,
+                            "first_seen": first_seen, "last_seen": last_seen}
+                for entity_id, e_kind, e_value, depth, first_seen, last_seen in found
+                if entity_id == root_id or wanted is None or e_kind in wanted
+            }
+            if len(entities) > limit:
+                entities = dict(list(entities.items())[:limit])
+
+            edges = self._edges_between(list(entities))
+
+        return {
+            "root": {"kind": root[0], "value": root[1]},
+            "hops": hops,
+            "entities": [
+                entity for entity_id, entity in entities.items() if entity_id != root_id
+            ],
+            "edges": [
+                {
+                    "source": {"kind": entities[src]["kind"], "value": entities[src]["value"]},
+                    "target": {"kind": entities[dst]["kind"], "value": entities[dst]["value"]},
+                    "relation": relation,
+                    "engines": engine_list.split(","),
+                    "confidence": confidence,
+                    "last_seen": last_seen
+                }
+                for src, dst, relation, engine_list, confidence, last_seen in edges
+            ]
+        }
+
+    def _edges_between(self, ids: List[int]) -> List[tuple]:
+        if not ids:
+            return []
+        placeholders = ",".join("?" * len(ids))
+        return self._db.execute(f"""
+            SELECT src, dst, relation, GROUP_CONCAT(engine), MAX(confidence), MAX(last_seen)
+            FROM edges
+            WHERE src IN ({placeholders}) AND dst IN ({placeholders})
+            GROUP BY src, dst, relation
+        """, (*ids, *ids)).fetchall()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._open()
+            by_kind = dict(self._db.execute("SELECT kind, COUNT(*) FROM entities GROUP BY kind"))
+            edges = self._db.execute("SELECT COUNT(*) FROM edges").fetchone()[0]
+        return {"entities": by_kind, "edges": edges}
+
+
+# ---------- связи из ответов поиска
+
+def username_edges(username: str, response: Dict) -> List[Edge]:
+    """Связи из результата check_username_full: аккаунты, домены, аватары"""
+    edges: List[Edge] = []
+    for result in response.get("results", []):
+        url = result.get("url")
+        if not url or result.get("status") != "found":
+            continue
+        confidence = result.get("confidence", 0.5)
+        for engine in result.get("engines") or ["username"]:
+            edges.append(((KIND_USERNAME, username), (KIND_URL, url), "account", engine, confidence))
+        host = url_host(url)
+        if host:
+            edges.append(((KIND_URL, url), (KIND_DOMAIN, host), "hosted_on", "url", 1.0))
+        avatar = result.get("avatar") or {}
+        if avatar.get("phash"):
+            edges.append(((KIND_URL, url), (KIND_IMAGE, avatar["phash"]), "avatar", "avatars", 1.0))
+    return edges
+
+
+def email_edges(email: str, response: Dict) -> List[Edge]:
+    """Связи из результата check_email_comprehensive: домен, регистрации, утечки"""
+    edges: List[Edge] = []
+    local_part, _, domain = email.partition("@")
+    edges.append(((KIND_EMAIL, email), (KIND_DOMAIN, domain), "email_domain", "email_metadata", 1.0))
+    # Локальная часть часто совпадает с username на платформах
+    edges.append(((KIND_EMAIL, email), (KIND_USERNAME, local_part), "local_part", "email_metadata", 0.5))
+
+    registrations = response.get("registrations", {})
+    engine = "holehe" if registrations.get("method") == "holehe_real" else "registration"
+    index = platform_index()
+    for site in registrations.get("sites", []):
+        name = site.get("site") or ""
+        site_domain = name if "." in name else index.domain_for(name)
+        if site_domain:
+            edges.append((
+                (KIND_EMAIL, email), (KIND_DOMAIN, site_domain), "registered", engine,
+                site.get("confidence", 0.8)
+            ))
+
+    for breach in response.get("breaches", {}).get("breaches", []):
+        if breach.get("domain"):
+            edges.append(((KIND_EMAIL, email), (KIND_DOMAIN, breach["domain"]), "breached", "hibp", 1.0))
+    return edges
+
+
+def image_edges(image_phash: str, response: Dict) -> List[Edge]:
+    """Связи из результата search_by_photo_advanced: страницы с изображением"""
+    edges: List[Edge] = []
+    for result in response.get("all_results", []):
+        url = result.get("url")
+        if not url:
+            continue
+        similarity = result.get("similarity", 0.5)
+        for engine in result.get("engines") or ["image"]:
+            edges.append(((KIND_IMAGE, image_phash), (KIND_URL, url), "appears_on", engine, similarity))
+        host = url_host(url)
+        if host:
+            edges.append(((KIND_URL, url), (KIND_DOMAIN, host), "hosted_on", "url", 1.0))
+    return edges
+
+
+async def record_async(edges: List[Edge]):
+    """Сохранение связей из async кода (ошибки хранилища не ломают поиск)"""
+    if not config.IDENTITY_GRAPH_ENABLED or not edges:
+        return
+    try:
+        await asyncio.to_thread(identity_graph.record, edges)
+    except sqlite3.Error as e:
+        logger.warning("Не удалось сохранить связи в граф идентичностей: %s", e)
+
+
+identity_graph = IdentityGraph(
+    path=config.IDENTITY_GRAPH_PATH,
+    max_hops=config.IDENTITY_GRAPH_MAX_HOPS
+)
@@ -0,0 +1,123 @@
+"""
+Перцептивные хэши изображений (pHash)
+
+pHash: изображение в оттенках серого 32x32 -> DCT -> левый верхний блок
+8x8 без DC компоненты -> биты "больше медианы". Похожие картинки
+(пересжатие, ресайз, смена формата) дают хэши с малым расстоянием Хэмминга.
+
+DCT считается умножением на заранее построенную матрицу (NumPy, без SciPy).
+Декодирование и хэширование выполняются в пуле потоков: Pillow и NumPy
+отпускают GIL в тяжёлых операциях, а картинки маленькие - передача в
+отдельный процесс стоила бы дороже самой работы.
+"""
+import asyncio
+import io
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+
+import config
+
+try:
+    from PIL import Image
+except ImportError:  # без Pillow хэши не считаются
+    Image = None
+
+
+HASH_SIZE = 8
+_SAMPLE_SIZE = 32
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """Матрица DCT-II (ортонормированная)"""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix.astype(np.float32)
+
+
+_DCT = _dct_matrix(_SAMPLE_SIZE)
+_BIT_WEIGHTS = (1 << np.arange(HASH_SIZE * HASH_SIZE - 1, -1, -1, dtype=np.uint64)).astype(np.uint64)
+
+_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=config.IMAGE_HASH_WORKERS, thread_name_prefix="image-hash")
+    return _pool
+
+
+def phash(data: bytes) -> Optional[int]:
+    """
+    pHash изображения
+
+    Args:
+        data: байты изображения
+
+    Returns:
+        64-битный хэш или None, если изображение не декодируется
+    """
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.draft("L", (_SAMPLE_SIZE * 4, _SAMPLE_SIZE * 4))  # быстрое JPEG декодирование в уменьшенном виде
+            pixels = np.asarray(
+                image.convert("L").resize((_SAMPLE_SIZE, _SAMPLE_SIZE), Image.LANCZOS),
+                dtype=np.float32
+            )
+    except Exception:
+        return None
+
+    coefficients = (_DCT @ pixels @ _DCT.T)[:HASH_SIZE, :HASH_SIZE].ravel()
+    median = np.median(coefficients[1:])
+    bits = (coefficients > median).astype(np.uint64)
+    return int((bits * _BIT_WEIGHTS).sum())
+
+
+async def phash_async(data: bytes) -> Optional[int]:
+    """pHash в пуле потоков (не блокирует event loop)"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_pool(), phash, data)
+
+
+def to_hex(value: int) -> str:
+    return f"{value:016x}"
+
+
+def hamming(a: int, b: int) -> int:
+    """Расстояние Хэмминга между двумя хэшами"""
+    return (a ^ b).bit_count()
+
+
+def hamming_matrix(hashes: List[int]) -> np.ndarray:
+    """
+    Попарные расстояния Хэмминга (векторизовано)
+
+    Args:
+        hashes: список 64-битных хэшей
+
+    Returns:
+        Матрица (N, N) расстояний
+    """
+    values = np.array(hashes, dtype=np.uint64)
+    xor = values[:, None] ^ values[None, :]
+    # Подсчёт бит по байтам: uint64 -> 8 x uint8 -> unpackbits
+    return np.unpackbits(xor.view(np.uint8).reshape(len(values), len(values), 8), axis=-1).sum(axis=-1)
+
+
+def hamming_to_many(query: int, hashes: List[int]) -> np.ndarray:
+    """Расстояния Хэмминга от одного хэша до списка хэшей"""
+    values = np.array(hashes, dtype=np.uint64) ^ np.uint64(query)
+    return np.unpackbits(values.view(np.uint8).reshape(len(values), 8), axis=-1).sum(axis=-1)
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,194 @@
+"""
+Сторож event loop: измерение задержки и поиск блокирующих вызовов
+
+Корутина-heartbeat на event loop отмечает время каждые interval секунд.
+Отдельный поток проверяет heartbeat и, если loop не отвечает дольше
+порога, снимает стек потока event loop - это и есть блокирующий вызов
+(subprocess.run, синхронный cloudscraper, dns.resolver, парсинг HTML...).
+
+Дополнительно есть сэмплирующий профайлер: поток N секунд снимает стек
+event loop и агрегирует их в collapsed stacks (формат flamegraph.pl).
+"""
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque, Counter
+from typing import Dict, List, Optional
+
+import config
+from modules import metrics
+
+
+# Кадры из этих файлов не интересны как "виновник" блокировки
+_IGNORED_FRAMES = ("asyncio/", "concurrent/futures/", "threading.py", "selectors.py")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_filename}:{code.co_name}:{frame.f_lineno}"
+
+
+def _culprit(stack: List[traceback.FrameSummary]) -> str:
+    """Самый глубокий кадр приложения (не asyncio/stdlib loop)"""
+    for frame in reversed(stack):
+        if not any(part in frame.filename for part in _IGNORED_FRAMES):
+            return f"{frame.filename}:{frame.lineno} in {frame.name}"
+    last = stack[-1] if stack else None
+    return f"{last.filename}:{last.lineno} in {last.name}" if last else "unknown"
+
+
+class LoopWatchdog:
+    """
+    Сторож одного event loop
+
+    Args:
+        threshold: порог блокировки в секундах
+        interval: период heartbeat в секундах
+        history: сколько последних блокировок хранить
+    """
+
+    def __init__(self, threshold: float = 0.1, interval: float = 0.05, history: int = 100):
+        self.threshold = threshold
+        self.interval = interval
+        self.offenders = deque(maxlen=history)
+        self.culprit_counts: Counter = Counter()
+        self.max_lag = 0.0
+        self._last_beat = time.perf_counter()
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._current_stall: Optional[Dict] = None
+        self._profiling = threading.Lock()
+
+    # ---------- запуск/остановка
+
+    def start(self):
+        """Запуск heartbeat на текущем loop и потока-сторожа"""
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._stop.clear()
+        self._heartbeat_task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+        if self._thread:
+            self._thread.join(timeout=1)
+
+    # ---------- heartbeat (в event loop)
+
+    async def _heartbeat(self):
+        while True:
+            start = time.perf_counter()
+            self._last_beat = start
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - start - self.interval)
+            self.max_lag = max(self.max_lag, lag)
+            metrics.LOOP_LAG.set(value=lag)
+            metrics.LOOP_LAG_HISTOGRAM.observe(value=lag)
+
+    # ---------- сторож (в отдельном потоке)
+
+    def _loop_stack(self) -> List[traceback.FrameSummary]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        return traceback.extract_stack(frame) if frame is not None else []
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            stalled_for = time.perf_counter() - self._last_beat - self.interval
+
+            if stalled_for >= self.threshold:
+                if self._current_stall is None:
+                    stack = self._loop_stack()
+                    culprit = _culprit(stack)
+                    self._current_stall = {
+                        "detected_at": time.time(),
+                        "culprit": culprit,
+                        "stack": traceback.format_list(stack),
+                        "blocked_ms": round(stalled_for * 1000, 1)
+                    }
+                    self.culprit_counts[culprit] += 1
+                    self.offenders.append(self._current_stall)
+                else:
+                    self._current_stall["blocked_ms"] = round(stalled_for * 1000, 1)
+            elif self._current_stall is not None:
+                # Loop снова отвечает - блокировка закончилась
+                self._current_stall = None
+
+    # ---------- отчёты
+
+    def report(self, limit: int = 20) -> Dict:
+        """Состояние loop и последние блокирующие вызовы"""
+        return {
+            "threshold_ms": round(self.threshold * 1000, 1),
+            "current_lag_ms": round(metrics.LOOP_LAG.get() * 1000, 2),
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "stalls_total": sum(self.culprit_counts.values()),
+            "top_culprits": [
+                {"culprit": culprit, "count": count}
+                for culprit, count in self.culprit_counts.most_common(limit)
+            ],
+            "recent_stalls": list(self.offenders)[-limit:][::-1]
+        }
+
+    def profile(self, seconds: float, sample_interval: float = 0.005, top: int = 30) -> Dict:
+        """
+        Сэмплирующий профайлер потока event loop (блокирующий вызов - запускать в потоке)
+
+        Args:
+            seconds: длительность профилирования
+            sample_interval: период снятия стека
+            top: сколько самых частых стеков вернуть
+
+        Returns:
+            Dict с количеством сэмплов, топом функций по собственному времени
+            и collapsed stacks
+        """
+        if not self._profiling.acquire(blocking=False):
+            return {"error": "Профилирование уже запущено"}
+
+        try:
+            stacks: Counter = Counter()
+            functions: Counter = Counter()
+            samples = 0
+            deadline = time.perf_counter() + seconds
+
+            while time.perf_counter() < deadline:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    labels = []
+                    while frame is not None:
+                        labels.append(_frame_label(frame))
+                        frame = frame.f_back
+                    labels.reverse()
+                    stacks[";".join(labels)] += 1
+                    # Собственное время: функция на вершине стека
+                    functions[labels[-1]] += 1
+                    samples += 1
+                time.sleep(sample_interval)
+
+            return {
+                "seconds": seconds,
+                "samples": samples,
+                "top_functions": [
+                    {"function": label, "samples": count, "ratio": round(count / samples, 3)}
+                    for label, count in functions.most_common(top)
+                ] if samples else [],
+                "collapsed_stacks": [
+                    f"{stack} {count}" for stack, count in stacks.most_common(top)
+                ]
+            }
+        finally:
+            self._profiling.release()
+
+
+watchdog = LoopWatchdog(
+    threshold=config.LOOP_WATCHDOG_THRESHOLD_MS / 1000,
+    interval=config.LOOP_WATCHDOG_INTERVAL_MS / 1000
+)
@@ -0,0 +1,292 @@
+"""
+Метрики в формате Prometheus (text exposition format 0.0.4)
+
+Лёгкая реализация без внешних зависимостей: значения хранятся в словарях
+по кортежу значений меток, поэтому запись метрики в горячем пути проверки
+сайтов стоит один lookup и одно сложение.
+"""
+import asyncio
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+
+# Границы бакетов для латентности внешних сервисов (секунды)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# Границы бакетов для задержки event loop (секунды)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+
+def _escape(value: str) -> str:
+    """Экранирование значения метки"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    """Форматирование меток в виде {name="value",...}"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """Базовый класс метрики"""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, object] = {}
+
+    def clear(self):
+        self._values.clear()
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}"
+        ]
+        lines.extend(self._render_samples())
+        return lines
+
+    def _render_samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in list(self._values.items())
+        ]
+
+
+class Counter(Metric):
+    """Монотонно растущий счётчик"""
+
+    type_name = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def get(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+
+class Gauge(Metric):
+    """Значение, которое может расти и уменьшаться"""
+
+    type_name = "gauge"
+
+    def set(self, *labels, value: float):
+        self._values[labels] = value
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def get(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+
+class Histogram(Metric):
+    """Гистограмма с фиксированными бакетами"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, *labels, value: float):
+        state = self._values.get(labels)
+        if state is None:
+            # [счётчики по бакетам (+Inf последний), сумма, количество]
+            state = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            self._values[labels] = state
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    def snapshot(self, *labels) -> Optional[Dict]:
+        """Сумма и количество наблюдений для набора меток"""
+        state = self._values.get(labels)
+        if state is None:
+            return None
+        return {"sum": state[1], "count": state[2]}
+
+    def _render_samples(self) -> List[str]:
+        lines = []
+        for labels, (counts, total, count) in list(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+                )
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_str} {count}")
+        return lines
+
+
+class Registry:
+    """Реестр всех метрик приложения"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ============================================
+# Метрики приложения
+# ============================================
+
+ENGINE_LATENCY = REGISTRY.register(Histogram(
+    "osint_engine_duration_seconds",
+    "Latency of upstream OSINT engines (HIBP, holehe, maigret, reverse image engines)",
+    ("engine",)
+))
+ENGINE_OUTCOMES = REGISTRY.register(Counter(
+    "osint_engine_outcomes_total",
+    "Outcomes of upstream OSINT engine calls",
+    ("engine", "outcome")
+))
+PROBE_LATENCY = REGISTRY.register(Histogram(
+    "osint_probe_duration_seconds",
+    "Latency of per-site probes",
+    ("engine", "site")
+))
+PROBE_OUTCOMES = REGISTRY.register(Counter(
+    "osint_probe_outcomes_total",
+    "Outcomes of per-site probes (found/not_found/uncertain/timeout/error)",
+    ("engine", "site", "outcome")
+))
+IN_FLIGHT = REGISTRY.register(Gauge(
+    "osint_in_flight_requests",
+    "Upstream requests currently in flight",
+    ("engine",)
+))
+# Кэши: single_flight_* (присоединение к идущему вызову), response_etag
+# (304 клиентам), watch_* (304 upstream при перепроверке), calibration
+# (отпечатки сайта), face_index_url (лица адреса уже в индексе)
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "osint_cache_requests_total",
+    "Cache lookups by cache name and result (hit/miss)",
+    ("cache", "result")
+))
+CACHE_HIT_RATIO = REGISTRY.register(Gauge(
+    "osint_cache_hit_ratio",
+    "Cache hit ratio since process start",
+    ("cache",)
+))
+# Заполняются сторожем event loop (modules.loop_watchdog)
+LOOP_LAG = REGISTRY.register(Gauge(
+    "osint_event_loop_lag_seconds",
+    "Most recent event loop scheduling lag"
+))
+LOOP_LAG_HISTOGRAM = REGISTRY.register(Histogram(
+    "osint_event_loop_lag_histogram_seconds",
+    "Distribution of event loop scheduling lag",
+    buckets=LOOP_LAG_BUCKETS
+))
+
+
+def _outcome_for_exception(exc_type) -> str:
+    if exc_type is not None and issubclass(exc_type, asyncio.TimeoutError):
+        return "timeout"
+    return "error"
+
+
+class _Tracker:
+    """
+    Контекстный менеджер замера вызова
+
+    Время, in-flight и исход записываются при выходе. Исход по умолчанию
+    'error'; вызывающий код выставляет tracker.outcome при успехе.
+    """
+
+    __slots__ = ("engine", "site", "outcome", "_start")
+
+    def __init__(self, engine: str, site: Optional[str]):
+        self.engine = engine
+        self.site = site
+        self.outcome = "error"
+        self._start = 0.0
+
+    def __enter__(self):
+        IN_FLIGHT.inc(self.engine)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._start
+        IN_FLIGHT.dec(self.engine)
+        if exc_type is not None:
+            self.outcome = _outcome_for_exception(exc_type)
+        if self.site is None:
+            ENGINE_LATENCY.observe(self.engine, value=elapsed)
+            ENGINE_OUTCOMES.inc(self.engine, self.outcome)
+        else:
+            PROBE_LATENCY.observe(self.engine, self.site, value=elapsed)
+            PROBE_OUTCOMES.inc(self.engine, self.site, self.outcome)
+        return False
+
+
+def track_engine(engine: str) -> _Tracker:
+    """
+    Замер вызова внешнего движка (HIBP, holehe, maigret, Yandex...)
+
+    Пример:
+        with track_engine("hibp") as tracker:
+            ...
+            tracker.outcome = "found"
+    """
+    return _Tracker(engine, None)
+
+
+def track_probe(engine: str, site: str) -> _Tracker:
+    """Замер проверки одного сайта в рамках движка"""
+    return _Tracker(engine, site)
+
+
+def record_cache(cache: str, hit: bool):
+    """Учёт обращения к кэшу и пересчёт hit ratio"""
+    CACHE_REQUESTS.inc(cache, "hit" if hit else "miss")
+    hits = CACHE_REQUESTS.get(cache, "hit")
+    total = hits + CACHE_REQUESTS.get(cache, "miss")
+    CACHE_HIT_RATIO.set(cache, value=hits / total)
+
+
+def render() -> str:
+    """Все метрики в текстовом формате Prometheus"""
+    return REGISTRY.render()
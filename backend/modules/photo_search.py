@@ -1,251 +1,43 @@
 """
 Модуль для глубокого поиска по фотографии
 Yandex Images Reverse Search + Google Images + TinEye
+
+Поиск выполняют движки modules.engines (yandex_images, google_images,
+tineye); здесь - переранжирование, социальные профили и сводка.
 """
 import asyncio
-import base64
 import hashlib
-from typing import List, Dict, Optional
+import logging
+from typing import List, Dict
 from pathlib import Path
-import aiohttp
-from bs4 import BeautifulSoup
-from urllib.parse import urlencode, quote
-import cloudscraper
-from fake_useragent import UserAgent
-
-
-class PhotoSearcher:
-    """Класс для reverse image search через Yandex, Google и TinEye"""
-
-    def __init__(self):
-        self.ua = UserAgent()
-        # CloudScraper для обхода Cloudflare
-        self.scraper = cloudscraper.create_scraper(
-            browser={
-                'browser': 'chrome',
-                'platform': 'windows',
-                'mobile': False
-            }
-        )
-
-    async def search_yandex_images(self, image_path: str) -> List[Dict]:
-        """
-        Reverse image search через Yandex Images
-
-        Yandex лучше всего работает с российскими лицами и VK профилями
-
-        Args:
-            image_path: путь к изображению
-
-        Returns:
-            List найденных результатов
-        """
-        results = []
-
-        try:
-            # Шаг 1: Загрузка изображения на Yandex
-            upload_url = "https://yandex.ru/images/touch/search"
-
-            with open(image_path, 'rb') as f:
-                image_data = f.read()
-
-            # Формируем multipart данные
-            files = {
-                'upfile': ('image.jpg', image_data, 'image/jpeg')
-            }
-
-            headers = {
-                'User-Agent': self.ua.random,
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
-                'Referer': 'https://yandex.ru/images/'
-            }
-
-            # Загружаем изображение
-            response = self.scraper.post(
-                upload_url,
-                files=files,
-                headers=headers,
-                timeout=30
-            )
-
-            if response.status_code == 200:
-                # Парсим результаты
-                soup = BeautifulSoup(response.text, 'html.parser')
-
-                # Ищем похожие изображения
-                similar_images = soup.find_all('div', class_='cbir-similar__thumb')
-
-                for idx, img_div in enumerate(similar_images[:15]):  # Первые 15
-                    img_tag = img_div.find('img')
-                    link_tag = img_div.find_parent('a')
-
-                    if img_tag and link_tag:
-                        result = {
-                            "source": "Yandex Images",
-                            "thumbnail": img_tag.get('src'),
-                            "url": link_tag.get('href'),
-                            "similarity": 0.8 - (idx * 0.02),  # Примерная оценка
-                            "index": idx
-                        }
-                        results.append(result)
-
-                # Ищем страницы где встречается изображение
-                pages = soup.find_all('div', class_='cbir-sites__thumb')
-
-                for page in pages[:10]:
-                    link = page.find('a')
-                    if link:
-                        domain = self._extract_domain(link.get('href', ''))
-                        results.append({
-                            "source": "Yandex Images - Sites",
-                            "url": link.get('href'),
-                            "domain": domain,
-                            "type": "webpage",
-                            "similarity": 0.7
-                        })
-
-        except Exception as e:
-            print(f"Ошибка Yandex search: {e}")
-
-        return results
-
-    async def search_google_images(self, image_path: str) -> List[Dict]:
-        """
-        Reverse image search через Google Images
-
-        Args:
-            image_path: путь к изображению
-
-        Returns:
-            List найденных результатов
-        """
-        results = []
-
-        try:
-            # Google Images Search by URL
-            # Используем метод через Google Lens API
-            upload_url = "https://lens.google.com/v3/upload"
-
-            with open(image_path, 'rb') as f:
-                image_data = f.read()
-
-            # Кодируем в base64
-            encoded_image = base64.b64encode(image_data).decode('utf-8')
-
-            headers = {
-                'User-Agent': self.ua.random,
-                'Content-Type': 'application/x-www-form-urlencoded',
-            }
-
-            # Альтернативный метод - через обычный search
-            search_url = "https://www.google.com/searchbyimage/upload"
 
-            files = {
-                'encoded_image': ('image.jpg', image_data, 'image/jpeg')
-            }
+import config
+from modules.engines import fan_out, engine_report, CAPABILITY_IMAGE
+from modules.domain_index import classify_profiles
+from modules.engines.images import extract_domain
+from modules import image_hash
+from modules.face_engine import face_engine
+from modules.identity_graph import record_async, image_edges
+from modules.rerank import reranker
+from modules.single_flight import lookups
+from modules.temp_storage import temp_storage
 
-            response = self.scraper.post(
-                search_url,
-                files=files,
-                headers=headers,
-                timeout=30
-            )
 
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
+logger = logging.getLogger(__name__)
 
-                # Парсим результаты
-                search_results = soup.find_all('div', class_='g')
 
-                for idx, result in enumerate(search_results[:10]):
-                    link_tag = result.find('a')
-                    title_tag = result.find('h3')
-
-                    if link_tag and title_tag:
-                        results.append({
-                            "source": "Google Images",
-                            "url": link_tag.get('href'),
-                            "title": title_tag.get_text(strip=True),
-                            "similarity": 0.75 - (idx * 0.03),
-                            "index": idx
-                        })
-
-        except Exception as e:
-            print(f"Ошибка Google search: {e}")
-
-        return results
-
-    async def search_tineye(self, image_path: str) -> List[Dict]:
-        """
-        Reverse image search через TinEye
-
-        Args:
-            image_path: путь к изображению
-
-        Returns:
-            List найденных результатов
-        """
-        results = []
-
-        try:
-            upload_url = "https://tineye.com/search"
-
-            with open(image_path, 'rb') as f:
-                image_data = f.read()
-
-            files = {
-                'image': ('image.jpg', image_data, 'image/jpeg')
-            }
-
-            headers = {
-                'User-Agent': self.ua.random,
-            }
-
-            response = self.scraper.post(
-                upload_url,
-                files=files,
-                headers=headers,
-                timeout=30
-            )
-
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-
-                matches = soup.find_all('div', class_='match')
-
-                for idx, match in enumerate(matches[:10]):
-                    link = match.find('a', class_='image-link')
-                    domain_tag = match.find('p', class_='domain')
-
-                    if link:
-                        results.append({
-                            "source": "TinEye",
-                            "url": link.get('href'),
-                            "domain": domain_tag.get_text(strip=True) if domain_tag else "Unknown",
-                            "similarity": 0.85,
-                            "index": idx
-                        })
-
-        except Exception as e:
-            print(f"Ошибка TinEye search: {e}")
-
-        return results
+class PhotoSearcher:
+    """Разбор результатов reverse image search"""
 
     def _extract_domain(self, url: str) -> str:
         """Извлечение домена из URL"""
-        from urllib.parse import urlparse
-        try:
-            parsed = urlparse(url)
-            return parsed.netloc
-        except:
-            return "unknown"
+        return extract_domain(url)
 
     async def extract_social_profiles(self, results: List[Dict]) -> List[Dict]:
         """
         Извлечение социальных профилей из результатов
 
-        Ищет ссылки на VK, Instagram, Facebook и т.д.
+        Домены классифицируются по индексу платформ (modules.domain_index).
 
         Args:
             results: результаты поиска
@@ -253,87 +45,109 @@ class PhotoSearcher:
         Returns:
             List социальных профилей
         """
-        social_networks = {
-            'vk.com': 'VKontakte',
-            'instagram.com': 'Instagram',
-            'facebook.com': 'Facebook',
-            'twitter.com': 'Twitter',
-            'linkedin.com': 'LinkedIn',
-            'ok.ru': 'Odnoklassniki',
-            'youtube.com': 'YouTube'
-        }
-
-        profiles = []
-
-        for result in results:
-            url = result.get('url', '')
-            domain = result.get('domain', self._extract_domain(url))
+        return classify_profiles(results)
 
-            for social_domain, network_name in social_networks.items():
-                if social_domain in domain:
-                    profiles.append({
-                        "network": network_name,
-                        "url": url,
-                        "domain": domain,
-                        "similarity": result.get('similarity', 0.5),
-                        "source": result.get('source')
-                    })
-                    break
 
-        return profiles
+def _content_digest(image_path: str) -> str:
+    return hashlib.blake2b(Path(image_path).read_bytes(), digest_size=16).hexdigest()
 
 
-async def search_by_photo_advanced(image_path: str) -> Dict:
+async def search_by_photo_advanced(image_path: str, rerank: bool = config.RERANK_ENABLED) -> Dict:
     """
     Полный поиск по фотографии через все сервисы
 
+    Одновременные поиски по одному и тому же изображению (по хешу
+    содержимого, а не имени файла) выполняются один раз (single_flight).
+
     Args:
         image_path: путь к изображению
+        rerank: переранжировать результаты по сходству миниатюр с фото
 
     Returns:
         Dict с результатами от всех сервисов
     """
-    searcher = PhotoSearcher()
+    digest = await asyncio.to_thread(_content_digest, image_path)
+    response = await lookups.do(("photo", digest, rerank), lambda: _search_held(image_path, rerank))
+    response["image_path"] = image_path
+    return response
 
-    # Параллельный поиск
-    yandex_task = searcher.search_yandex_images(image_path)
-    google_task = searcher.search_google_images(image_path)
-    tineye_task = searcher.search_tineye(image_path)
 
-    yandex_results, google_results, tineye_results = await asyncio.gather(
-        yandex_task,
-        google_task,
-        tineye_task,
+async def _search_held(image_path: str, rerank: bool) -> Dict:
+    """
+    Поиск со своей ссылкой на файл хранилища загрузок
+
+    Общий поиск переживает запрос, загрузивший файл первым (его отмену
+    или завершение раньше остальных ждущих).
+    """
+    try:
+        temp_storage.acquire(image_path)
+    except KeyError:
+        # Файл не из хранилища загрузок - им владеет вызывающий
+        return await _search(image_path, rerank)
+    try:
+        return await _search(image_path, rerank)
+    finally:
+        await asyncio.to_thread(temp_storage.release, image_path)
+
+
+async def _search(image_path: str, rerank: bool) -> Dict:
+    searcher = PhotoSearcher()
+
+    # Параллельный поиск всеми движками и детекция лиц
+    search, faces = await asyncio.gather(
+        fan_out(CAPABILITY_IMAGE, image_path, deadline=config.IMAGE_SEARCH_TIMEOUT),
+        face_engine.analyze(image_path),
         return_exceptions=True
     )
+    if isinstance(search, BaseException):
+        raise search
+    if not isinstance(faces, list):
+        faces = []
 
-    # Обработка результатов
-    all_results = []
+    engines = search["engines"]
+    all_results = search["results"]
 
-    if isinstance(yandex_results, list):
-        all_results.extend(yandex_results)
-    if isinstance(google_results, list):
-        all_results.extend(google_results)
-    if isinstance(tineye_results, list):
-        all_results.extend(tineye_results)
+    image_data = None
+    if all_results and (rerank or config.IDENTITY_GRAPH_ENABLED):
+        image_data = await asyncio.to_thread(Path(image_path).read_bytes)
+
+    # Реальная оценка сходства вместо позиции в выдаче
+    if rerank and image_data:
+        try:
+            all_results = await reranker.rerank(image_data, all_results, faces)
+        except Exception as e:
+            logger.warning("Ошибка переранжирования результатов: %s", e)
 
     # Извлечение социальных профилей
     social_profiles = await searcher.extract_social_profiles(all_results)
 
-    return {
+    phash = await image_hash.phash_async(image_data) if image_data else None
+
+    response = {
         "success": True,
         "image_path": image_path,
+        "image_phash": image_hash.to_hex(phash) if phash is not None else None,
         "total_results": len(all_results),
         "results": {
-            "yandex": yandex_results if isinstance(yandex_results, list) else [],
-            "google": google_results if isinstance(google_results, list) else [],
-            "tineye": tineye_results if isinstance(tineye_results, list) else [],
+            "yandex": engines.get("yandex_images", {}).get("results", []),
+            "google": engines.get("google_images", {}).get("results", []),
+            "tineye": engines.get("tineye", {}).get("results", []),
         },
         "all_results": all_results,
         "social_profiles": social_profiles,
+        "faces": [
+            {"bbox": face["bbox"], "score": face["score"]}
+            for face in faces
+        ],
         "summary": {
             "total_found": len(all_results),
+            "faces_detected": len(faces),
             "social_profiles_found": len(social_profiles),
-            "unique_domains": len(set([r.get('domain', '') for r in all_results if r.get('domain')]))
-        }
+            "unique_domains": len({r['domain'] for r in all_results if r.get('domain')}),
+            "reranked": sum(1 for r in all_results if r.get("similarity_source") in ("phash", "face"))
+        },
+        "engines": engine_report(engines)
     }
+    if phash is not None:
+        await record_async(image_edges(response["image_phash"], response))
+    return response
@@ -0,0 +1,45 @@
+"""
+Запуск внешних CLI (holehe, maigret) без блокировки event loop
+"""
+import asyncio
+import subprocess
+from typing import List
+
+
+async def run_command(cmd: List[str], timeout: float) -> subprocess.CompletedProcess:
+    """
+    Асинхронный аналог subprocess.run(cmd, capture_output=True, text=True, timeout=...)
+
+    Args:
+        cmd: команда и аргументы
+        timeout: таймаут в секундах
+
+    Returns:
+        subprocess.CompletedProcess с декодированными stdout/stderr
+
+    Raises:
+        FileNotFoundError: если программа не установлена
+        subprocess.TimeoutExpired: если процесс не уложился в таймаут (процесс убивается)
+    """
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    except asyncio.CancelledError:
+        # Запрос отменён (дедлайн планировщика) - процесс не должен остаться висеть
+        process.kill()
+        raise
+
+    return subprocess.CompletedProcess(
+        cmd,
+        process.returncode,
+        stdout.decode("utf-8", errors="replace"),
+        stderr.decode("utf-8", errors="replace")
+    )
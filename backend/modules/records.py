@@ -0,0 +1,121 @@
+"""
+Компактные записи результатов поиска
+
+Найденный профиль хранится в dataclass со __slots__ вместо dict: нет
+словаря атрибутов и повторяющихся ключей в каждой записи, названия
+площадок интернируются, теги - общий tuple из каталога сайтов.
+
+Для совместимости с кодом, работающим со словарями (merge_results,
+аватары, граф связей), записи поддерживают get/[]/in/setdefault;
+отсутствующее поле - это None. В JSON записи превращаются через
+to_dict() (поля со значением None опускаются, как и раньше).
+"""
+import sys
+from dataclasses import dataclass, fields
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class RecordMixin:
+    """Доступ к полям записи как к ключам словаря"""
+
+    __slots__ = ()
+    FIELDS: Tuple[str, ...] = ()
+    _FIELD_SET: frozenset = frozenset()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = getattr(self, key) if key in self._FIELD_SET else None
+        return default if value is None else value
+
+    def __getitem__(self, key: str) -> Any:
+        value = getattr(self, key) if key in self._FIELD_SET else None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any):
+        if key not in self._FIELD_SET:
+            raise KeyError(f"{type(self).__name__} не имеет поля {key}")
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._FIELD_SET and getattr(self, key) is not None
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        value = self.get(key)
+        if value is None:
+            self[key] = value = default
+        return value
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Поля со значениями (для JSON и старого формата)"""
+        result = {}
+        for name in self.FIELDS:
+            value = getattr(self, name)
+            if value is not None:
+                result[name] = value
+        return result
+
+
+@dataclass(slots=True, eq=False)
+class ProfileResult(RecordMixin):
+    """Профиль username на площадке (движки sites и maigret)"""
+
+    platform: str
+    url: str
+    status: str = "found"
+    confidence: float = 0.95
+    http_status: Optional[int] = None
+    latency_ms: Optional[float] = None  # время до ответа площадки
+    tags: Tuple[str, ...] = ()
+    full_name: Optional[str] = None
+    avatar_url: Optional[str] = None
+    bio: Optional[str] = None
+    username: Optional[str] = None      # проверенный вариант (probe_batch)
+    domain: Optional[str] = None        # хост канонического URL (merge_results)
+    engines: Optional[List[str]] = None
+    avatar: Optional[Dict] = None       # отпечаток аватара (avatars)
+
+    def __post_init__(self):
+        self.platform = sys.intern(self.platform)
+
+
+ProfileResult.FIELDS = tuple(field.name for field in fields(ProfileResult))
+ProfileResult._FIELD_SET = frozenset(ProfileResult.FIELDS)
+
+
+def summarize_profiles(results: List[ProfileResult]) -> Tuple[Dict[str, List[str]], Dict[str, int]]:
+    """
+    Категории и сводка по профилям за один проход
+
+    Args:
+        results: найденные профили
+
+    Returns:
+        (категория -> площадки, сводка: platforms_found, with_full_name,
+        with_avatar, with_bio, high_confidence)
+    """
+    categories: Dict[str, List[str]] = {}
+    with_full_name = with_avatar = with_bio = high_confidence = 0
+
+    for result in results:
+        for tag in result.tags:
+            bucket = categories.get(tag)
+            if bucket is None:
+                categories[tag] = bucket = []
+            bucket.append(result.platform)
+        if result.full_name:
+            with_full_name += 1
+        if result.avatar_url:
+            with_avatar += 1
+        if result.bio:
+            with_bio += 1
+        if result.confidence >= 0.8:
+            high_confidence += 1
+
+    return categories, {
+        "platforms_found": len(results),
+        "with_full_name": with_full_name,
+        "with_avatar": with_avatar,
+        "with_bio": with_bio,
+        "high_confidence": high_confidence
+    }
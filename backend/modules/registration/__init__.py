@@ -0,0 +1,145 @@
+"""
+Проверка регистраций email на сайтах (fallback для holehe)
+
+Каждый сайт - отдельный модуль со своим build_request/classify.
+Все сайты проверяются параллельно через общий HTTP клиент и rate limiter.
+"""
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+
+import config
+from modules import metrics, tracing
+from modules.circuit_breaker import breakers
+from modules.http_client import throttled_request
+from modules.proxy_pool import ProxyUnavailable
+from .base import RegistrationSite
+from .instagram import InstagramSite
+from .twitter import TwitterSite
+from .github import GitHubSite
+from .spotify import SpotifySite
+from .adobe import AdobeSite
+
+
+# Реестр сайтов для проверки
+SITES: List[RegistrationSite] = [
+    InstagramSite(),
+    TwitterSite(),
+    GitHubSite(),
+    SpotifySite(),
+    AdobeSite(),
+]
+
+
+async def check_site(
+    site: RegistrationSite,
+    email: str,
+    session: Optional[aiohttp.ClientSession] = None
+) -> Dict:
+    """
+    Проверка регистрации email на одном сайте
+
+    Args:
+        site: описание сайта
+        email: email для проверки
+        session: aiohttp сессия (по умолчанию общая)
+
+    Returns:
+        Dict с результатом и временем проверки
+    """
+    start = time.perf_counter()
+    outcome = {"site": site.name}
+
+    breaker = breakers.get(f"registration:{site.name}")
+    if not breaker.allow():
+        outcome["error"] = "circuit open"
+        outcome["elapsed_ms"] = 0.0
+        return outcome
+
+    try:
+        with metrics.track_probe("registration", site.name) as probe, \
+                tracing.start_span("registration.site", tracing.KIND_CLIENT, site=site.name) as span:
+            request = site.build_request(email)
+            response = await throttled_request(
+                request.pop("method"),
+                request.pop("url"),
+                timeout=config.REGISTRATION_CHECK_TIMEOUT,
+                session=session,
+                **request
+            )
+            body = await response.read()
+            span.set_attribute("http.status_code", response.status)
+            span.set_attribute("http.response.body.size", len(body))
+            outcome["http_status"] = response.status
+            outcome["match"] = site.classify(response.status, body)
+            probe.outcome = "found" if outcome["match"] else "not_found"
+    except ProxyUnavailable as e:
+        outcome["error"] = str(e)
+        outcome["proxy_unavailable"] = True
+    except asyncio.TimeoutError:
+        outcome["error"] = "timeout"
+    except Exception as e:
+        outcome["error"] = str(e) or type(e).__name__
+
+    elapsed = time.perf_counter() - start
+    status = outcome.get("http_status") or 0
+    if outcome.pop("proxy_unavailable", False):
+        # Сайт не виноват - выключатель не трогаем
+        breaker.release_trial()
+    elif "error" in outcome or status == 429 or status >= 500:
+        breaker.record_failure(elapsed, outcome.get("error") or f"HTTP {status}")
+    else:
+        breaker.record_success(elapsed)
+
+    outcome["elapsed_ms"] = round(elapsed * 1000, 1)
+    return outcome
+
+
+async def check_registrations(
+    email: str,
+    sites: Optional[List[RegistrationSite]] = None,
+    session: Optional[aiohttp.ClientSession] = None
+) -> Dict:
+    """
+    Параллельная проверка регистраций email на всех сайтах реестра
+
+    Args:
+        email: email для проверки
+        sites: список сайтов (по умолчанию весь реестр)
+        session: aiohttp сессия (по умолчанию общая)
+
+    Returns:
+        Dict в формате EmailChecker (sites, registrations_found) + тайминги
+    """
+    sites = SITES if sites is None else sites
+
+    outcomes = await asyncio.gather(*[
+        check_site(site, email, session) for site in sites
+    ])
+
+    results = []
+    for outcome in outcomes:
+        match = outcome.get("match")
+        if match:
+            results.append({
+                "site": outcome["site"],
+                "elapsed_ms": outcome["elapsed_ms"],
+                **match
+            })
+
+    return {
+        "email": email,
+        "registrations_found": len(results),
+        "sites": results,
+        "site_timings": {
+            outcome["site"]: {
+                "elapsed_ms": outcome["elapsed_ms"],
+                "http_status": outcome.get("http_status"),
+                "error": outcome.get("error")
+            }
+            for outcome in outcomes
+        },
+        "method": "fallback"
+    }
@@ -0,0 +1,12 @@
+"""
+Проверка регистрации email на Adobe
+"""
+from .base import RegistrationSite
+
+
+class AdobeSite(RegistrationSite):
+    """Adobe: форма регистрации отвечает 400 если email уже занят"""
+
+    name = "Adobe"
+    url = "https://accounts.adobe.com/api/v1/users/check"
+    method = "POST"
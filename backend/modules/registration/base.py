@@ -0,0 +1,60 @@
+"""
+Базовый класс проверки регистрации email на сайте
+"""
+from typing import Dict, Optional
+
+
+class RegistrationSite:
+    """
+    Описание одного сайта для проверки регистрации
+
+    Каждый сайт отвечает за две вещи:
+    - build_request: как сформировать запрос для email
+    - classify: как интерпретировать ответ сайта
+    """
+
+    name: str = ""
+    url: str = ""
+    method: str = "POST"
+
+    def __init__(self):
+        self.headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+            'Accept': 'application/json'
+        }
+
+    def build_request(self, email: str) -> Dict:
+        """
+        Формирование параметров запроса
+
+        Args:
+            email: email для проверки
+
+        Returns:
+            Dict с аргументами для session.request (method, url, ...)
+        """
+        return {
+            "method": self.method,
+            "url": self.url,
+            "json": {"email": email},
+            "headers": self.headers
+        }
+
+    def classify(self, status: int, body: bytes) -> Optional[Dict]:
+        """
+        Интерпретация ответа сайта
+
+        По умолчанию: 400 - email занят, 200/201 - вероятно зарегистрирован
+
+        Args:
+            status: HTTP статус ответа
+            body: тело ответа
+
+        Returns:
+            Dict с полями registered/confidence или None если не найдено
+        """
+        if status == 400:
+            return {"registered": "yes", "confidence": 0.9}
+        if status in [200, 201]:
+            return {"registered": "likely", "confidence": 0.7}
+        return None
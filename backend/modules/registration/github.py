@@ -0,0 +1,12 @@
+"""
+Проверка регистрации email на GitHub
+"""
+from .base import RegistrationSite
+
+
+class GitHubSite(RegistrationSite):
+    """GitHub: форма регистрации отвечает 400 если email уже занят"""
+
+    name = "GitHub"
+    url = "https://github.com/signup/check_email"
+    method = "POST"
@@ -0,0 +1,12 @@
+"""
+Проверка регистрации email на Instagram
+"""
+from .base import RegistrationSite
+
+
+class InstagramSite(RegistrationSite):
+    """Instagram: форма регистрации отвечает 400 если email уже занят"""
+
+    name = "Instagram"
+    url = "https://www.instagram.com/accounts/emailsignup/"
+    method = "POST"
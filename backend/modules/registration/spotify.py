@@ -0,0 +1,34 @@
+"""
+Проверка регистрации email на Spotify
+"""
+import json
+from typing import Dict, Optional
+
+from .base import RegistrationSite
+
+
+class SpotifySite(RegistrationSite):
+    """Spotify: валидация формы регистрации, status == 20 означает что email занят"""
+
+    name = "Spotify"
+    url = "https://spclient.wg.spotify.com/signup/public/v1/account"
+    method = "GET"
+
+    def build_request(self, email: str) -> Dict:
+        return {
+            "method": self.method,
+            "url": self.url,
+            "params": {"validate": "1", "email": email},
+            "headers": self.headers
+        }
+
+    def classify(self, status: int, body: bytes) -> Optional[Dict]:
+        if status != 200:
+            return None
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return None
+        if data.get("status") == 20:
+            return {"registered": "yes", "confidence": 0.9}
+        return None
@@ -0,0 +1,34 @@
+"""
+Проверка регистрации email на Twitter
+"""
+import json
+from typing import Dict, Optional
+
+from .base import RegistrationSite
+
+
+class TwitterSite(RegistrationSite):
+    """Twitter: публичный endpoint email_available возвращает поле taken"""
+
+    name = "Twitter"
+    url = "https://api.twitter.com/i/users/email_available.json"
+    method = "GET"
+
+    def build_request(self, email: str) -> Dict:
+        return {
+            "method": self.method,
+            "url": self.url,
+            "params": {"email": email},
+            "headers": self.headers
+        }
+
+    def classify(self, status: int, body: bytes) -> Optional[Dict]:
+        if status != 200:
+            return None
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return None
+        if data.get("taken"):
+            return {"registered": "yes", "confidence": 0.9}
+        return None
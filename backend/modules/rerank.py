@@ -0,0 +1,262 @@
+"""
+Переранжирование результатов reverse image search по визуальному сходству
+
+Yandex и Google отдают миниатюры найденных изображений, но не оценку
+сходства. Этот модуль скачивает миниатюры (с лимитом количества и общим
+дедлайном), считает для каждой:
+- сходство pHash с исходным изображением: 1 - hamming / 64
+- косинусное сходство лиц с лицами на исходном фото (если доступен face pipeline)
+
+и сортирует результаты по реальной оценке, объединяя дубликаты (одна и та
+же картинка с разных движков/страниц). Лица миниатюр попадают в индекс
+лиц (modules.face_index) с адресом страницы результата. Сравнение векторизовано (NumPy):
+все расстояния Хэмминга и все скалярные произведения эмбеддингов
+считаются одной операцией.
+"""
+import asyncio
+import base64
+import logging
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import config
+from modules import image_hash, metrics, tracing
+from modules.face_engine import face_engine
+from modules.face_index import face_index
+from modules.http_client import fetch_limited
+
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = image_hash.HASH_SIZE * image_hash.HASH_SIZE
+
+
+def _decode_data_uri(uri: str) -> Optional[bytes]:
+    """Миниатюры Google часто встроены в страницу как data:image/...;base64"""
+    header, _, payload = uri.partition(",")
+    if ";base64" not in header:
+        return None
+    try:
+        return base64.b64decode(payload)
+    except ValueError:
+        return None
+
+
+class ThumbnailReranker:
+    """
+    Переранжирование по миниатюрам
+
+    Args:
+        fetch_budget: максимум миниатюр на запрос (берутся первые по выдаче)
+        deadline: общий лимит времени на загрузку и анализ (секунды)
+        concurrency: одновременных загрузок
+        max_bytes: максимальный размер миниатюры
+        duplicate_distance: расстояние Хэмминга, ниже которого результаты - дубликаты
+    """
+
+    def __init__(
+        self,
+        fetch_budget: int = 30,
+        deadline: float = 5.0,
+        concurrency: int = 10,
+        max_bytes: int = 512 * 1024,
+        duplicate_distance: int = 4
+    ):
+        self.fetch_budget = fetch_budget
+        self.deadline = deadline
+        self.concurrency = concurrency
+        self.max_bytes = max_bytes
+        self.duplicate_distance = duplicate_distance
+
+    async def _load_thumbnail(self, url: str, semaphore: asyncio.Semaphore) -> Optional[bytes]:
+        if url.startswith("data:"):
+            return _decode_data_uri(url)
+        if url.startswith("//"):
+            url = "https:" + url
+        if not url.startswith(("http://", "https://")):
+            return None
+        async with semaphore:
+            with metrics.track_engine("thumbnails") as tracker:
+                # Миниатюры лежат на CDN поисковиков: без общего rate limiter,
+                # параллелизм ограничен семафором и fetch_budget
+                data = await fetch_limited(url, self.max_bytes, timeout=self.deadline, throttle=False)
+                tracker.outcome = "found" if data else "not_found"
+                return data
+
+    async def _analyze(self, index: int, url: str, semaphore: asyncio.Semaphore, with_faces: bool) -> Dict:
+        """Загрузка миниатюры, pHash и (опционально) эмбеддинги лиц"""
+        data = await self._load_thumbnail(url, semaphore)
+        if not data:
+            return {"index": index, "phash": None, "faces": []}
+        if with_faces:
+            phash, faces = await asyncio.gather(image_hash.phash_async(data), face_engine.analyze(data))
+        else:
+            phash, faces = await image_hash.phash_async(data), []
+        return {"index": index, "phash": phash, "faces": faces}
+
+    async def _analyze_all(self, candidates: List[Dict], with_faces: bool) -> List[Dict]:
+        """Анализ миниатюр в пределах дедлайна; не успевшие отменяются"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = [
+            asyncio.ensure_future(self._analyze(i, result["thumbnail"], semaphore, with_faces))
+            for i, result in enumerate(candidates)
+        ]
+        done, pending = await asyncio.wait(tasks, timeout=self.deadline)
+        for task in pending:
+            task.cancel()
+        if pending:
+            # Дождаться отмены, чтобы загрузки не висели после ответа
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        analyzed = []
+        for task in done:
+            if task.cancelled() or task.exception() is not None:
+                continue
+            analyzed.append(task.result())
+        # done - множество: исходный порядок, чтобы равные оценки не менялись местами между запусками
+        analyzed.sort(key=lambda item: item["index"])
+        return analyzed
+
+    async def rerank(
+        self,
+        query_image: bytes,
+        results: List[Dict],
+        query_faces: Optional[List[Dict]] = None
+    ) -> List[Dict]:
+        """
+        Переранжирование результатов по сходству миниатюр с исходным фото
+
+        Результаты с оценкой получают поля similarity (реальная оценка),
+        visual_similarity, face_similarity (если есть лица) и
+        similarity_source. Дубликаты объединяются в один результат с
+        полем duplicates. Результаты без миниатюры или не успевшие
+        за дедлайн идут после оценённых в исходном порядке.
+
+        Args:
+            query_image: байты исходного изображения
+            results: результаты движков (поля thumbnail, url, similarity)
+            query_faces: лица исходного фото (из face_engine.analyze)
+
+        Returns:
+            Новый список результатов
+        """
+        candidates = [r for r in results if r.get("thumbnail")][:self.fetch_budget]
+        if not candidates:
+            return list(results)
+
+        start = time.perf_counter()
+        query_embeddings = (
+            np.vstack([face["embedding"] for face in query_faces])
+            if query_faces else np.empty((0, 0), dtype=np.float32)
+        )
+        with_faces = bool(query_faces) and face_engine.available()
+
+        with tracing.start_span("rerank.thumbnails", candidates=len(candidates)) as span:
+            query_hash = await image_hash.phash_async(query_image)
+            analyzed = await self._analyze_all(candidates, with_faces)
+            analyzed = [item for item in analyzed if item["phash"] is not None]
+            span.set_attribute("rerank.analyzed", len(analyzed))
+
+            if query_hash is None or not analyzed:
+                return list(results)
+
+            hashes = [item["phash"] for item in analyzed]
+            visual = 1.0 - image_hash.hamming_to_many(query_hash, hashes) / HASH_BITS
+
+            face_scores = np.full(len(analyzed), np.nan)
+            if with_faces:
+                owners = [i for i, item in enumerate(analyzed) for _ in item["faces"]]
+                if owners:
+                    embeddings = np.vstack([face["embedding"] for item in analyzed for face in item["faces"]])
+                    # (лица миниатюр x лица запроса) -> лучшее совпадение для каждой миниатюры
+                    best = (embeddings @ query_embeddings.T).max(axis=1)
+                    np.fmax.at(face_scores, owners, best)
+
+            for item, visual_score, face_score in zip(analyzed, visual, face_scores):
+                result = candidates[item["index"]]
+                result["visual_similarity"] = round(float(visual_score), 4)
+                if not np.isnan(face_score):
+                    result["face_similarity"] = round(float(face_score), 4)
+                    result["similarity"] = round(float(max(face_score, visual_score)), 4)
+                    result["similarity_source"] = "face"
+                else:
+                    result["similarity"] = round(float(visual_score), 4)
+                    result["similarity_source"] = "phash"
+
+            await self._index_faces(candidates, analyzed)
+            scored = self._dedup(
+                [candidates[item["index"]] for item in analyzed],
+                hashes
+            )
+            span.set_attribute("rerank.unique", len(scored))
+            metrics.ENGINE_LATENCY.observe("rerank", value=time.perf_counter() - start)
+
+        scored_ids = {id(candidates[item["index"]]) for item in analyzed}
+        rest = [r for r in results if id(r) not in scored_ids]
+        return scored + rest
+
+    async def _index_faces(self, candidates: List[Dict], analyzed: List[Dict]):
+        """Лица миниатюр в индекс лиц (страница, где лицо найдено, - один раз)"""
+        for item in analyzed:
+            if not item["faces"]:
+                continue
+            result = candidates[item["index"]]
+            url = result.get("url")
+            if not url:
+                continue
+            try:
+                indexed = await asyncio.to_thread(face_index.contains_url, url)
+                metrics.record_cache("face_index_url", hit=indexed)
+                if indexed:
+                    continue
+                thumbnail = result["thumbnail"]
+                await asyncio.to_thread(
+                    face_index.add,
+                    np.vstack([face["embedding"] for face in item["faces"]]),
+                    [
+                        {
+                            "source": "thumbnail",
+                            "url": url,
+                            "engine": result.get("source"),
+                            # data: URI Google - не адрес, в метаданные не кладём
+                            "thumbnail": None if thumbnail.startswith("data:") else thumbnail,
+                            "bbox": face["bbox"]
+                        }
+                        for face in item["faces"]
+                    ]
+                )
+            except Exception as e:
+                logger.warning("Лица миниатюры %s не добавлены в индекс: %s", url, e)
+
+    def _dedup(self, scored: List[Dict], hashes: List[int]) -> List[Dict]:
+        """Сортировка по оценке и объединение визуальных дубликатов"""
+        order = sorted(range(len(scored)), key=lambda i: scored[i]["similarity"], reverse=True)
+        distances = image_hash.hamming_matrix(hashes)
+
+        kept: List[int] = []
+        for i in order:
+            duplicate_of = next(
+                (k for k in kept if distances[i, k] <= self.duplicate_distance),
+                None
+            )
+            if duplicate_of is None:
+                kept.append(i)
+                continue
+            primary = scored[duplicate_of]
+            primary.setdefault("duplicates", []).append({
+                "source": scored[i].get("source"),
+                "url": scored[i].get("url")
+            })
+
+        return [scored[i] for i in kept]
+
+
+reranker = ThumbnailReranker(
+    fetch_budget=config.RERANK_FETCH_BUDGET,
+    deadline=config.RERANK_DEADLINE,
+    concurrency=config.RERANK_CONCURRENCY,
+    max_bytes=config.RERANK_MAX_THUMBNAIL_BYTES,
+    duplicate_distance=config.RERANK_DUPLICATE_DISTANCE
+)
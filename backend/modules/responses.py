@@ -0,0 +1,101 @@
+"""
+Быстрая сериализация ответов API
+
+FastJSONResponse сериализует ответ через orjson (если установлен, иначе
+стандартный json) и понимает записи modules.records. Эндпоинты с большими
+ответами возвращают его напрямую - так FastAPI не прогоняет результат
+через jsonable_encoder (рекурсивный обход на Python).
+
+conditional_response добавляет ETag - хеш содержимого без полей, которые
+меняются от запуска к запуску (время обработки, тайминги движков, путь
+временного файла). Клиент, повторяющий поиск с If-None-Match, получает
+304 без тела, если находки не изменились.
+"""
+import hashlib
+import json
+from typing import Any, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+from modules import metrics
+from modules.records import RecordMixin
+
+try:
+    import orjson
+except ImportError:  # без orjson - стандартный json (медленнее)
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, RecordMixin):
+        return value.to_dict()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """JSON в байтах (UTF-8, без экранирования не-ASCII)"""
+    if orjson is not None:
+        # Записи - dataclass: без PASSTHROUGH orjson выгрузил бы и поля с None
+        return orjson.dumps(
+            content,
+            default=_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_SERIALIZE_NUMPY
+        )
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse на orjson с поддержкой записей результатов"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# Поля, которые различаются между запусками при тех же находках
+VOLATILE_FIELDS = frozenset({"processing_time", "timestamp", "trace", "elapsed_ms", "latency_ms", "image_path"})
+
+
+def _stable(value: Any) -> Any:
+    if isinstance(value, RecordMixin):
+        value = value.to_dict()
+    if isinstance(value, dict):
+        return {key: _stable(item) for key, item in value.items() if key not in VOLATILE_FIELDS}
+    if isinstance(value, (list, tuple)):
+        return [_stable(item) for item in value]
+    return value
+
+
+def content_etag(content: Any) -> str:
+    """Строгий ETag по содержимому ответа (без изменчивых полей)"""
+    return '"%s"' % hashlib.blake2b(dumps(_stable(content)), digest_size=16).hexdigest()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Слабое сравнение If-None-Match с ETag (RFC 9110, 13.1.2)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def conditional_response(request: Request, content: Any, status_code: int = 200) -> Response:
+    """FastJSONResponse с ETag или 304, если у клиента то же содержимое"""
+    etag = content_etag(content)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        # Hit ratio - среди условных запросов клиентов
+        metrics.record_cache("response_etag", hit=etag_matches(if_none_match, etag))
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return FastJSONResponse(content, status_code=status_code, headers={"ETag": etag})
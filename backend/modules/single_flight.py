@@ -0,0 +1,133 @@
+"""
+Объединение одинаковых одновременных запросов (single-flight)
+
+Если поиск с тем же ключом уже идёт, новый вызов не запускает второй
+fan-out, а ждёт результат идущего. Так двойной сабмит из панели или
+несколько аналитиков с одним username делают одну работу.
+
+- ключ - нормализованный запрос (или хеш содержимого изображения);
+  группа (SingleFlight) отделяет разные виды работы
+- каждый ждущий получает поверхностную копию результата: вызывающий код
+  меняет верхний уровень ответа (pop("all_results"), поля запроса),
+  и это не должно задевать соседей
+- общая работа отменяется, только когда отменены все ждущие; отмена
+  одного клиента (разрыв соединения) не прерывает поиск для остальных
+- исходы движков (engine_listener, частичные результаты WebSocket)
+  рассылаются всем ждущим; присоединившийся позже получает только
+  исходы, пришедшие после него
+- контекст работы (клиент fair_queue, трассировка) - первого вызова
+"""
+import asyncio
+import copy
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+import config
+from modules import metrics
+from modules.engines.scheduler import engine_listener
+
+
+CALLS = metrics.REGISTRY.register(metrics.Counter(
+    "osint_single_flight_total",
+    "Calls by role: leader runs the work, follower joins one already in flight",
+    ("group", "role")
+))
+IN_FLIGHT = metrics.REGISTRY.register(metrics.Gauge(
+    "osint_single_flight_in_flight",
+    "Distinct computations in flight",
+    ("group",)
+))
+
+
+class _Flight:
+    """Идущая работа и её ждущие"""
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+        self.listeners: List[Callable] = []
+
+    async def broadcast(self, engine: str, outcome: Dict):
+        for listener in list(self.listeners):
+            await listener(engine, outcome)
+
+
+class SingleFlight:
+    """
+    Группа объединяемых вызовов
+
+    Args:
+        name: имя группы (метки метрик)
+        enabled: выключенная группа просто вызывает factory
+    """
+
+    def __init__(self, name: str, enabled: bool = True):
+        self.name = name
+        self.enabled = enabled
+        self._flights: Dict[Tuple[int, Hashable], _Flight] = {}
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Результат factory() для ключа; при идущем вызове с тем же ключом - его результат
+
+        Args:
+            key: ключ запроса (hashable)
+            factory: функция без аргументов, возвращающая корутину работы
+
+        Returns:
+            Поверхностная копия результата
+        """
+        if not self.enabled:
+            return await factory()
+
+        # Задачи и futures привязаны к loop - ключи разных loop не пересекаются
+        flight_key = (id(asyncio.get_running_loop()), key)
+        flight = self._flights.get(flight_key)
+        if flight is None:
+            flight = self._flights[flight_key] = _Flight()
+            flight.task = asyncio.ensure_future(self._run(flight, factory))
+            flight.task.add_done_callback(lambda _: self._done(flight_key, flight))
+            IN_FLIGHT.set(self.name, value=len(self._flights))
+            CALLS.inc(self.name, "leader")
+            metrics.record_cache(f"single_flight_{self.name}", hit=False)
+        else:
+            CALLS.inc(self.name, "follower")
+            metrics.record_cache(f"single_flight_{self.name}", hit=True)
+
+        listener = engine_listener.get()
+        if listener is not None:
+            flight.listeners.append(listener)
+        flight.waiters += 1
+        try:
+            # shield: отмена одного ждущего не отменяет общую работу
+            result = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done() and flight.waiters == 1:
+                # Последний ждущий ушёл; новый вызов с этим ключом начнёт заново
+                self._forget(flight_key, flight)
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+            if listener is not None:
+                flight.listeners.remove(listener)
+        return copy.copy(result)
+
+    async def _run(self, flight: _Flight, factory: Callable[[], Awaitable[Any]]) -> Any:
+        engine_listener.set(flight.broadcast)
+        return await factory()
+
+    def _forget(self, flight_key: Tuple[int, Hashable], flight: _Flight):
+        if self._flights.get(flight_key) is flight:
+            del self._flights[flight_key]
+        IN_FLIGHT.set(self.name, value=len(self._flights))
+
+    def _done(self, flight_key: Tuple[int, Hashable], flight: _Flight):
+        self._forget(flight_key, flight)
+        if not flight.task.cancelled():
+            # Исключение получили ждущие; без них - не "never retrieved"
+            flight.task.exception()
+
+
+# Поиски целиком (username, email, фото) и проверки одного сайта
+lookups = SingleFlight("lookup", config.SINGLE_FLIGHT_ENABLED)
+probes = SingleFlight("probe", config.SINGLE_FLIGHT_ENABLED)
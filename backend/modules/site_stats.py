@@ -0,0 +1,313 @@
+"""
+Статистика сайтов проверки username и выбор сайтов под бюджет
+
+По каждому сайту каталога копится (с затуханием - последние
+~SITE_STATS_WINDOW проверок весят больше старых):
+- доля найденных профилей (hit rate)
+- доля неопределённых ответов (не 200/404: капча, 403, редиректы)
+- доля ошибок (таймауты, обрывы соединения)
+- EWMA задержки
+
+При max_sites или бюджете времени проверяются не первые N сайтов
+каталога, а сайты с наибольшей ожидаемой пользой в секунду:
+
+    польза = hit_rate * (1 - uncertain_rate) * (1 - error_rate) / задержка
+
+Доли - с априорным значением (сайт без истории не ноль и не единица).
+Часть бюджета (SITE_EXPLORE_FRACTION) уходит сайтам с наименьшей
+историей, иначе новые и давно не проверявшиеся сайты не попали бы в
+выборку. Сломанные сайты (разомкнутый выключатель или доля ошибок выше
+SITE_BROKEN_ERROR_RATE) пропускаются; сломанный по ошибкам сайт снова
+пробуется через SITE_BROKEN_RETRY_SECONDS.
+
+Статистика сохраняется в JSON (SITE_STATS_PATH) раз в
+SITE_STATS_SAVE_SECONDS и при остановке.
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import config
+from modules.circuit_breaker import breakers
+
+
+logger = logging.getLogger(__name__)
+
+OUTCOME_FOUND = "found"
+OUTCOME_NOT_FOUND = "not_found"
+OUTCOME_UNCERTAIN = "uncertain"
+OUTCOME_ERROR = "error"
+
+# Априорные доли и их вес в проверках
+_PRIOR_HIT = 0.3
+_PRIOR_UNCERTAIN = 0.1
+_PRIOR_ERROR = 0.05
+_PRIOR_WEIGHT = 2.0
+_DEFAULT_LATENCY = 1.0  # секунд, пока у сайтов нет истории
+_MIN_LATENCY = 0.05
+_LATENCY_ALPHA = 0.2
+
+
+class SiteRecord:
+    """Затухающие счётчики одного сайта"""
+
+    __slots__ = ("probes", "found", "uncertain", "errors", "latency", "last_probe", "last_error")
+
+    def __init__(self):
+        self.probes = 0.0
+        self.found = 0.0
+        self.uncertain = 0.0
+        self.errors = 0.0
+        self.latency: Optional[float] = None
+        self.last_probe = 0.0
+        self.last_error: Optional[str] = None
+
+    def _rate(self, count: float, prior: float) -> float:
+        return (count + prior * _PRIOR_WEIGHT) / (self.probes + _PRIOR_WEIGHT)
+
+    def hit_rate(self) -> float:
+        return self._rate(self.found, _PRIOR_HIT)
+
+    def uncertain_rate(self) -> float:
+        return self._rate(self.uncertain, _PRIOR_UNCERTAIN)
+
+    def error_rate(self) -> float:
+        return self._rate(self.errors, _PRIOR_ERROR)
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "SiteRecord":
+        record = cls()
+        for name in cls.__slots__:
+            if name in data:
+                setattr(record, name, data[name])
+        return record
+
+
+class SiteStats:
+    """
+    Статистика сайтов и ранжирование
+
+    Args:
+        path: JSON файл статистики (пусто - только в памяти)
+        window: проверок, после которых старая история весит меньше новой
+        explore_fraction: доля бюджета для сайтов с наименьшей историей
+        min_samples: проверок до признания сайта сломанным по доле ошибок
+        broken_error_rate: доля ошибок сломанного сайта
+        broken_retry: секунд до повторной проверки сломанного сайта
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path],
+        window: int = 200,
+        explore_fraction: float = 0.1,
+        min_samples: int = 5,
+        broken_error_rate: float = 0.8,
+        broken_retry: float = 3600,
+        save_interval: float = 300
+    ):
+        self.path = Path(path) if path else None
+        self.decay = 1.0 - 1.0 / max(window, 1)
+        self.explore_fraction = explore_fraction
+        self.min_samples = min_samples
+        self.broken_error_rate = broken_error_rate
+        self.broken_retry = broken_retry
+        self.save_interval = save_interval
+        self._sites: Optional[Dict[str, SiteRecord]] = None
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self._saving: Optional[asyncio.Future] = None
+
+    # ---------- хранение
+
+    @property
+    def sites(self) -> Dict[str, SiteRecord]:
+        # Файл читается при первом обращении, а не при импорте
+        if self._sites is None:
+            self._sites = self._load()
+        return self._sites
+
+    def _load(self) -> Dict[str, SiteRecord]:
+        if self.path is None or not self.path.exists():
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            return {name: SiteRecord.from_dict(entry) for name, entry in data.get("sites", {}).items()}
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning("Статистика сайтов %s не прочитана: %s", self.path, e)
+            return {}
+
+    def _dump(self) -> Dict:
+        return {"sites": {name: record.to_dict() for name, record in self.sites.items()}}
+
+    def _write(self, data: Dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def save(self):
+        """Синхронное сохранение (при остановке приложения)"""
+        if self.path is None or not self._dirty:
+            return
+        self._write(self._dump())
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+    def _schedule_save(self):
+        if self.path is None or time.monotonic() - self._last_save < self.save_interval:
+            return
+        if self._saving is not None and not self._saving.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        # Снимок - в loop, запись файла - в потоке
+        data = self._dump()
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self._saving = loop.run_in_executor(None, self._write, data)
+        self._saving.add_done_callback(self._saved)
+
+    def _saved(self, future: asyncio.Future):
+        if future.exception() is not None:
+            logger.warning("Статистика сайтов не сохранена: %s", future.exception())
+            self._dirty = True
+
+    # ---------- учёт проверок
+
+    def record(self, site_name: str, outcome: str, latency: float, error: Optional[str] = None):
+        """
+        Исход проверки сайта
+
+        Args:
+            site_name: сайт каталога
+            outcome: found, not_found, uncertain, error
+            latency: секунд до ответа (или до ошибки)
+        """
+        record = self.sites.get(site_name)
+        if record is None:
+            record = self.sites[site_name] = SiteRecord()
+        decay = self.decay
+        record.probes = record.probes * decay + 1
+        record.found = record.found * decay + (outcome == OUTCOME_FOUND)
+        record.uncertain = record.uncertain * decay + (outcome == OUTCOME_UNCERTAIN)
+        record.errors = record.errors * decay + (outcome == OUTCOME_ERROR)
+        record.latency = latency if record.latency is None else record.latency + _LATENCY_ALPHA * (latency - record.latency)
+        record.last_probe = time.time()
+        if error:
+            record.last_error = error
+        self._dirty = True
+        self._schedule_save()
+
+    # ---------- выбор сайтов
+
+    def _default_latency(self) -> float:
+        known = sorted(r.latency for r in self.sites.values() if r.latency is not None)
+        return known[len(known) // 2] if known else _DEFAULT_LATENCY
+
+    def broken(self, site_name: str, now: Optional[float] = None) -> bool:
+        """Сайт сейчас не стоит проверять"""
+        # После reset_timeout сайт снова выбирается - пробный вызов переведёт выключатель в half_open
+        if breakers.site(site_name).is_open():
+            return True
+        record = self.sites.get(site_name)
+        if record is None or record.probes < self.min_samples:
+            return False
+        now = time.time() if now is None else now
+        return record.error_rate() >= self.broken_error_rate and now - record.last_probe < self.broken_retry
+
+    def expected_latency(self, site_name: str, default: Optional[float] = None) -> float:
+        record = self.sites.get(site_name)
+        if record is None or record.latency is None:
+            return self._default_latency() if default is None else default
+        return record.latency
+
+    def score(self, site_name: str, default_latency: Optional[float] = None) -> float:
+        """Ожидаемые находки в секунду проверки"""
+        record = self.sites.get(site_name) or SiteRecord()
+        value = record.hit_rate() * (1 - record.uncertain_rate()) * (1 - record.error_rate())
+        return value / max(self.expected_latency(site_name, default_latency), _MIN_LATENCY)
+
+    def select(
+        self,
+        site_names: List[str],
+        limit: Optional[int] = None,
+        time_budget: Optional[float] = None
+    ) -> List[str]:
+        """
+        Сайты для проверки: без сломанных, по убыванию пользы в секунду
+
+        Args:
+            site_names: кандидаты (порядок каталога)
+            limit: не больше N сайтов (max_sites)
+            time_budget: секунд на поиск - сайты с ожидаемой задержкой
+                больше бюджета не берутся (проверки идут параллельно)
+
+        Returns:
+            Имена сайтов
+        """
+        now = time.time()
+        default_latency = self._default_latency()
+        candidates = [name for name in site_names if not self.broken(name, now)]
+        if time_budget:
+            candidates = [
+                name for name in candidates
+                if self.expected_latency(name, default_latency) <= time_budget
+            ]
+
+        # sorted стабилен: при равной пользе остаётся порядок каталога
+        ranked = sorted(candidates, key=lambda name: -self.score(name, default_latency))
+        if limit is None or limit >= len(ranked):
+            return ranked
+
+        explore = min(limit, math.ceil(limit * self.explore_fraction)) if self.explore_fraction > 0 else 0
+        chosen = ranked[:limit - explore]
+        if explore:
+            rest = ranked[limit - explore:]
+            # Разведка: сайты с наименьшей (затухшей) историей
+            rest.sort(key=lambda name: self.sites[name].probes if name in self.sites else 0.0)
+            chosen += rest[:explore]
+        return chosen
+
+    def snapshot(self) -> Dict:
+        """Сайты по убыванию пользы (для /api/admin/sites)"""
+        now = time.time()
+        default_latency = self._default_latency()
+        entries = []
+        for name, record in self.sites.items():
+            entries.append({
+                "site": name,
+                "score": round(self.score(name, default_latency), 4),
+                "probes": round(record.probes, 1),
+                "hit_rate": round(record.hit_rate(), 3),
+                "uncertain_rate": round(record.uncertain_rate(), 3),
+                "error_rate": round(record.error_rate(), 3),
+                "latency_ms": round(record.latency * 1000, 1) if record.latency is not None else None,
+                "broken": self.broken(name, now),
+                "last_error": record.last_error
+            })
+        entries.sort(key=lambda entry: -entry["score"])
+        return {"sites": entries}
+
+
+site_stats = SiteStats(
+    config.SITE_STATS_PATH,
+    window=config.SITE_STATS_WINDOW,
+    explore_fraction=config.SITE_EXPLORE_FRACTION,
+    min_samples=config.SITE_BROKEN_MIN_SAMPLES,
+    broken_error_rate=config.SITE_BROKEN_ERROR_RATE,
+    broken_retry=config.SITE_BROKEN_RETRY_SECONDS,
+    save_interval=config.SITE_STATS_SAVE_SECONDS
+)
@@ -0,0 +1,280 @@
+"""
+Временное хранилище загрузок (config.UPLOAD_DIR)
+
+- каждый файл хранилища имеет счётчик ссылок: пока запрос работает с
+  файлом, ни уборщик, ни /api/cleanup его не удалят; последний release()
+  удаляет файл сразу
+- квота на суммарный размер (UPLOAD_QUOTA_BYTES): при нехватке места
+  сначала удаляются старые неиспользуемые файлы, иначе StorageFull
+- уборщик в отдельном потоке раз в UPLOAD_REAP_INTERVAL_SECONDS удаляет
+  осиротевшие файлы (упавшие запросы, другие процессы) старше
+  UPLOAD_MAX_AGE_SECONDS и пересчитывает занятое место
+
+Чужие файлы (не из этого процесса) трогаются только если им больше
+_ORPHAN_MIN_AGE секунд - они могут принадлежать запросу другого воркера.
+"""
+import asyncio
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+import config
+from modules import metrics
+
+
+logger = logging.getLogger(__name__)
+
+_ORPHAN_MIN_AGE = 60
+
+DISK_BYTES = metrics.REGISTRY.register(metrics.Gauge(
+    "osint_upload_disk_bytes",
+    "Bytes used by uploaded files in UPLOAD_DIR"
+))
+IN_USE_FILES = metrics.REGISTRY.register(metrics.Gauge(
+    "osint_upload_in_use_files",
+    "Uploaded files currently referenced by requests"
+))
+REAPED = metrics.REGISTRY.register(metrics.Counter(
+    "osint_upload_reaped_total",
+    "Uploaded files removed by the reaper (age/quota/manual)",
+    ("reason",)
+))
+
+
+class StorageFull(Exception):
+    """Квота хранилища загрузок исчерпана файлами, которые сейчас в работе"""
+
+
+class TempStorage:
+    """
+    Файлы загрузок со счётчиком ссылок, квотой и уборщиком
+
+    Args:
+        directory: каталог загрузок
+        quota_bytes: максимум байт на диске
+        max_age: возраст осиротевшего файла для удаления уборщиком (секунды)
+    """
+
+    def __init__(self, directory: Path, quota_bytes: int, max_age: float):
+        self.directory = Path(directory)
+        self.quota_bytes = quota_bytes
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._refs: Dict[str, int] = {}
+        self._sizes: Dict[str, int] = {}
+        self._total = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ---------- файлы
+
+    def save(self, source: BinaryIO, filename: str = "") -> str:
+        """
+        Сохранение загрузки (счётчик ссылок = 1)
+
+        Args:
+            source: файловый объект загрузки
+            filename: исходное имя (берётся расширение)
+
+        Returns:
+            Путь к файлу; освободить через release()
+
+        Raises:
+            StorageFull: квота занята файлами в работе
+        """
+        source.seek(0, 2)
+        size = source.tell()
+        source.seek(0)
+
+        path = str(self.directory / f"{uuid.uuid4()}{os.path.splitext(filename)[1]}")
+        with self._lock:
+            if self._total + size > self.quota_bytes:
+                self._evict(self._total + size - self.quota_bytes)
+                if self._total + size > self.quota_bytes:
+                    raise StorageFull(
+                        f"Хранилище загрузок заполнено ({self._total} из {self.quota_bytes} байт в работе)"
+                    )
+            # Регистрируем до записи, чтобы уборщик не принял файл за сироту
+            self._refs[path] = 1
+            self._sizes[path] = size
+            self._total += size
+
+        try:
+            with open(path, "wb") as buffer:
+                shutil.copyfileobj(source, buffer)
+        except OSError:
+            self.release(path)
+            raise
+
+        self._publish()
+        return path
+
+    def acquire(self, path: str):
+        """Ещё одна ссылка на файл хранилища"""
+        with self._lock:
+            if path not in self._refs:
+                raise KeyError(path)
+            self._refs[path] += 1
+
+    def release(self, path: str):
+        """Снятие ссылки; последняя ссылка удаляет файл"""
+        with self._lock:
+            refs = self._refs.get(path, 0) - 1
+            if refs > 0:
+                self._refs[path] = refs
+                return
+            self._refs.pop(path, None)
+            self._remove(path)
+        self._publish()
+
+    @asynccontextmanager
+    async def upload(self, upload_file):
+        """
+        Файл загрузки на время запроса
+
+            async with temp_storage.upload(file) as file_path:
+                ...
+
+        Raises:
+            StorageFull: квота занята файлами в работе
+        """
+        path = await asyncio.to_thread(self.save, upload_file.file, upload_file.filename or "")
+        try:
+            yield path
+        finally:
+            await asyncio.to_thread(self.release, path)
+
+    def _remove(self, path: str) -> int:
+        """Удаление файла (под self._lock); возвращает освобождённые байты"""
+        size = self._sizes.pop(path, None)
+        try:
+            if size is None:
+                size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("Не удалось удалить загрузку %s: %s", path, e)
+            return 0
+        size = size or 0
+        self._total = max(0, self._total - size)
+        return size
+
+    # ---------- уборка
+
+    def _candidates(self, now: float) -> List[Tuple[float, str]]:
+        """Неиспользуемые файлы каталога (mtime, путь), старые первыми"""
+        candidates = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.is_file(follow_symlinks=False) or entry.path in self._refs:
+                    continue
+                try:
+                    mtime = entry.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                if now - mtime >= _ORPHAN_MIN_AGE:
+                    candidates.append((mtime, entry.path))
+        candidates.sort()
+        return candidates
+
+    def _evict(self, needed: int):
+        """Освобождение места под квоту за счёт старых неиспользуемых файлов (под self._lock)"""
+        freed = 0
+        for _, path in self._candidates(time.time()):
+            if freed >= needed:
+                break
+            freed += self._remove(path)
+            REAPED.inc("quota")
+
+    def reap(self, max_age: Optional[float] = None, reason: str = "age") -> Dict:
+        """
+        Удаление неиспользуемых файлов старше max_age и пересчёт места
+
+        Args:
+            max_age: возраст в секундах (по умолчанию UPLOAD_MAX_AGE_SECONDS)
+            reason: метка для метрики
+
+        Returns:
+            Dict: files_deleted, bytes_freed, usage
+        """
+        max_age = self.max_age if max_age is None else max_age
+        now = time.time()
+        deleted = freed = 0
+
+        with self._lock:
+            for mtime, path in self._candidates(now):
+                if now - mtime < max_age:
+                    break
+                freed += self._remove(path)
+                deleted += 1
+
+            # Пересчёт с диска (файлы могли добавить/удалить другие процессы);
+            # свои файлы считаем по заявленному размеру - они могут ещё записываться
+            total = sum(self._sizes.values())
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_file(follow_symlinks=False) and entry.path not in self._sizes:
+                            total += entry.stat().st_size
+                    except FileNotFoundError:
+                        continue
+            self._total = total
+
+        if deleted:
+            REAPED.inc(reason, amount=deleted)
+        self._publish()
+        return {"files_deleted": deleted, "bytes_freed": freed, "usage": self.usage()}
+
+    def usage(self) -> Dict:
+        with self._lock:
+            return {
+                "bytes": self._total,
+                "quota_bytes": self.quota_bytes,
+                "in_use_files": len(self._refs),
+                "in_use_bytes": sum(self._sizes.get(path, 0) for path in self._refs)
+            }
+
+    def _publish(self):
+        usage = self.usage()
+        DISK_BYTES.set(value=usage["bytes"])
+        IN_USE_FILES.set(value=usage["in_use_files"])
+
+    # ---------- поток уборщика
+
+    def start_reaper(self, interval: float):
+        """Запуск уборщика (первый проход сразу - сироты прошлых запусков)"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._reaper, args=(interval,), name="upload-reaper", daemon=True)
+        self._thread.start()
+
+    def stop_reaper(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+
+    def _reaper(self, interval: float):
+        while not self._stop.is_set():
+            try:
+                result = self.reap()
+                if result["files_deleted"]:
+                    logger.info(
+                        "Уборка загрузок: удалено %d файлов (%d байт)",
+                        result["files_deleted"], result["bytes_freed"]
+                    )
+            except OSError as e:
+                logger.warning("Ошибка уборки загрузок: %s", e)
+            self._stop.wait(interval)
+
+
+temp_storage = TempStorage(
+    config.UPLOAD_DIR,
+    quota_bytes=config.UPLOAD_QUOTA_BYTES,
+    max_age=config.UPLOAD_MAX_AGE_SECONDS
+)
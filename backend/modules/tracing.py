@@ -0,0 +1,329 @@
+"""
+Лёгкая трассировка запросов (span на движок и на проверку сайта)
+
+Спаны совместимы с OpenTelemetry: идентификаторы trace/span в формате W3C,
+экспорт в OTLP/JSON (как у file exporter OpenTelemetry Collector).
+Текущий спан хранится в contextvars, поэтому корутины, запущенные через
+asyncio.gather, автоматически получают правильного родителя.
+"""
+import contextvars
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import config
+
+
+logger = logging.getLogger(__name__)
+
+# Коды статуса OTLP
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+# Виды спанов OTLP
+KIND_INTERNAL = 1
+KIND_CLIENT = 3
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "osint_current_span", default=None
+)
+
+
+def _new_id(n_bytes: int) -> str:
+    return os.urandom(n_bytes).hex()
+
+
+def _otlp_value(value: Any) -> Dict:
+    """Значение атрибута в формате OTLP AnyValue"""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    """Один замеренный участок работы"""
+
+    __slots__ = (
+        "name", "kind", "trace_id", "span_id", "parent_span_id",
+        "start_ns", "end_ns", "attributes", "status_code", "status_message",
+        "events", "_token"
+    )
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, kind: int = KIND_INTERNAL):
+        self.name = name
+        self.kind = kind
+        self.trace_id = parent.trace_id if parent else _new_id(16)
+        self.span_id = _new_id(8)
+        self.parent_span_id = parent.span_id if parent else ""
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes: Dict[str, Any] = {}
+        self.status_code = STATUS_UNSET
+        self.status_message = ""
+        self.events: List[Dict] = []
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def incr(self, key: str, amount: int = 1):
+        """Увеличение числового атрибута (байты, количество повторов)"""
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def record_exception(self, exc: BaseException):
+        """Запись исключения как события спана и статуса ERROR"""
+        self.status_code = STATUS_ERROR
+        self.status_message = f"{type(exc).__name__}: {exc}"
+        self.events.append({
+            "name": "exception",
+            "timeUnixNano": str(time.time_ns()),
+            "attributes": [
+                {"key": "exception.type", "value": _otlp_value(type(exc).__name__)},
+                {"key": "exception.message", "value": _otlp_value(str(exc))},
+            ]
+        })
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns or time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.record_exception(exc)
+        elif self.status_code == STATUS_UNSET:
+            self.status_code = STATUS_OK
+        self.end_ns = time.time_ns()
+        _current_span.reset(self._token)
+        exporter.export(self)
+        return False
+
+    def to_otlp(self) -> Dict:
+        """Спан в формате OTLP/JSON"""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)}
+                for key, value in self.attributes.items()
+            ],
+            "status": {"code": self.status_code, "message": self.status_message}
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        if self.events:
+            span["events"] = self.events
+        return span
+
+
+class LocalExporter:
+    """
+    Локальный экспортёр спанов
+
+    Хранит последние спаны в кольцевом буфере и, если задан
+    config.TRACE_EXPORT_FILE, дописывает их пачками в OTLP/JSON lines файл.
+    Файл пишет фоновый поток: export() вызывается в event loop при
+    завершении спана, и запись на диск блокировала бы его.
+    Для ?trace=1 собирает спаны конкретного trace_id.
+    """
+
+    def __init__(self, buffer_size: int, export_file: str = "", batch_size: int = 64):
+        self.recent = deque(maxlen=buffer_size)
+        self.export_file = export_file
+        self.batch_size = batch_size
+        self._pending: List[Span] = []
+        self._collectors: Dict[str, List[Span]] = {}
+        self._batches: queue.SimpleQueue = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+
+    def export(self, span: Span):
+        self.recent.append(span)
+        collector = self._collectors.get(span.trace_id)
+        if collector is not None:
+            collector.append(span)
+        if self.export_file:
+            self._pending.append(span)
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        """Передача накопленных спанов фоновому потоку записи (не блокирует)"""
+        if not self.export_file or not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(target=self._write_loop, name="trace-exporter", daemon=True)
+            self._writer.start()
+        self._batches.put(batch)
+
+    def close(self):
+        """Запись оставшихся спанов и остановка потока (блокирует - при остановке)"""
+        self.flush()
+        if self._writer is not None:
+            self._batches.put(None)
+            self._writer.join()
+            self._writer = None
+
+    def _write_loop(self):
+        while True:
+            batch = self._batches.get()
+            if batch is None:
+                return
+            self._write(batch)
+
+    def _write(self, batch: List[Span]):
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": _otlp_value("peoplefinder-osint")}
+                ]},
+                "scopeSpans": [{
+                    "scope": {"name": "modules.tracing"},
+                    "spans": [span.to_otlp() for span in batch]
+                }]
+            }]
+        }
+        try:
+            with open(self.export_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning("Не удалось записать спаны в %s: %s", self.export_file, e)
+
+    def start_collecting(self, trace_id: str):
+        self._collectors[trace_id] = []
+
+    def stop_collecting(self, trace_id: str) -> List[Span]:
+        return self._collectors.pop(trace_id, [])
+
+
+exporter = LocalExporter(config.TRACE_BUFFER_SIZE, config.TRACE_EXPORT_FILE)
+
+
+def current_span() -> Optional[Span]:
+    """Текущий активный спан (или None)"""
+    return _current_span.get()
+
+
+def start_span(name: str, kind: int = KIND_INTERNAL, **attributes) -> Span:
+    """
+    Создание дочернего спана для использования в with
+
+    Пример:
+        with tracing.start_span("probe", site="GitHub") as span:
+            span.incr("http.response.body.size", len(body))
+    """
+    span = Span(name, parent=_current_span.get(), kind=kind)
+    span.attributes.update(attributes)
+    return span
+
+
+async def traced(name: str, coro, **attributes):
+    """Выполнение корутины внутри отдельного спана (для asyncio.gather)"""
+    with start_span(name, **attributes):
+        return await coro
+
+
+def record_exception(exc: BaseException):
+    """Запись перехваченного исключения в текущий спан"""
+    span = _current_span.get()
+    if span is not None:
+        span.record_exception(exc)
+
+
+def count_retry(retry_state):
+    """Callback для tenacity (before_sleep): учёт повторов в текущем спане"""
+    span = _current_span.get()
+    if span is not None:
+        span.incr("retry.count")
+
+
+class TraceCollector:
+    """
+    Корневой спан запроса + сбор его дочерних спанов для ?trace=1
+    """
+
+    def __init__(self, name: str, enabled: bool, **attributes):
+        self.enabled = enabled
+        self.root = start_span(name, **attributes)
+        self.spans: List[Span] = []
+
+    def __enter__(self):
+        if self.enabled:
+            exporter.start_collecting(self.root.trace_id)
+        self.root.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.root.__exit__(exc_type, exc, tb)
+        if self.enabled:
+            self.spans = exporter.stop_collecting(self.root.trace_id)
+        return False
+
+    def waterfall(self) -> Dict:
+        """
+        Тайминги всех спанов запроса относительно начала корневого
+
+        Returns:
+            Dict с trace_id и списком спанов (offset_ms, duration_ms, depth)
+        """
+        # Дочерние спаны могут завершиться после ответа (фоновые задачи)
+        spans = list(self.spans)
+        if self.root not in spans:
+            spans.append(self.root)
+        depth = {self.root.span_id: 0}
+        by_id = {span.span_id: span for span in spans}
+
+        def span_depth(span: Span) -> int:
+            if span.span_id not in depth:
+                parent = by_id.get(span.parent_span_id)
+                depth[span.span_id] = span_depth(parent) + 1 if parent else 1
+            return depth[span.span_id]
+
+        spans.sort(key=lambda span: span.start_ns)
+        return {
+            "trace_id": self.root.trace_id,
+            "total_ms": round(self.root.duration_ms, 1),
+            "spans": [
+                {
+                    "name": span.name,
+                    "span_id": span.span_id,
+                    "parent_span_id": span.parent_span_id or None,
+                    "depth": span_depth(span),
+                    "offset_ms": round((span.start_ns - self.root.start_ns) / 1e6, 1),
+                    "duration_ms": round(span.duration_ms, 1),
+                    "status": {STATUS_OK: "ok", STATUS_ERROR: "error"}.get(span.status_code, "unset"),
+                    "error": span.status_message or None,
+                    "attributes": span.attributes
+                }
+                for span in spans
+            ]
+        }
+
+
+def collect(name: str, enabled: bool = False, **attributes) -> TraceCollector:
+    """Корневой спан для обработки API запроса"""
+    return TraceCollector(name, enabled, **attributes)
+
+
+def recent_spans(limit: int = 100) -> List[Dict]:
+    """Последние завершённые спаны в формате OTLP/JSON"""
+    spans = list(exporter.recent)[-limit:]
+    return [span.to_otlp() for span in spans]
@@ -0,0 +1,121 @@
+"""
+Нормализация URL для сравнения и дедупликации результатов
+"""
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Параметры-метки трекинга, не влияющие на содержимое страницы
+_TRACKING_PARAMS = frozenset({
+    "fbclid", "gclid", "dclid", "gclsrc", "yclid", "msclkid", "igshid",
+    "mc_cid", "mc_eid", "_openstat", "ref_src", "ref_url", "spm",
+    "sa", "ved", "usg", "ei", "oq", "sclient",
+})
+_TRACKING_PREFIXES = ("utm_", "_hs", "pk_")
+
+# Обёртки-редиректы поисковиков и соцсетей: путь -> параметры с целевым URL
+# (google.*/url?q=, l.facebook.com/l.php?u=, vk.com/away.php?to=,
+# youtube.com/redirect?q=)
+_REDIRECT_WRAPPERS = {
+    "/url": ("q", "url"),
+    "/l.php": ("u",),
+    "/away.php": ("to",),
+    "/redirect": ("q", "url", "to"),
+}
+_MAX_UNWRAP = 3
+
+
+def _is_tracking(param: str) -> bool:
+    param = param.lower()
+    return param in _TRACKING_PARAMS or param.startswith(_TRACKING_PREFIXES)
+
+
+def unwrap_redirect(url: str) -> str:
+    """
+    Извлечение целевого URL из обёртки-редиректа
+
+    Работает и для относительных ссылок выдачи Google ("/url?q=...").
+    Вложенные обёртки раскрываются до _MAX_UNWRAP уровней.
+
+    Args:
+        url: исходный URL
+
+    Returns:
+        Целевой URL (или исходный, если это не обёртка)
+    """
+    for _ in range(_MAX_UNWRAP):
+        try:
+            parts = urlsplit(url)
+        except ValueError:
+            return url
+        names = _REDIRECT_WRAPPERS.get(parts.path.rstrip("/"))
+        if not names or not parts.query:
+            return url
+
+        params = dict(parse_qsl(parts.query))
+        target = next(
+            (params[name] for name in names
+             if params.get(name, "").startswith(("http://", "https://", "//"))),
+            None
+        )
+        if target is None:
+            return url
+        url = target
+    return url
+
+
+def normalize_url(url: str) -> str:
+    """
+    Каноническая форма URL
+
+    Обёртки-редиректы раскрываются, схема и хост приводятся к нижнему
+    регистру, удаляются порт по умолчанию, фрагмент, завершающий слэш пути
+    и трекинговые параметры (utm_*, fbclid, gclid...); остальные
+    параметры сортируются.
+
+    Args:
+        url: исходный URL
+
+    Returns:
+        Нормализованный URL (или исходная строка, если это не URL)
+    """
+    url = unwrap_redirect((url or "").strip())
+    if url.startswith("//"):
+        url = "https:" + url
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+    if not parts.scheme or not parts.netloc:
+        return url
+
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = host if port is None or port == _DEFAULT_PORTS.get(scheme) else f"{host}:{port}"
+    path = parts.path.rstrip("/")
+
+    query = parts.query
+    if query:
+        query = urlencode(sorted(
+            (key, value) for key, value in parse_qsl(query, keep_blank_values=True)
+            if not _is_tracking(key)
+        ))
+
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def url_host(url: str) -> Optional[str]:
+    """Хост URL в нижнем регистре без www. (None, если это не URL)"""
+    try:
+        host = urlsplit(url).hostname
+    except ValueError:
+        return None
+    if not host:
+        return None
+    return host[4:] if host.startswith("www.") else host
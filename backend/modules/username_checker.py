@@ -1,372 +1,54 @@
 """
 Модуль для глубокого поиска по username
 Интеграция: Maigret (реальная база 500+ сайтов) + socid-extractor
+
+Поиск выполняют движки modules.engines (maigret, sites);
+здесь - категоризация, сводка и сопоставление аватаров.
 """
-import asyncio
-import json
-import subprocess
-import tempfile
+import logging
 from typing import List, Dict, Optional
-import aiohttp
-from pathlib import Path
-
-
-class UsernameChecker:
-    """
-    Класс для глубокого поиска username через Maigret
-    Maigret - это улучшенная версия Sherlock с извлечением метаданных
-    """
-
-    def __init__(self):
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        # База расширенных сайтов для fallback (если maigret не сработает)
-        self.fallback_sites = self._load_fallback_sites()
-
-    def _load_fallback_sites(self) -> Dict:
-        """
-        Загрузка базы данных сайтов для fallback
-        Используется если maigret не работает
-        """
-        return {
-            "GitHub": {
-                "url": "https://github.com/{}",
-                "urlMain": "https://github.com/",
-                "errorType": "status_code",
-                "tags": ["coding", "tech"]
-            },
-            "Instagram": {
-                "url": "https://www.instagram.com/{}/",
-                "urlMain": "https://www.instagram.com/",
-                "errorType": "status_code",
-                "tags": ["social", "photo"]
-            },
-            "Twitter": {
-                "url": "https://twitter.com/{}",
-                "urlMain": "https://twitter.com/",
-                "errorType": "status_code",
-                "tags": ["social", "news"]
-            },
-            "Reddit": {
-                "url": "https://www.reddit.com/user/{}",
-                "urlMain": "https://www.reddit.com/",
-                "errorType": "status_code",
-                "tags": ["social", "forum"]
-            },
-            "Medium": {
-                "url": "https://medium.com/@{}",
-                "urlMain": "https://medium.com/",
-                "errorType": "status_code",
-                "tags": ["blogging", "writing"]
-            },
-            "YouTube": {
-                "url": "https://www.youtube.com/@{}",
-                "urlMain": "https://www.youtube.com/",
-                "errorType": "status_code",
-                "tags": ["video", "social"]
-            },
-            "TikTok": {
-                "url": "https://www.tiktok.com/@{}",
-                "urlMain": "https://www.tiktok.com/",
-                "errorType": "status_code",
-                "tags": ["video", "social"]
-            },
-            "Telegram": {
-                "url": "https://t.me/{}",
-                "urlMain": "https://t.me/",
-                "errorType": "status_code",
-                "tags": ["messenger", "social"]
-            },
-            "VK": {
-                "url": "https://vk.com/{}",
-                "urlMain": "https://vk.com/",
-                "errorType": "status_code",
-                "tags": ["social", "russian"]
-            },
-            "Habr": {
-                "url": "https://habr.com/ru/users/{}",
-                "urlMain": "https://habr.com/",
-                "errorType": "status_code",
-                "tags": ["tech", "russian", "blogging"]
-            },
-            "Behance": {
-                "url": "https://www.behance.net/{}",
-                "urlMain": "https://www.behance.net/",
-                "errorType": "status_code",
-                "tags": ["design", "portfolio"]
-            },
-            "Dribbble": {
-                "url": "https://dribbble.com/{}",
-                "urlMain": "https://dribbble.com/",
-                "errorType": "status_code",
-                "tags": ["design", "portfolio"]
-            },
-            "LinkedIn": {
-                "url": "https://www.linkedin.com/in/{}",
-                "urlMain": "https://www.linkedin.com/",
-                "errorType": "status_code",
-                "tags": ["professional", "networking"]
-            },
-            "Twitch": {
-                "url": "https://www.twitch.tv/{}",
-                "urlMain": "https://www.twitch.tv/",
-                "errorType": "status_code",
-                "tags": ["gaming", "streaming"]
-            },
-            "Pinterest": {
-                "url": "https://www.pinterest.com/{}",
-                "urlMain": "https://www.pinterest.com/",
-                "errorType": "status_code",
-                "tags": ["photo", "social"]
-            },
-            "Tumblr": {
-                "url": "https://{}.tumblr.com",
-                "urlMain": "https://www.tumblr.com/",
-                "errorType": "status_code",
-                "tags": ["blogging", "social"]
-            }
-        }
-
-    async def search_with_maigret(self, username: str, max_sites: int = None) -> Optional[Dict]:
-        """
-        Поиск username через РЕАЛЬНУЮ библиотеку Maigret
-
-        Maigret имеет базу из 500+ сайтов и продвинутые методы проверки
-
-        Args:
-            username: username для поиска
-            max_sites: максимальное количество сайтов (None = все)
-
-        Returns:
-            Dict с результатами или None если maigret не работает
-        """
-        try:
-            # Формируем команду maigret
-            cmd = ['maigret', username, '--json', 'simple', '--timeout', '10']
-
-            # Если указано max_sites, используем топ сайты
-            if max_sites:
-                cmd.extend(['--top-sites', str(max_sites)])
-
-            # Запускаем maigret
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=120  # 2 минуты максимум
-            )
 
-            # Maigret сохраняет результаты в файл reports/report_{username}_simple.json
-            # Путь относительно backend/ директории (там где запускается сервер)
-            report_file = Path(__file__).parent.parent / 'reports' / f'report_{username}_simple.json'
+import config
+from modules.avatars import avatar_harvester
+from modules.engines import registry, fan_out, engine_report, CAPABILITY_USERNAME, STATUS_OK
+from modules.identity_graph import record_async, username_edges
+from modules.records import summarize_profiles
+from modules.single_flight import lookups
+from modules.username_variants import generate_candidates
 
-            if result.returncode == 0 and report_file.exists():
-                try:
-                    # Читаем JSON из файла
-                    with open(report_file, 'r', encoding='utf-8') as f:
-                        maigret_results = json.load(f)
 
-                    # Удаляем файл отчета после чтения
-                    try:
-                        report_file.unlink()
-                    except:
-                        pass
+logger = logging.getLogger(__name__)
 
-                    # Конвертируем результаты maigret в наш формат
-                    return await self._convert_maigret_results(username, maigret_results)
-                except (json.JSONDecodeError, IOError):
-                    pass
-
-            return None
-
-        except subprocess.TimeoutExpired:
-            return None
-        except FileNotFoundError:
-            # maigret не установлен
-            return None
-        except Exception as e:
-            return None
-
-    async def _convert_maigret_results(self, username: str, maigret_data: Dict) -> Dict:
-        """
-        Конвертирует результаты maigret в наш формат
-
-        Args:
-            username: username
-            maigret_data: данные от maigret
-
-        Returns:
-            Dict в нашем формате
-        """
-        results = []
-
-        # Maigret возвращает словарь с найденными сайтами
-        for site_name, site_data in maigret_data.items():
-            if isinstance(site_data, dict):
-                # Проверяем статус внутри объекта status
-                status_obj = site_data.get('status', {})
-                if isinstance(status_obj, dict) and status_obj.get('status') == 'Claimed':
-                    result = {
-                        "platform": site_name,
-                        "url": site_data.get('url_user', site_data.get('url', '')),
-                        "status": "found",
-                        "confidence": 0.95,
-                        "http_status": site_data.get('http_status', 200),
-                        "tags": status_obj.get('tags', site_data.get('site', {}).get('tags', []))
-                    }
-
-                    # Добавляем метаданные если есть
-                    if 'name' in site_data:
-                        result['full_name'] = site_data['name']
-                    if 'avatar_url' in site_data:
-                        result['avatar_url'] = site_data['avatar_url']
-                    if 'bio' in site_data or 'description' in site_data:
-                        result['bio'] = site_data.get('bio') or site_data.get('description')
-
-                    results.append(result)
-
-        # Категоризация результатов
-        categorized = self._categorize_results(results)
-
-        return {
-            "username": username,
-            "total_found": len(results),
-            "results": results,
-            "by_category": categorized,
-            "summary": self._generate_summary(results),
-            "method": "maigret_real"
-        }
-
-    async def check_username_on_site(
-        self,
-        username: str,
-        site_name: str,
-        site_data: Dict,
-        session: aiohttp.ClientSession
-    ) -> Optional[Dict]:
-        """
-        Проверка username на конкретном сайте (fallback метод)
-
-        Args:
-            username: username для поиска
-            site_name: название сайта
-            site_data: данные о сайте
-            session: aiohttp сессия
-
-        Returns:
-            Dict с результатами или None
-        """
-        url = site_data["url"].format(username)
 
-        try:
-            async with session.get(url, headers=self.headers, timeout=10, allow_redirects=True) as response:
-                if response.status == 200:
-                    # Пытаемся извлечь дополнительные данные
-                    html = await response.text()
-                    extracted_data = await self._extract_profile_data(html, site_name)
-
-                    return {
-                        "platform": site_name,
-                        "url": url,
-                        "status": "found",
-                        "confidence": 0.95,
-                        "http_status": response.status,
-                        "tags": site_data.get("tags", []),
-                        **extracted_data
-                    }
-                elif response.status == 404:
-                    return None
-                else:
-                    return {
-                        "platform": site_name,
-                        "url": url,
-                        "status": "uncertain",
-                        "confidence": 0.5,
-                        "http_status": response.status
-                    }
-        except asyncio.TimeoutError:
-            return None
-        except Exception as e:
-            return None
-
-    async def _extract_profile_data(self, html: str, site_name: str) -> Dict:
-        """
-        Извлечение данных профиля из HTML (упрощенная версия socid-extractor)
-
-        Args:
-            html: HTML страницы
-            site_name: название сайта
-
-        Returns:
-            Dict с извлеченными данными
-        """
-        from bs4 import BeautifulSoup
-
-        soup = BeautifulSoup(html, 'html.parser')
-        extracted = {}
-
-        try:
-            # Общая логика извлечения
-            # Полное имя
-            name_selectors = [
-                ('meta', {'property': 'og:title'}),
-                ('meta', {'name': 'twitter:title'}),
-                ('h1', {}),
-                ('span', {'class': 'ProfileHeaderCard-name'}),
-            ]
-
-            for tag, attrs in name_selectors:
-                element = soup.find(tag, attrs)
-                if element:
-                    extracted['full_name'] = element.get('content') or element.get_text(strip=True)
-                    break
-
-            # Аватар
-            avatar_selectors = [
-                ('meta', {'property': 'og:image'}),
-                ('img', {'class': 'avatar'}),
-                ('img', {'class': 'profile-pic'}),
-            ]
-
-            for tag, attrs in avatar_selectors:
-                element = soup.find(tag, attrs)
-                if element:
-                    extracted['avatar_url'] = element.get('content') or element.get('src')
-                    break
-
-            # Биография
-            bio_selectors = [
-                ('meta', {'property': 'og:description'}),
-                ('meta', {'name': 'description'}),
-                ('p', {'class': 'bio'}),
-            ]
-
-            for tag, attrs in bio_selectors:
-                element = soup.find(tag, attrs)
-                if element:
-                    extracted['bio'] = element.get('content') or element.get_text(strip=True)
-                    break
-
-        except Exception as e:
-            pass
+class UsernameChecker:
+    """
+    Класс для глубокого поиска username
 
-        return extracted
+    Основной движок - Maigret (улучшенная версия Sherlock с извлечением
+    метаданных), при его недоступности - проверка каталога сайтов
+    """
 
     async def search_username_comprehensive(
         self,
         username: str,
-        max_sites: Optional[int] = None
+        max_sites: Optional[int] = None,
+        harvest_avatars: bool = True,
+        variants: bool = False,
+        time_budget: Optional[float] = None
     ) -> Dict:
         """
         Полный поиск username по всем сайтам
 
         Сначала пытается использовать maigret (500+ сайтов),
-        потом fallback на ручную проверку (16 сайтов)
+        потом fallback на проверку каталога сайтов
 
         Args:
             username: username для поиска
             max_sites: максимальное количество сайтов
+            harvest_avatars: скачать аватары и сгруппировать совпадающие
+            variants: дополнительно проверить варианты username (john.doe -> johndoe...)
+            time_budget: секунд на поиск (вместо USERNAME_SEARCH_TIMEOUT); сайты
+                с ожидаемой задержкой больше бюджета не проверяются
 
         Returns:
             Dict с результатами
@@ -374,80 +56,148 @@ class UsernameChecker:
         if not username or len(username) < 2:
             return {"error": "Username слишком короткий", "results": []}
 
-        # Сначала пытаемся использовать реальный maigret
-        maigret_result = await self.search_with_maigret(username, max_sites)
-
-        if maigret_result:
-            return maigret_result
-
-        # Fallback на ручную проверку
-        sites_to_check = list(self.fallback_sites.items())
-        if max_sites:
-            sites_to_check = sites_to_check[:max_sites]
-
-        results = []
+        search = await fan_out(
+            CAPABILITY_USERNAME,
+            username,
+            deadline=time_budget or config.USERNAME_SEARCH_TIMEOUT,
+            max_sites=max_sites,
+            time_budget=time_budget
+        )
+        results = search["results"]
+        maigret_ok = search["engines"].get("maigret", {}).get("status") == STATUS_OK
+
+        by_category, summary = summarize_profiles(results)
+        response = {
+            "username": username,
+            "total_found": len(results),
+            "results": results,
+            "by_category": by_category,
+            "summary": summary,
+            "method": "maigret_real" if maigret_ok else "fallback",
+            "engines": engine_report(search["engines"])
+        }
+        if harvest_avatars:
+            await self._attach_avatar_clusters(username, response)
+        await record_async(username_edges(username, response))
 
-        async with aiohttp.ClientSession() as session:
-            tasks = [
-                self.check_username_on_site(username, site_name, site_data, session)
-                for site_name, site_data in sites_to_check
-            ]
+        if variants:
+            candidates = [c for c in generate_candidates(seed=username) if c != username.lower()]
+            response["variants"] = await self.search_variants(candidates, max_sites, time_budget)
+        return response
 
-            results_raw = await asyncio.gather(*tasks, return_exceptions=True)
+    async def search_variants(
+        self,
+        candidates: List[str],
+        max_sites: Optional[int] = None,
+        time_budget: Optional[float] = None
+    ) -> Dict:
+        """
+        Проверка вариантов username одним пакетом по каталогу сайтов
 
-            for result in results_raw:
-                if result and isinstance(result, dict):
-                    results.append(result)
+        Пакет идёт в классе bulk планировщика (fair_queue) и ограничен
+        дедлайном поиска.
 
-        # Категоризация результатов
-        categorized = self._categorize_results(results)
+        Args:
+            candidates: варианты username
+            max_sites: максимальное количество сайтов
+            time_budget: секунд на пакет (по умолчанию USERNAME_SEARCH_TIMEOUT)
 
-        return {
-            "username": username,
-            "total_found": len(results),
-            "results": results,
-            "by_category": categorized,
-            "summary": self._generate_summary(results),
-            "method": "fallback"
-        }
+        Returns:
+            Dict: candidates, found (вариант -> платформы), results,
+            probes (отправлено запросов), pruned (пропущено по regexCheck),
+            skipped (не проверено до дедлайна)
+        """
+        if not candidates:
+            return {"candidates": [], "found": {}, "results": [], "probes": 0, "pruned": {}, "skipped": 0}
 
-    def _categorize_results(self, results: List[Dict]) -> Dict:
-        """Категоризация результатов по типам платформ"""
-        categories = {}
+        batch = await registry.get("sites").probe_batch(
+            candidates, max_sites, config.USERNAME_VARIANT_CONCURRENCY,
+            deadline=time_budget or config.USERNAME_SEARCH_TIMEOUT
+        )
+        results = [r for r in batch["results"] if r.get("status") == "found"]
 
+        found: Dict[str, List[str]] = {}
         for result in results:
-            tags = result.get("tags", [])
-            for tag in tags:
-                if tag not in categories:
-                    categories[tag] = []
-                categories[tag].append(result["platform"])
-
-        return categories
+            found.setdefault(result["username"], []).append(result["platform"])
+        for candidate in found:
+            await record_async(username_edges(candidate, {
+                "results": [r for r in results if r["username"] == candidate]
+            }))
 
-    def _generate_summary(self, results: List[Dict]) -> Dict:
-        """Генерация сводки по результатам"""
         return {
-            "platforms_found": len(results),
-            "with_full_name": len([r for r in results if r.get("full_name")]),
-            "with_avatar": len([r for r in results if r.get("avatar_url")]),
-            "with_bio": len([r for r in results if r.get("bio")]),
-            "high_confidence": len([r for r in results if r.get("confidence", 0) >= 0.8])
+            "candidates": candidates,
+            "found": found,
+            "results": results,
+            "probes": batch["probes"],
+            "pruned": batch["pruned"],
+            "skipped": batch["skipped"]
         }
 
-
-async def check_username_full(username: str, max_sites: int = 20) -> Dict:
+    async def _attach_avatar_clusters(self, username: str, response: Dict):
+        """Загрузка аватаров найденных профилей и поиск совпадающих между платформами"""
+        try:
+            clusters = await avatar_harvester.harvest(response["results"], username)
+        except Exception as e:
+            logger.warning("Ошибка обработки аватаров для %s: %s", username, e)
+            clusters = []
+        response["avatar_clusters"] = clusters
+        response["summary"]["avatar_clusters"] = len(clusters)
+
+
+async def check_username_full(
+    username: str,
+    max_sites: int = 20,
+    harvest_avatars: bool = config.AVATAR_HARVEST,
+    variants: bool = False,
+    time_budget: Optional[float] = None
+) -> Dict:
     """
     Главная функция для полного поиска по username
 
     Использует реальный Maigret если доступен (500+ сайтов),
-    иначе fallback на ручную проверку (16 сайтов)
+    иначе fallback на проверку каталога сайтов. Одновременные
+    одинаковые поиски выполняются один раз (single_flight).
 
     Args:
         username: username для поиска
         max_sites: максимальное количество сайтов
+        harvest_avatars: скачать аватары и сгруппировать совпадающие
+        variants: дополнительно проверить варианты username
+        time_budget: секунд на поиск (None - USERNAME_SEARCH_TIMEOUT)
 
     Returns:
         Dict с полными результатами
     """
-    checker = UsernameChecker()
-    return await checker.search_username_comprehensive(username, max_sites)
+    # Регистр не приводим: на части сайтов username чувствителен к регистру
+    return await lookups.do(
+        ("username", username, max_sites, harvest_avatars, variants, time_budget),
+        lambda: UsernameChecker().search_username_comprehensive(
+            username, max_sites, harvest_avatars, variants, time_budget
+        )
+    )
+
+
+async def check_username_variants(
+    name: Optional[str] = None,
+    email: Optional[str] = None,
+    seed: Optional[str] = None,
+    years: Optional[List[int]] = None,
+    max_sites: int = 20,
+    max_candidates: int = config.USERNAME_VARIANT_MAX_CANDIDATES
+) -> Dict:
+    """
+    Поиск аккаунтов по вариантам username из имени, email или исходного username
+
+    Args:
+        name: имя и фамилия
+        email: email (берётся локальная часть)
+        seed: известный username
+        years: годы для суффиксов (год рождения)
+        max_sites: максимальное количество сайтов
+        max_candidates: максимум вариантов
+
+    Returns:
+        Dict с кандидатами и найденными аккаунтами
+    """
+    candidates = generate_candidates(name, email, seed, years or (), max_candidates)
+    return await UsernameChecker().search_variants(candidates, max_sites)
@@ -0,0 +1,119 @@
+"""
+Генератор вариантов username (john.doe, johndoe, john_doe, jdoe1990...)
+
+Кандидаты строятся из имени (кириллица транслитерируется), локальной
+части email или исходного username и упорядочены от самых частых
+шаблонов к редким. Проверка на сайтах - SiteProbeEngine.probe_batch.
+"""
+import re
+from typing import Iterable, List, Optional
+
+
+SEPARATORS = ("", ".", "_", "-")
+
+# Общий фильтр: символы, допустимые хотя бы на части платформ
+_VALID = re.compile(r"^[a-z0-9][a-z0-9._-]{1,38}[a-z0-9]$")
+
+_TRANSLIT = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e",
+    "ж": "zh", "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m",
+    "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+    "ф": "f", "х": "kh", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "shch",
+    "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+}
+
+
+def transliterate(text: str) -> str:
+    """Транслитерация кириллицы в латиницу (Иван -> ivan)"""
+    return "".join(_TRANSLIT.get(char, char) for char in text.lower())
+
+
+def _tokens(text: str) -> List[str]:
+    return [token for token in re.split(r"[^a-z0-9]+", transliterate(text)) if token]
+
+
+def _split_digits(token: str):
+    """jdoe1990 -> ("jdoe", "1990")"""
+    match = re.match(r"^(.*?)(\d+)$", token)
+    return (match.group(1), match.group(2)) if match else (token, "")
+
+
+def _name_patterns(first: str, last: str) -> List[str]:
+    """Шаблоны из имени и фамилии в порядке распространённости"""
+    patterns = []
+    for sep in SEPARATORS:
+        patterns.append(f"{first}{sep}{last}")
+    patterns += [f"{first[0]}{last}", f"{first[0]}.{last}", f"{first}{last[0]}"]
+    for sep in SEPARATORS:
+        patterns.append(f"{last}{sep}{first}")
+    patterns += [f"{last}{first[0]}", f"{first[0]}_{last}", first, last]
+    return patterns
+
+
+def generate_candidates(
+    name: Optional[str] = None,
+    email: Optional[str] = None,
+    seed: Optional[str] = None,
+    years: Iterable[int] = (),
+    max_candidates: int = 50
+) -> List[str]:
+    """
+    Варианты username из имени, email и/или исходного username
+
+    Args:
+        name: имя и фамилия ("Иван Петров", "John Doe")
+        email: email (используется локальная часть без +метки)
+        seed: известный username
+        years: годы (рождения) для суффиксов 1990 / 90
+        max_candidates: максимум кандидатов
+
+    Returns:
+        List уникальных кандидатов в нижнем регистре
+    """
+    bases: List[str] = []
+    suffixes = [str(year) for year in years]
+
+    sources = []
+    if seed:
+        sources.append(seed)
+    if email and "@" in email:
+        sources.append(email.split("@", 1)[0].split("+", 1)[0])
+
+    for source in sources:
+        source = transliterate(source.strip())
+        stem, digits = _split_digits(source)
+        if digits:
+            suffixes.append(digits)
+        bases.append(source)
+        parts = _tokens(stem)
+        if len(parts) >= 2:
+            bases += _name_patterns(parts[0], parts[-1])
+        elif parts:
+            bases.append(parts[0])
+
+    if name:
+        parts = [_split_digits(token)[0] for token in _tokens(name)]
+        parts = [part for part in parts if part]
+        if len(parts) >= 2:
+            bases += _name_patterns(parts[0], parts[-1])
+        elif parts:
+            bases.append(parts[0])
+
+    # Годы: полный и двузначный суффикс (слитно и через _) для самых частых шаблонов
+    year_suffixes = []
+    for suffix in suffixes:
+        year_suffixes.append(suffix)
+        if len(suffix) == 4:
+            year_suffixes.append(suffix[2:])
+    candidates = list(bases)
+    for base in dict.fromkeys(_split_digits(base)[0] for base in bases[:6]):
+        for suffix in dict.fromkeys(year_suffixes):
+            candidates += [f"{base}{suffix}", f"{base}_{suffix}"]
+
+    unique = []
+    for candidate in dict.fromkeys(candidates):
+        if _VALID.match(candidate):
+            unique.append(candidate)
+            if len(unique) >= max_candidates:
+                break
+    return unique
@@ -0,0 +1,489 @@
+"""
+Мониторинг целей: инкрементальная перепроверка username и email
+
+Для каждой цели хранится последнее известное состояние по единицам
+проверки (unit): для username - по сайту каталога, для email - hibp
+(список утечек) и registrations (сайты с регистрацией). Планировщик
+раз в WATCH_TICK_SECONDS берёт только просроченные единицы (next_check),
+перепроверяет их и записывает изменения как события:
+account_added / account_removed, breach_added,
+registration_added / registration_removed.
+
+Дешевле полного скана за счёт того, что:
+- проверяются только просроченные единицы, сроки размазаны jitter'ом
+- запросы условные (ETag / If-Modified-Since), 304 - без тела и разбора
+- сайты, не допускающие username (regexCheck), не проверяются вовсе
+- первая проверка единицы задаёт базовое состояние без событий
+"""
+import asyncio
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import aiohttp
+
+import config
+from modules import metrics, tracing
+from modules.engines import registry, EngineError
+from modules.engines.sites import SITE_CATALOG
+from modules.http_client import get_session
+from modules.identity_graph import record_async
+from modules.registration import check_registrations
+
+
+logger = logging.getLogger(__name__)
+
+KIND_USERNAME = "username"
+KIND_EMAIL = "email"
+KINDS = (KIND_USERNAME, KIND_EMAIL)
+
+UNIT_HIBP = "hibp"
+UNIT_REGISTRATIONS = "registrations"
+
+STATE_PRESENT = "present"
+STATE_ABSENT = "absent"
+
+
+class WatchStore:
+    """
+    SQLite хранилище целей, состояний единиц проверки и событий
+
+    Методы синхронные и потокобезопасные (вызываются через asyncio.to_thread).
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    def _open(self):
+        if self._db is not None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(str(self.path), check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript("""
+            CREATE TABLE IF NOT EXISTS watch_targets (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                interval REAL NOT NULL,
+                created_at REAL NOT NULL,
+                UNIQUE (kind, value)
+            );
+            CREATE TABLE IF NOT EXISTS watch_units (
+                target_id INTEGER NOT NULL,
+                unit TEXT NOT NULL,
+                state TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                checked_at REAL,
+                next_check REAL NOT NULL,
+                failures INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (target_id, unit)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_watch_units_due ON watch_units(next_check);
+            CREATE TABLE IF NOT EXISTS watch_events (
+                id INTEGER PRIMARY KEY,
+                target_id INTEGER NOT NULL,
+                event TEXT NOT NULL,
+                unit TEXT NOT NULL,
+                detail TEXT,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_watch_events_target ON watch_events(target_id, id);
+        """)
+        db.commit()
+        self._db = db
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def add_target(self, kind: str, value: str, interval: float, units: List[str]) -> int:
+        """Добавление цели (повторное - обновляет интервал и добавляет новые единицы)"""
+        with self._lock:
+            self._open()
+            with self._db:
+                self._db.execute("""
+                    INSERT INTO watch_targets (kind, value, interval, created_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (kind, value) DO UPDATE SET interval = excluded.interval
+                """, (kind, value, interval, time.time()))
+                target_id = self._db.execute(
+                    "SELECT id FROM watch_targets WHERE kind = ? AND value = ?", (kind, value)
+                ).fetchone()[0]
+                # next_check = 0: первая проверка - при ближайшем тике
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO watch_units (target_id, unit, next_check) VALUES (?, ?, 0)",
+                    [(target_id, unit) for unit in units]
+                )
+            return target_id
+
+    def remove_target(self, target_id: int) -> bool:
+        with self._lock:
+            self._open()
+            with self._db:
+                deleted = self._db.execute("DELETE FROM watch_targets WHERE id = ?", (target_id,)).rowcount
+                self._db.execute("DELETE FROM watch_units WHERE target_id = ?", (target_id,))
+                self._db.execute("DELETE FROM watch_events WHERE target_id = ?", (target_id,))
+            return bool(deleted)
+
+    def targets(self) -> List[Dict]:
+        with self._lock:
+            self._open()
+            rows = self._db.execute("""
+                SELECT t.id, t.kind, t.value, t.interval, t.created_at,
+                       COUNT(u.unit),
+                       SUM(u.state = ?),
+                       MAX(u.checked_at),
+                       MIN(u.next_check)
+                FROM watch_targets t LEFT JOIN watch_units u ON u.target_id = t.id
+                GROUP BY t.id ORDER BY t.id
+            """, (STATE_PRESENT,)).fetchall()
+        return [
+            {
+                "id": row[0], "kind": row[1], "value": row[2], "interval": row[3],
+                "created_at": row[4], "units": row[5], "present": row[6] or 0,
+                "last_checked": row[7], "next_check": row[8]
+            }
+            for row in rows
+        ]
+
+    def due_units(self, now: float, limit: int) -> List[Dict]:
+        """Просроченные единицы проверки (самые старые первыми)"""
+        with self._lock:
+            self._open()
+            rows = self._db.execute("""
+                SELECT u.target_id, t.kind, t.value, t.interval, u.unit, u.state,
+                       u.etag, u.last_modified, u.failures
+                FROM watch_units u JOIN watch_targets t ON t.id = u.target_id
+                WHERE u.next_check <= ?
+                ORDER BY u.next_check
+                LIMIT ?
+            """, (now, limit)).fetchall()
+        keys = ("target_id", "kind", "value", "interval", "unit", "state", "etag", "last_modified", "failures")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def apply(self, updates: List[Dict], events: List[Dict]) -> List[Dict]:
+        """
+        Запись результатов тика одной транзакцией
+
+        Returns:
+            События с присвоенными id
+        """
+        now = time.time()
+        with self._lock:
+            self._open()
+            with self._db:
+                self._db.executemany("""
+                    UPDATE watch_units
+                    SET state = ?, etag = ?, last_modified = ?, checked_at = ?, next_check = ?, failures = ?
+                    WHERE target_id = ? AND unit = ?
+                """, [
+                    (u["state"], u["etag"], u["last_modified"], u["checked_at"], u["next_check"],
+                     u["failures"], u["target_id"], u["unit"])
+                    for u in updates if not u.get("drop")
+                ])
+                self._db.executemany(
+                    "DELETE FROM watch_units WHERE target_id = ? AND unit = ?",
+                    [(u["target_id"], u["unit"]) for u in updates if u.get("drop")]
+                )
+                stored = []
+                for event in events:
+                    cursor = self._db.execute(
+                        "INSERT INTO watch_events (target_id, event, unit, detail, created_at) VALUES (?, ?, ?, ?, ?)",
+                        (event["target_id"], event["event"], event["unit"],
+                         json.dumps(event.get("detail", {}), ensure_ascii=False), now)
+                    )
+                    stored.append({**event, "id": cursor.lastrowid, "created_at": now})
+            return stored
+
+    def events(self, since_id: int = 0, target_id: Optional[int] = None, limit: int = 100) -> List[Dict]:
+        query = """
+            SELECT e.id, e.target_id, t.kind, t.value, e.event, e.unit, e.detail, e.created_at
+            FROM watch_events e JOIN watch_targets t ON t.id = e.target_id
+            WHERE e.id > ?
+        """
+        params: list = [since_id]
+        if target_id is not None:
+            query += " AND e.target_id = ?"
+            params.append(target_id)
+        query += " ORDER BY e.id LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            self._open()
+            rows = self._db.execute(query, params).fetchall()
+        return [
+            {
+                "id": row[0], "target_id": row[1], "kind": row[2], "value": row[3],
+                "event": row[4], "unit": row[5], "detail": json.loads(row[6] or "{}"),
+                "created_at": row[7]
+            }
+            for row in rows
+        ]
+
+
+class Watcher:
+    """
+    Планировщик перепроверок
+
+    Args:
+        store: хранилище
+        interval: интервал перепроверки по умолчанию (секунды)
+        jitter: разброс сроков (доля интервала), чтобы проверки не шли волной
+        retry_interval: повтор после ошибки или неопределённого ответа
+        batch_size: единиц проверки за тик
+        concurrency: одновременных проверок
+        webhook_url: куда POST'ить новые события (пусто - не отправлять)
+    """
+
+    def __init__(
+        self,
+        store: WatchStore,
+        interval: float = 86400,
+        jitter: float = 0.1,
+        retry_interval: float = 1800,
+        batch_size: int = 1000,
+        concurrency: int = 20,
+        webhook_url: str = ""
+    ):
+        self.store = store
+        self.interval = interval
+        self.jitter = jitter
+        self.retry_interval = retry_interval
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.webhook_url = webhook_url
+        self._wake: Optional[asyncio.Event] = None
+        self._tick_lock: Optional[asyncio.Lock] = None
+
+    # ---------- цели
+
+    def units_for(self, kind: str, value: str) -> List[str]:
+        """Единицы проверки цели (сайты, которые допускают этот username)"""
+        if kind == KIND_EMAIL:
+            return [UNIT_HIBP, UNIT_REGISTRATIONS]
+        sites = registry.get("sites")
+        return [name for name in SITE_CATALOG if sites.accepts(name, value)]
+
+    async def add(self, kind: str, value: str, interval: Optional[float] = None) -> int:
+        if kind not in KINDS:
+            raise ValueError(f"kind должен быть одним из: {', '.join(KINDS)}")
+        # Email - без регистра; username - как есть: на части сайтов регистр
+        # различается, и JohnDoe/johndoe - разные цели (UNIQUE (kind, value))
+        value = value.strip()
+        if kind == KIND_EMAIL:
+            value = value.lower()
+        target_id = await asyncio.to_thread(
+            self.store.add_target, kind, value, interval or self.interval, self.units_for(kind, value)
+        )
+        self.wake()
+        return target_id
+
+    def wake(self):
+        """Внеочередной тик (например, для базовой проверки новой цели)"""
+        if self._wake is not None:
+            self._wake.set()
+
+    # ---------- планировщик
+
+    async def run(self, tick_seconds: float):
+        """Фоновый цикл: тик раз в tick_seconds или по wake()"""
+        self._wake = asyncio.Event()
+        while True:
+            try:
+                stats = await self.tick()
+                if stats["checked"] >= self.batch_size:
+                    continue  # просроченных больше, чем влезло в тик - продолжаем сразу
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Ошибка тика мониторинга: %s", e)
+            try:
+                await asyncio.wait_for(self._wake.wait(), tick_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def _next_check(self, now: float, interval: float) -> float:
+        return now + interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    async def tick(self) -> Dict:
+        """
+        Перепроверка просроченных единиц
+
+        Returns:
+            Dict: checked, not_modified, errors, events
+        """
+        if self._tick_lock is None:
+            self._tick_lock = asyncio.Lock()
+        async with self._tick_lock:
+            now = time.time()
+            due = await asyncio.to_thread(self.store.due_units, now, self.batch_size)
+            if not due:
+                return {"checked": 0, "not_modified": 0, "errors": 0, "events": 0}
+
+            session = await get_session()
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def run(unit: Dict):
+                async with semaphore:
+                    try:
+                        return await self._check(unit, session)
+                    except Exception as e:
+                        # Ошибка одной единицы не должна срывать тик: остальные
+                        # сохраняются, эта повторяется с отсрочкой
+                        logger.warning("Ошибка проверки %s/%s: %s", unit["kind"], unit["unit"], e)
+                        return {"status": "error", "error": str(e) or type(e).__name__}
+
+            with tracing.start_span("watch.tick", units=len(due)):
+                outcomes = await asyncio.gather(*[run(unit) for unit in due])
+
+            updates, events = [], []
+            stats = {"checked": len(due), "not_modified": 0, "errors": 0}
+            for unit, outcome in zip(due, outcomes):
+                update, unit_events = self._diff(unit, outcome, now)
+                updates.append(update)
+                events += unit_events
+                if unit["etag"] or unit["last_modified"]:
+                    # Условный запрос: not_modified - прошлое состояние осталось верным
+                    metrics.record_cache(f"watch_{unit['kind']}", hit=outcome["status"] == "not_modified")
+                if outcome["status"] == "not_modified":
+                    stats["not_modified"] += 1
+                elif outcome["status"] == "error":
+                    stats["errors"] += 1
+
+            stored = await asyncio.to_thread(self.store.apply, updates, events)
+            stats["events"] = len(stored)
+            if stored:
+                await self._publish(stored)
+            return stats
+
+    async def _check(self, unit: Dict, session: aiohttp.ClientSession) -> Dict:
+        """Проверка одной единицы: {"status": found|not_found|not_modified|error|..., "state"?}"""
+        validators = {"etag": unit["etag"], "last_modified": unit["last_modified"]}
+
+        if unit["kind"] == KIND_USERNAME:
+            site_data = SITE_CATALOG.get(unit["unit"])
+            if site_data is None:
+                return {"status": "removed"}
+            return await registry.get("sites").check(unit["value"], unit["unit"], site_data, session, **validators)
+
+        try:
+            if unit["unit"] == UNIT_HIBP:
+                payload = await registry.get("hibp").search(unit["value"], **validators)
+                if payload.get("not_modified"):
+                    return {"status": "not_modified"}
+                return {
+                    "status": "found",
+                    "items": {b["name"]: b for b in payload.get("breaches", [])},
+                    "etag": payload.get("etag"),
+                    "last_modified": payload.get("last_modified")
+                }
+            if unit["unit"] == UNIT_REGISTRATIONS:
+                payload = await check_registrations(unit["value"], session=session)
+                return {"status": "found", "items": {s["site"]: {"site": s["site"]} for s in payload["sites"]}}
+        except (EngineError, asyncio.TimeoutError, aiohttp.ClientError) as e:
+            return {"status": "error", "error": str(e) or type(e).__name__}
+        return {"status": "removed"}
+
+    def _diff(self, unit: Dict, outcome: Dict, now: float):
+        """Новое состояние единицы и события относительно прошлого"""
+        update = {
+            "target_id": unit["target_id"], "unit": unit["unit"], "state": unit["state"],
+            "etag": unit["etag"], "last_modified": unit["last_modified"],
+            "checked_at": now, "failures": 0,
+            "next_check": self._next_check(now, unit["interval"])
+        }
+        status = outcome["status"]
+        if status == "removed":
+            return {**update, "drop": True}, []
+        if status == "not_modified":
+            return update, []
+        if status not in ("found", "not_found"):
+            # Неопределённый ответ - состояние не меняем, повторяем раньше
+            update["failures"] = unit["failures"] + 1
+            update["next_check"] = self._next_check(now, min(self.retry_interval, unit["interval"]))
+            return update, []
+
+        update["etag"] = outcome.get("etag")
+        update["last_modified"] = outcome.get("last_modified")
+        events = []
+        base = {"target_id": unit["target_id"], "kind": unit["kind"], "value": unit["value"], "unit": unit["unit"]}
+
+        if unit["kind"] == KIND_USERNAME:
+            state = STATE_PRESENT if status == "found" else STATE_ABSENT
+            update["state"] = state
+            if unit["state"] is not None and state != unit["state"]:
+                url = SITE_CATALOG[unit["unit"]]["url"].format(unit["value"])
+                events.append({
+                    **base,
+                    "event": "account_added" if state == STATE_PRESENT else "account_removed",
+                    "detail": {"site": unit["unit"], "url": url}
+                })
+            return update, events
+
+        items = outcome.get("items", {})
+        update["state"] = json.dumps(sorted(items), ensure_ascii=False)
+        if unit["state"] is None:
+            return update, events
+
+        previous = set(json.loads(unit["state"]))
+        if unit["unit"] == UNIT_HIBP:
+            events += [
+                {**base, "event": "breach_added", "detail": items[name]}
+                for name in sorted(set(items) - previous)
+            ]
+        else:
+            events += [
+                {**base, "event": "registration_added", "detail": {"site": name}}
+                for name in sorted(set(items) - previous)
+            ]
+            events += [
+                {**base, "event": "registration_removed", "detail": {"site": name}}
+                for name in sorted(previous - set(items))
+            ]
+        return update, events
+
+    async def _publish(self, events: List[Dict]):
+        """Новые аккаунты - в граф идентичностей, события - в webhook"""
+        await record_async([
+            ((KIND_USERNAME, e["value"]), ("url", e["detail"]["url"]), "account", "sites", 0.95)
+            for e in events if e["event"] == "account_added"
+        ])
+
+        if not self.webhook_url:
+            return
+        try:
+            session = await get_session()
+            async with session.post(
+                self.webhook_url,
+                json={"events": events},
+                timeout=aiohttp.ClientTimeout(total=10)
+            ) as response:
+                if response.status >= 400:
+                    logger.warning("Webhook мониторинга вернул %s", response.status)
+        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+            logger.warning("Не удалось отправить события мониторинга: %s", e)
+
+
+watch_store = WatchStore(config.WATCH_DB_PATH)
+
+watcher = Watcher(
+    store=watch_store,
+    interval=config.WATCH_INTERVAL_HOURS * 3600,
+    jitter=config.WATCH_JITTER,
+    retry_interval=config.WATCH_RETRY_MINUTES * 60,
+    batch_size=config.WATCH_BATCH_SIZE,
+    concurrency=config.WATCH_CONCURRENCY,
+    webhook_url=config.WATCH_WEBHOOK_URL
+)
@@ -0,0 +1,256 @@
+"""
+WebSocket сессия расследования: много поисков по одному соединению
+
+Протокол (JSON сообщения):
+
+клиент -> сервер
+    {"type": "lookup", "id": "r1", "kind": "email|username|photo", "value": "...",
+     "options": {...}}
+        для photo value - изображение в base64, options.filename - имя файла
+    {"type": "cancel", "id": "r1"}
+
+сервер -> клиент
+    {"type": "accepted", "id"}                   поиск принят (может ждать очереди)
+    {"type": "started", "id"}                    поиск запущен
+    {"type": "partial", "id", "engine", "outcome"}  исход одного движка
+    {"type": "result", "id", "data", "processing_time"}
+    {"type": "cancelled", "id"}
+    {"type": "error", "id", "detail", ["retry_after"]}
+
+Управление потоком:
+- на соединение одновременно идут не больше WS_MAX_CONCURRENT поисков,
+  остальные ждут; принятых (в работе и в ожидании) - не больше
+  WS_MAX_LOOKUPS, сверх этого lookup сразу получает error
+- исходящие сообщения идут через очередь на WS_SEND_QUEUE сообщений:
+  если клиент не успевает читать, поиски приостанавливаются на отправке
+  частичных результатов, а не копят их в памяти
+- каждый поиск проходит контроль допуска fair_queue как interactive
+  запрос клиента (API ключ из X-API-Key или ?api_key=, иначе IP)
+"""
+import asyncio
+import base64
+import binascii
+import io
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+import config
+from modules import metrics
+from modules.email_checker import check_email_comprehensive
+from modules.engines.scheduler import engine_listener
+from modules.fair_queue import PRIORITY_INTERACTIVE, Overloaded, current_client, get_scheduler
+from modules.photo_search import search_by_photo_advanced
+from modules.responses import dumps
+from modules.temp_storage import StorageFull, temp_storage
+from modules.username_checker import check_username_full
+
+
+logger = logging.getLogger(__name__)
+
+SESSIONS = metrics.REGISTRY.register(metrics.Gauge(
+    "osint_ws_sessions",
+    "Open WebSocket investigation sessions"
+))
+LOOKUPS = metrics.REGISTRY.register(metrics.Counter(
+    "osint_ws_lookups_total",
+    "Lookups over WebSocket sessions by outcome",
+    ("kind", "outcome")
+))
+
+KINDS = ("email", "username", "photo")
+
+
+class InvalidLookup(Exception):
+    """Некорректный lookup (сообщается клиенту как error)"""
+
+
+async def _email(value: str, options: Dict) -> Dict:
+    return await check_email_comprehensive(value)
+
+
+async def _username(value: str, options: Dict) -> Dict:
+    max_sites = int(options.get("max_sites") or 20)
+    time_budget = float(options["time_budget"]) if options.get("time_budget") else None
+    return await check_username_full(
+        value, max_sites, variants=bool(options.get("variants")), time_budget=time_budget
+    )
+
+
+async def _photo(value: str, options: Dict) -> Dict:
+    filename = str(options.get("filename") or "upload.jpg")
+    if os.path.splitext(filename)[1].lower().lstrip(".") not in config.ALLOWED_EXTENSIONS:
+        raise InvalidLookup("Недопустимый формат файла")
+    try:
+        image = base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError):
+        raise InvalidLookup("value должен быть изображением в base64")
+    if len(image) > config.MAX_UPLOAD_SIZE:
+        raise InvalidLookup("Файл слишком большой")
+
+    path = await asyncio.to_thread(temp_storage.save, io.BytesIO(image), filename)
+    try:
+        result = await search_by_photo_advanced(path, rerank=bool(options.get("rerank", True)) and config.RERANK_ENABLED)
+    finally:
+        await asyncio.to_thread(temp_storage.release, path)
+    if not options.get("all_results", True):
+        result.pop("all_results", None)
+    return result
+
+
+HANDLERS: Dict[str, Callable[[str, Dict], Awaitable[Dict]]] = {
+    "email": _email,
+    "username": _username,
+    "photo": _photo,
+}
+
+
+class InvestigationSession:
+    """
+    Поиски одного WebSocket соединения
+
+    Args:
+        websocket: принятое соединение
+        client: клиент для fair_queue (fair_queue.client_id)
+    """
+
+    def __init__(self, websocket: WebSocket, client: str):
+        self.websocket = websocket
+        self.client = client
+        self.lookups: Dict[str, asyncio.Task] = {}
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=config.WS_SEND_QUEUE)
+        self.running = asyncio.Semaphore(config.WS_MAX_CONCURRENT)
+        self.closed = False  # отправка не удалась - соединения нет
+
+    async def run(self):
+        """Чтение сообщений до закрытия соединения; поиски закрытой сессии отменяются"""
+        SESSIONS.inc()
+        writer = asyncio.ensure_future(self._writer())
+        try:
+            while not self.closed:
+                try:
+                    message = await self.websocket.receive_json()
+                except WebSocketDisconnect:
+                    break
+                except ValueError:
+                    await self.send({"type": "error", "id": None, "detail": "Ожидается JSON сообщение"})
+                    continue
+                await self._dispatch(message)
+        finally:
+            tasks = list(self.lookups.values())
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            writer.cancel()
+            await asyncio.gather(writer, return_exceptions=True)
+            SESSIONS.dec()
+
+    async def send(self, message: Dict):
+        """Сообщение клиенту; ждёт, если очередь отправки заполнена (после закрытия - ничего)"""
+        if self.closed:
+            return
+        # Сериализуем сразу: записи результатов могут меняться после отправки
+        await self.outbox.put(dumps(message).decode("utf-8"))
+
+    async def _writer(self):
+        while True:
+            text = await self.outbox.get()
+            try:
+                await self.websocket.send_text(text)
+            except (WebSocketDisconnect, RuntimeError):
+                break
+        # Соединение закрыто: новые send() ничего не делают, а уже ждущие места
+        # в очереди освобождаются - иначе run() завис бы в send() и не отменил поиски
+        self.closed = True
+        while True:
+            await self.outbox.get()
+
+    async def _dispatch(self, message: Dict):
+        if not isinstance(message, dict):
+            await self.send({"type": "error", "id": None, "detail": "Ожидается JSON объект"})
+            return
+        request_id = message.get("id")
+        kind = message.get("type")
+
+        if kind == "cancel":
+            task = self.lookups.get(request_id)
+            if task is None or task.done():
+                await self.send({"type": "error", "id": request_id, "detail": "Нет такого поиска"})
+                return
+            # Ответ отсюда, а не из задачи: поиск мог ещё не начаться
+            task.cancel()
+            await self.send({"type": "cancelled", "id": request_id})
+            return
+
+        if kind != "lookup":
+            await self.send({"type": "error", "id": request_id, "detail": f"Неизвестный тип сообщения {kind}"})
+            return
+        if not isinstance(request_id, str) or not request_id:
+            await self.send({"type": "error", "id": request_id, "detail": "Нужен строковый id"})
+            return
+        if request_id in self.lookups:
+            await self.send({"type": "error", "id": request_id, "detail": "Поиск с таким id уже идёт"})
+            return
+        if message.get("kind") not in HANDLERS or not isinstance(message.get("value"), str):
+            await self.send({
+                "type": "error", "id": request_id,
+                "detail": f"kind должен быть одним из: {', '.join(KINDS)}, value - строкой"
+            })
+            return
+        if len(self.lookups) >= config.WS_MAX_LOOKUPS:
+            await self.send({
+                "type": "error", "id": request_id,
+                "detail": f"Не больше {config.WS_MAX_LOOKUPS} поисков на соединение"
+            })
+            return
+
+        options = message.get("options") if isinstance(message.get("options"), dict) else {}
+        await self.send({"type": "accepted", "id": request_id})
+        kind = message["kind"]
+        task = asyncio.ensure_future(self._lookup(request_id, kind, message["value"], options))
+        self.lookups[request_id] = task
+        task.add_done_callback(lambda done: self._finished(request_id, kind, done))
+
+    def _finished(self, request_id: str, kind: str, task: asyncio.Task):
+        self.lookups.pop(request_id, None)
+        # Отменённый до старта поиск не выполнил ни строчки - считаем здесь
+        LOOKUPS.inc(kind, "cancelled" if task.cancelled() else task.result())
+
+    async def _lookup(self, request_id: str, kind: str, value: str, options: Dict) -> str:
+        """Выполнение поиска; возвращает исход для метрики (ok, error, rejected)"""
+        try:
+            async with self.running:
+                scheduler = get_scheduler()
+                try:
+                    scheduler.admit(self.client, PRIORITY_INTERACTIVE)
+                except Overloaded as e:
+                    await self.send({"type": "error", "id": request_id, "detail": str(e), "retry_after": e.retry_after})
+                    return "rejected"
+
+                async def partial(engine: str, engine_outcome: Dict):
+                    await self.send({"type": "partial", "id": request_id, "engine": engine, "outcome": engine_outcome})
+
+                # Контекст задачи поиска: клиент для планировщика и слушатель движков
+                current_client.set((self.client, PRIORITY_INTERACTIVE))
+                engine_listener.set(partial)
+                started = time.time()
+                try:
+                    await self.send({"type": "started", "id": request_id})
+                    result = await HANDLERS[kind](value, options)
+                finally:
+                    scheduler.finish_request(self.client, PRIORITY_INTERACTIVE)
+
+            await self.send({
+                "type": "result", "id": request_id, "data": result,
+                "processing_time": round(time.time() - started, 2)
+            })
+            return "ok"
+        except (InvalidLookup, StorageFull) as e:
+            await self.send({"type": "error", "id": request_id, "detail": str(e)})
+        except Exception as e:
+            logger.warning("WebSocket поиск %s (%s) не удался: %s", request_id, kind, e)
+            await self.send({"type": "error", "id": request_id, "detail": str(e) or type(e).__name__})
+        return "error"
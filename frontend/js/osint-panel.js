@@ -125,6 +125,55 @@ document.addEventListener('DOMContentLoaded', function() {
         photoPreview.classList.add('hidden');
     });
 
+    // ============================================
+    // WebSocket Lookups (HTTP fetch if unavailable)
+    // ============================================
+
+    const osintSocket = window.OsintSocket ? new OsintSocket() : null;
+    const activeLookups = {};  // tab -> lookup id; a new search on the tab cancels the previous one
+
+    // Returns {data, processing_time}, or null when the socket is unavailable (use fetch)
+    async function socketLookup(tab, kind, value, options = {}) {
+        if (!osintSocket || !osintSocket.available()) {
+            return null;
+        }
+        if (activeLookups[tab]) {
+            osintSocket.cancel(activeLookups[tab]);
+        }
+
+        const baseMessage = loadingMessage.textContent;
+        const engines = [];
+        const { id, promise } = osintSocket.lookup(kind, value, options, {
+            onPartial: (engine, outcome) => {
+                engines.push(`${engine}: ${outcome.status}`);
+                loadingMessage.textContent = `${baseMessage} (${engines.join(', ')})`;
+            }
+        });
+        activeLookups[tab] = id;
+
+        try {
+            return await promise;
+        } catch (error) {
+            if (error.transport) {
+                return null;
+            }
+            throw error;
+        } finally {
+            if (activeLookups[tab] === id) {
+                delete activeLookups[tab];
+            }
+        }
+    }
+
+    function readAsBase64(file) {
+        return new Promise((resolve, reject) => {
+            const reader = new FileReader();
+            reader.onload = () => resolve(reader.result.split(',', 2)[1]);
+            reader.onerror = () => reject(reader.error);
+            reader.readAsDataURL(file);
+        });
+    }
+
     // ============================================
     // Search Functions
     // ============================================
@@ -146,6 +195,14 @@ document.addEventListener('DOMContentLoaded', function() {
         showLoading('Checking email breaches and registrations...');
 
         try {
+            const viaSocket = await socketLookup('email', 'email', email);
+            if (viaSocket) {
+                lastResult = { success: viaSocket.data.success !== false, email, ...viaSocket };
+                updateStats('email');
+                displayEmailResults(lastResult);
+                return;
+            }
+
             const response = await fetch('/api/osint/email', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
@@ -176,6 +233,9 @@ document.addEventListener('DOMContentLoaded', function() {
             updateStats('email');
             displayEmailResults(data);
         } catch (error) {
+            if (error.cancelled) {
+                return;
+            }
             showError('Failed to check email: ' + error.message);
         }
     }
@@ -193,6 +253,14 @@ document.addEventListener('DOMContentLoaded', function() {
         showLoading(`Searching ${maxSites} platforms for username...`);
 
         try {
+            const viaSocket = await socketLookup('username', 'username', username, { max_sites: maxSites });
+            if (viaSocket) {
+                lastResult = { success: true, username, ...viaSocket };
+                updateStats('username');
+                displayUsernameResults(lastResult);
+                return;
+            }
+
             const response = await fetch('/api/osint/username', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
@@ -222,6 +290,9 @@ document.addEventListener('DOMContentLoaded', function() {
             updateStats('username');
             displayUsernameResults(data);
         } catch (error) {
+            if (error.cancelled) {
+                return;
+            }
             showError('Failed to search username: ' + error.message);
         }
     }
@@ -235,11 +306,22 @@ document.addEventListener('DOMContentLoaded', function() {
 
         showLoading('Performing reverse image search on 3 engines...');
 
-        const formData = new FormData();
-        formData.append('file', file);
-
         try {
-            const response = await fetch('/api/osint/photo', {
+            const viaSocket = await socketLookup('photo', 'photo', await readAsBase64(file), {
+                filename: file.name,
+                all_results: false
+            });
+            if (viaSocket) {
+                lastResult = { success: true, filename: file.name, ...viaSocket };
+                updateStats('photo');
+                displayPhotoResults(lastResult);
+                return;
+            }
+
+            const formData = new FormData();
+            formData.append('file', file);
+
+            const response = await fetch('/api/osint/photo?all_results=0', {
                 method: 'POST',
                 body: formData
             });
@@ -263,6 +345,9 @@ document.addEventListener('DOMContentLoaded', function() {
             updateStats('photo');
             displayPhotoResults(data);
         } catch (error) {
+            if (error.cancelled) {
+                return;
+            }
             showError('Failed to search photo: ' + error.message);
         }
     }
@@ -652,6 +737,16 @@ document.addEventListener('DOMContentLoaded', function() {
                     <span class="w-2 h-2 bg-green-400 rounded-full mr-2 animate-pulse"></span>
                     API Online (v${data.version})
                 `;
+                document.getElementById('apiStatus').title = '';
+            } else if (data.status === 'degraded') {
+                // Часть upstream источников сейчас пропускается (circuit breaker)
+                const down = [...data.tripped_engines, ...Object.keys(data.sites.tripped)];
+                const statusEl = document.getElementById('apiStatus');
+                statusEl.innerHTML = `
+                    <span class="w-2 h-2 bg-yellow-400 rounded-full mr-2"></span>
+                    API Degraded (${down.length} down)
+                `;
+                statusEl.title = down.join(', ');
             }
         } catch (error) {
             document.getElementById('apiStatus').innerHTML = `
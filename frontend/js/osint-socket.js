@@ -0,0 +1,100 @@
+// OSINT WebSocket client: many lookups over one connection (/api/ws)
+// Protocol: backend/modules/ws_session.py
+class OsintSocket {
+    constructor(url) {
+        const scheme = location.protocol === 'https:' ? 'wss:' : 'ws:';
+        this.url = url || `${scheme}//${location.host}/api/ws`;
+        this.socket = null;
+        this.connecting = null;
+        this.pending = new Map();  // id -> {resolve, reject, onPartial, onStarted}
+        this.counter = 0;
+        this.failed = false;  // WebSocket недоступен (прокси и т.п.) - вызывающий идёт через fetch
+    }
+
+    available() {
+        return typeof WebSocket !== 'undefined' && !this.failed;
+    }
+
+    connect() {
+        if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+            return Promise.resolve(this.socket);
+        }
+        if (this.connecting) {
+            return this.connecting;
+        }
+        this.connecting = new Promise((resolve, reject) => {
+            const socket = new WebSocket(this.url);
+            let opened = false;
+
+            socket.onopen = () => {
+                opened = true;
+                this.socket = socket;
+                this.connecting = null;
+                resolve(socket);
+            };
+            socket.onmessage = event => this.handle(JSON.parse(event.data));
+            socket.onclose = () => {
+                this.socket = null;
+                this.connecting = null;
+                if (!opened) {
+                    this.failed = true;
+                    reject(Object.assign(new Error('WebSocket unavailable'), { transport: true }));
+                }
+                // Поиски закрытого соединения сервер отменил
+                for (const [id, lookup] of this.pending) {
+                    lookup.reject(Object.assign(new Error('Connection closed'), { transport: true }));
+                }
+                this.pending.clear();
+            };
+        });
+        return this.connecting;
+    }
+
+    handle(message) {
+        const lookup = this.pending.get(message.id);
+        if (!lookup) {
+            if (message.type === 'error') {
+                console.warn('OSINT socket error:', message.detail);
+            }
+            return;
+        }
+        switch (message.type) {
+            case 'started':
+                lookup.onStarted && lookup.onStarted();
+                break;
+            case 'partial':
+                lookup.onPartial && lookup.onPartial(message.engine, message.outcome);
+                break;
+            case 'result':
+                this.pending.delete(message.id);
+                lookup.resolve({ data: message.data, processing_time: message.processing_time });
+                break;
+            case 'cancelled':
+                this.pending.delete(message.id);
+                lookup.reject(Object.assign(new Error('Cancelled'), { cancelled: true }));
+                break;
+            case 'error':
+                this.pending.delete(message.id);
+                lookup.reject(Object.assign(new Error(message.detail), { retryAfter: message.retry_after }));
+                break;
+        }
+    }
+
+    // Returns {id, promise}; promise resolves with {data, processing_time}
+    lookup(kind, value, options = {}, callbacks = {}) {
+        const id = `q${++this.counter}`;
+        const promise = this.connect().then(socket => new Promise((resolve, reject) => {
+            this.pending.set(id, { resolve, reject, ...callbacks });
+            socket.send(JSON.stringify({ type: 'lookup', id, kind, value, options }));
+        }));
+        return { id, promise };
+    }
+
+    cancel(id) {
+        if (this.pending.has(id) && this.socket) {
+            this.socket.send(JSON.stringify({ type: 'cancel', id }));
+        }
+    }
+}
+
+window.OsintSocket = OsintSocket;